@@ -32,6 +32,7 @@ from cocotb.utils import integer_types
 
 import os
 import random
+import re
 import warnings
 
 resolve_x_to = os.getenv('COCOTB_RESOLVE_X', "VALUE_ERROR")
@@ -64,6 +65,19 @@ def _clog2(val):
         exp += 1
 
 
+def _resolved_int(value):
+    """Integer of a :class:`BinaryValue`, with any X or Z bits read as 0.
+
+    Unlike :attr:`BinaryValue.integer`, this doesn't depend on
+    ``COCOTB_RESOLVE_X``, for bus models sampling signals which may be
+    partly undriven.
+    """
+    try:
+        return value.integer
+    except ValueError:
+        return int(re.sub("[^1]", "0", value.binstr), 2)
+
+
 class BinaryRepresentation():  # noqa
     UNSIGNED         = 0  #: Unsigned format
     SIGNED_MAGNITUDE = 1  #: Sign and magnitude format
@@ -30,7 +30,19 @@
 """Common bus related functionality.
 A bus is simply defined as a collection of signals.
 """
-from cocotb.handle import AssignmentResult
+import operator
+import os
+import sys
+
+if "COCOTB_SIM" in os.environ:
+    import simulator
+else:
+    simulator = None
+
+import cocotb
+from cocotb.binary import BinaryValue
+from cocotb.handle import AssignmentResult, ModifiableObject
+from cocotb.utils import integer_types
 
 def _build_sig_attr_dict(signals):
     if isinstance(signals, dict):
@@ -42,6 +54,271 @@ def _build_sig_attr_dict(signals):
         return sig_to_attr
 
 
+# Types of value written through a _BusAccessPlan rather than the handle
+_plan_value_types = (BinaryValue,) + tuple(integer_types)
+
+
+def _get_signal_vals_bulk(handles):
+    """Fallback for simulator libraries without ``get_signal_vals_bulk``."""
+    values = []
+    for hdl in handles:
+        binstr = simulator.get_signal_val_binstr(hdl)
+        if binstr and not binstr.strip("01"):
+            values.append(int(binstr, 2))
+        else:
+            values.append(binstr)
+    return tuple(values)
+
+
+def _set_signal_vals_bulk(handles, values):
+    """Fallback for simulator libraries without ``set_signal_vals_bulk``."""
+    for hdl, value in zip(handles, values):
+        if isinstance(value, integer_types):
+            simulator.set_signal_val_long(hdl, value)
+        else:
+            simulator.set_signal_val_str(hdl, value)
+
+
+class _BusAccessPlan(object):
+    """The raw GPI handles and widths of the plain signals of a :class:`Bus`.
+
+    The values of all of them are read with a single simulator call, and
+    values driven onto them in a timestep are merged into a single entry of
+    the scheduler's write cache, written with a single simulator call. A
+    write to one of the signals replaces the write of it merged earlier, and
+    the other way round, so that the last value written is the one driven.
+    """
+
+    def __init__(self, name, signals):
+        self._name = name
+        self.names = []
+        self.objects = []
+        self.handles = []
+        self.widths = []
+        self.index = {}
+        for attr_name, hdl in sorted(signals.items()):
+            # Other handle types have their own value conversions
+            if type(hdl) is ModifiableObject:
+                self.index[attr_name] = len(self.names)
+                self.names.append(attr_name)
+                self.objects.append(hdl)
+                self.handles.append(hdl._handle)
+                self.widths.append(len(hdl))
+        self._get = getattr(simulator, "get_signal_vals_bulk", _get_signal_vals_bulk)
+        self._set = getattr(simulator, "set_signal_vals_bulk", _set_signal_vals_bulk)
+
+    def read(self):
+        """Return the value of each signal, as an int or a binary string."""
+        return self._get(self.handles)
+
+    def read_binstrs(self):
+        """Return the value of each signal as a binary string."""
+        return [value if not isinstance(value, integer_types) else
+                format(value, "0%db" % width)
+                for value, width in zip(self.read(), self.widths)]
+
+    def _merge(self, scheduler, pending, index, value):
+        """Merge a write of *value* to the signal at *index* into *pending*.
+
+        Raises:
+            TypeError: If *value* is an int too wide for the signal.
+        """
+        hdl = self.objects[index]
+        if (isinstance(value, integer_types) and
+                value.bit_length() > self.widths[index]):
+            raise TypeError("Unable to set %d bit value %d, target %s is only "
+                            "%d bits long" % (value.bit_length(), value,
+                                              hdl._fullname, self.widths[index]))
+        scheduler._writes.pop(hdl, None)
+        scheduler._merged_writes[hdl] = (self, index)
+        pending[index] = value
+
+    def write(self, index, value):
+        """Schedule a write of *value* to the signal at *index*."""
+        scheduler = cocotb.scheduler
+        pending = scheduler._writes.get(self)
+        if pending is None:
+            pending = {}
+        self._merge(scheduler, pending, index, value)
+        scheduler.save_write(self, pending)
+
+    def write_many(self, indices, values):
+        """Schedule writes of *values* to the signals at *indices*.
+
+        Values which are ``None`` are skipped.
+        """
+        scheduler = cocotb.scheduler
+        pending = scheduler._writes.get(self)
+        if pending is None:
+            pending = {}
+        for index, value in zip(indices, values):
+            if value is not None:
+                self._merge(scheduler, pending, index, value)
+        scheduler.save_write(self, pending)
+
+    def setimmediatevalue(self, pending):
+        """Write the pending values, called by the scheduler."""
+        scheduler = cocotb.scheduler
+        skip = scheduler.skip_redundant_writes
+        handles = []
+        values = []
+        for index, value in pending.items():
+            width = self.widths[index]
+            if isinstance(value, integer_types):
+                if value < 0:
+                    value &= (1 << width) - 1
+                if width > 32 or value >= 0x7fffffff:
+                    value = format(value, "0%db" % width)[-width:]
+            elif isinstance(value, BinaryValue):
+                value = value.binstr
+            else:
+                raise TypeError("Unable to set simulator value with type %s"
+                                % type(value))
+            if skip and scheduler._record_write(self.handles[index], value):
+                continue
+            handles.append(self.handles[index])
+            values.append(value)
+        if handles:
+            self._set(handles, values)
+
+
+class _Capture(dict):
+    """The values captured by :meth:`Bus.capture`, also accessible as attributes."""
+
+    def __getattr__(self, name):
+        if name in self:
+            return self[name]
+        else:
+            raise RuntimeError('Signal {} not present in bus'.format(name))
+
+    def __setattr__(self, name, value):
+        raise RuntimeError('Modifying a bus capture is not supported')
+
+    def __delattr__(self, name):
+        raise RuntimeError('Modifying a bus capture is not supported')
+
+
+def _type_fields(transaction_type):
+    """Return the field names of a namedtuple, ``__slots__`` class or ctypes Structure."""
+    ctypes = sys.modules.get("ctypes")
+    if issubclass(transaction_type, tuple) and hasattr(transaction_type, "_fields"):
+        return list(transaction_type._fields)
+    if ctypes is not None and issubclass(transaction_type, ctypes.Structure):
+        return [field[0] for field in transaction_type._fields_]
+    fields = []
+    for klass in reversed(transaction_type.__mro__):
+        slots = klass.__dict__.get("__slots__", ())
+        if isinstance(slots, str):
+            slots = (slots,)
+        fields.extend(slot for slot in slots
+                      if slot not in ("__dict__", "__weakref__") and slot not in fields)
+    if not fields:
+        raise TypeError("%s is not a namedtuple, a class with __slots__ or a "
+                        "ctypes.Structure" % transaction_type.__name__)
+    return fields
+
+
+class BusCodec(object):
+    """Converts between the signals of a :class:`Bus` and a transaction type.
+
+    Which field is carried by which signal is worked out once, when the codec
+    is created by :meth:`Bus.codec`, so that :meth:`capture` and
+    :meth:`drive` don't look up attributes by name or create classes on each
+    call. Signals are read and written with the single simulator call of
+    :meth:`Bus.capture_values`.
+
+    Fields without a signal are ``None`` in captured transactions, or ``0``
+    for a :class:`ctypes.Structure`, and are not driven.
+    """
+
+    def __init__(self, bus, transaction_type, signals=None):
+        fields = _type_fields(transaction_type)
+        if signals is None:
+            signals = dict((field, field) for field in fields
+                           if field in bus._signals)
+        for field, signal in signals.items():
+            if field not in fields:
+                raise AttributeError("%s has no field %s" %
+                                     (transaction_type.__name__, field))
+            if signal not in bus._signals:
+                raise AttributeError("Bus %s has no signal %s" % (bus._name, signal))
+
+        plan = bus._access_plan()
+        mapped = [field for field in fields if field in signals]
+        bulk = [field for field in mapped if signals[field] in plan.index]
+        self._plan = plan
+        self._transaction_type = transaction_type
+        self._ctypes = not issubclass(transaction_type, tuple) and hasattr(
+            transaction_type, "_fields_")
+
+        # Capture: positions in the transaction, and where to read them from
+        self._defaults = [0 if self._ctypes else None] * len(fields)
+        self._bulk_positions = [fields.index(field) for field in bulk]
+        self._bulk_indices = [plan.index[signals[field]] for field in bulk]
+        self._others = [(fields.index(field), bus._signals[signals[field]])
+                        for field in mapped if field not in bulk]
+        self._all_bulk = len(bulk) == len(fields)
+        if self._all_bulk and len(bulk) > 1:
+            self._select = operator.itemgetter(*self._bulk_indices)
+        elif self._all_bulk:
+            index = self._bulk_indices[0]
+            self._select = lambda values: (values[index],)
+
+        if issubclass(transaction_type, tuple):
+            self._make = transaction_type._make
+        elif self._ctypes:
+            self._make = self._make_structure
+        else:
+            self._slots = [getattr(transaction_type, field) for field in fields]
+            self._make = self._make_slots
+
+        # Drive: the fields to get from a transaction, in plan order
+        self._get_bulk = (operator.attrgetter(*bulk) if len(bulk) > 1 else
+                          (lambda obj, field=bulk[0]: (getattr(obj, field),))
+                          if bulk else (lambda obj: ()))
+        self._other_fields = [(field, bus._signals[signals[field]])
+                              for field in mapped if field not in bulk]
+
+    def _make_structure(self, values):
+        for value in values:
+            if not isinstance(value, integer_types):
+                raise ValueError("Can't capture %r into a ctypes.Structure" % (value,))
+        return self._transaction_type(*values)
+
+    def _make_slots(self, values):
+        transaction = self._transaction_type.__new__(self._transaction_type)
+        for slot, value in zip(self._slots, values):
+            slot.__set__(transaction, value)
+        return transaction
+
+    def capture(self):
+        """Capture the bus as a new transaction.
+
+        Signals are captured as ints, or binary strings if they contain X
+        or Z bits.
+        """
+        raw = self._plan.read()
+        if self._all_bulk:
+            return self._make(self._select(raw))
+        values = list(self._defaults)
+        for position, index in zip(self._bulk_positions, self._bulk_indices):
+            values[position] = raw[index]
+        for position, hdl in self._others:
+            values[position] = hdl.value
+        return self._make(values)
+
+    def drive(self, transaction):
+        """Drive the fields of *transaction* onto the bus.
+
+        Fields which are ``None`` are not driven.
+        """
+        self._plan.write_many(self._bulk_indices, self._get_bulk(transaction))
+        for field, hdl in self._other_fields:
+            value = getattr(transaction, field)
+            if value is not None:
+                hdl <= value
+
+
 class Bus(object):
     """Wraps up a collection of signals.
 
@@ -75,6 +352,7 @@ class Bus(object):
         self._entity = entity
         self._name = name
         self._signals = {}
+        self._plan = None
 
         for attr_name, sig_name in _build_sig_attr_dict(signals).items():
             if name:
@@ -109,6 +387,45 @@ class Bus(object):
         self._entity._log.debug("Signal name {}".format(signame))
         setattr(self, attr_name, getattr(self._entity, signame))
         self._signals[attr_name] = getattr(self, attr_name)
+        self._plan = None
+
+    def _access_plan(self):
+        """Return the :class:`_BusAccessPlan` for the signals of this bus."""
+        if self._plan is None:
+            self._plan = _BusAccessPlan(self._name, self._signals)
+        return self._plan
+
+    def codec(self, transaction_type, signals=None):
+        """Compile a :class:`BusCodec` between this bus and *transaction_type*.
+
+        Args:
+            transaction_type: A :func:`~collections.namedtuple`, a class with
+                ``__slots__`` or a :class:`ctypes.Structure`.
+            signals (dict, optional): Mapping of field names to the names of
+                the signals of this bus which carry them. Defaults to the
+                fields with the same name as a signal.
+
+        Returns:
+            BusCodec: The codec, to be created once and reused.
+        """
+        return BusCodec(self, transaction_type, signals)
+
+    def capture_values(self):
+        """Capture the values of the bus with a single simulator call.
+
+        Unlike :meth:`capture`, no :class:`~cocotb.binary.BinaryValue` is
+        created.
+
+        Returns:
+            dict: The value of each signal as an int, or as a binary string
+            if it contains X or Z bits.
+        """
+        plan = self._access_plan()
+        values = dict(zip(plan.names, plan.read()))
+        for attr_name, hdl in self._signals.items():
+            if attr_name not in plan.index:
+                values[attr_name] = hdl.value
+        return values
 
     def drive(self, obj, strict=False):
         """Drives values onto the bus.
@@ -120,6 +437,7 @@ class Bus(object):
         Raises:
             AttributeError: If not all signals have been assigned when ``strict=True``.
         """
+        plan = self._access_plan()
         for attr_name, hdl in self._signals.items():
             if not hasattr(obj, attr_name):
                 if strict:
@@ -132,7 +450,11 @@ class Bus(object):
                 else:
                     continue
             val = getattr(obj, attr_name)
-            hdl <= val
+            index = plan.index.get(attr_name)
+            if index is not None and isinstance(val, _plan_value_types):
+                plan.write(index, val)
+            else:
+                hdl <= val
 
     def capture(self):
         """Capture the values from the bus, returning an object representing the capture.
@@ -144,22 +466,13 @@ class Bus(object):
             RuntimeError: If signal not present in bus,
                 or attempt to modify a bus capture.
         """
-        class _Capture(dict):
-            def __getattr__(self, name):
-                if name in self:
-                    return self[name]
-                else:
-                    raise RuntimeError('Signal {} not present in bus'.format(name))
-
-            def __setattr__(self, name, value):
-                raise RuntimeError('Modifying a bus capture is not supported')
-
-            def __delattr__(self, name):
-                raise RuntimeError('Modifying a bus capture is not supported')
-
         _capture = _Capture()
+        plan = self._access_plan()
+        for attr_name, binstr in zip(plan.names, plan.read_binstrs()):
+            _capture[attr_name] = BinaryValue(binstr, len(binstr))
         for attr_name, hdl in self._signals.items():
-            _capture[attr_name] = hdl.value
+            if attr_name not in plan.index:
+                _capture[attr_name] = hdl.value
 
         return _capture
 
@@ -174,6 +487,8 @@ class Bus(object):
         Raises:
             AttributeError: If attribute is missing in *obj* when ``strict=True``.
         """
+        plan = self._access_plan()
+        binstrs = dict(zip(plan.names, plan.read_binstrs()))
         for attr_name, hdl in self._signals.items():
             if not hasattr(obj, attr_name):
                 if strict:
@@ -188,6 +503,13 @@ class Bus(object):
             # Try to use the get/set_binstr methods because they will not clobber the properties
             # of obj.attr_name on assignment.  Otherwise use setattr() to crush whatever type of
             # object was in obj.attr_name with hdl.value:
+            if attr_name in binstrs:
+                binstr = binstrs[attr_name]
+                try:
+                    getattr(obj, attr_name).set_binstr(binstr)
+                except AttributeError:
+                    setattr(obj, attr_name, BinaryValue(binstr, len(binstr)))
+                continue
             try:
                 getattr(obj, attr_name).set_binstr(hdl.value.get_binstr())
             except AttributeError:
@@ -31,8 +31,9 @@ import time
 import logging
 import functools
 import threading
-import inspect
 import textwrap
+import types
+import traceback
 import os
 
 import cocotb
@@ -64,6 +65,12 @@ def public(f):
 
 public(public)  # Emulate decorating ourself
 
+# Equivalent to inspect.iscoroutine, without the cost of importing inspect
+if sys.version_info[:2] >= (3, 5):
+    _coroutine_type = types.CoroutineType
+else:
+    _coroutine_type = ()
+
 
 @public
 class CoroutineComplete(Exception):
@@ -91,12 +98,13 @@ class RunningCoroutine(object):
         if hasattr(inst, "__name__"):
             self.__name__ = "%s" % inst.__name__
 
-        if sys.version_info[:2] >= (3, 5) and inspect.iscoroutine(inst):
+        if isinstance(inst, _coroutine_type):
             self._natively_awaitable = True
             self._coro = inst.__await__()
         else:
             self._natively_awaitable = False
             self._coro = inst
+        self._inst = inst
         self._started = False
         self._callbacks = []
         self._parent = parent
@@ -188,6 +196,15 @@ class RunningCoroutine(object):
     def has_started(self):
         return self._started
 
+    def _format_stack(self):
+        """Return the stack of a suspended coroutine as a list of strings."""
+        frame = getattr(self._inst, "gi_frame", None)
+        if frame is None:
+            frame = getattr(self._inst, "cr_frame", None)
+        if frame is None:
+            return []
+        return traceback.format_stack(frame)
+
     def __nonzero__(self):
         """Provide boolean testing
             if the coroutine has finished return false
@@ -239,6 +256,9 @@ class RunningTest(RunningCoroutine):
         self.expect_error = parent.expect_error
         self.skip = parent.skip
         self.stage = parent.stage
+        self.timeout = parent.timeout
+        self.timeout_unit = parent.timeout_unit
+        self.wall_timeout = parent.wall_timeout
 
         self.handler = RunningTest.ErrorLogHandler(self._handle_error_message)
         cocotb.log.addHandler(self.handler)
@@ -355,7 +375,10 @@ class external(object):
     """
     def __init__(self, func):
         self._func = func
-        self._log = SimLog("cocotb.external.%s" % self._func.__name__, id(self))
+
+    @lazy_property
+    def _log(self):
+        return SimLog("cocotb.external.%s" % self._func.__name__, id(self))
 
     def __call__(self, *args, **kwargs):
 
@@ -430,11 +453,21 @@ class test(with_metaclass(_decorator_helper, coroutine)):
 
     Args:
         timeout (int, optional):
-            value representing simulation timeout (not implemented).
+            Simulation time after which the test is aborted with a
+            :exc:`~cocotb.result.SimTimeoutError`.
+        timeout_unit (str, optional):
+            Units of *timeout*, as accepted by :class:`~cocotb.triggers.Timer`.
+            Defaults to simulator time steps.
+        wall_timeout (float, optional):
+            Real time in seconds after which the test is aborted with a
+            :exc:`~cocotb.result.SimTimeoutError`, even if it never yields
+            back to the scheduler.
         expect_fail (bool, optional):
             Don't mark the result as a failure if the test fails.
-        expect_error (bool, optional):
-            Don't mark the result as an error if an error is raised.
+        expect_error (bool or exception type, optional):
+            Don't mark the result as an error if an error is raised, or with
+            an exception type or tuple of types, if an error of one of those
+            types is raised.
             This is for cocotb internal regression use 
             when a simulator error is expected.
         skip (bool, optional):
@@ -443,16 +476,25 @@ class test(with_metaclass(_decorator_helper, coroutine)):
             Order tests logically into stages, where multiple tests can share a stage.
     """
     def __init__(self, f, timeout=None, expect_fail=False, expect_error=False,
-                 skip=False, stage=None):
+                 skip=False, stage=None, timeout_unit=None, wall_timeout=None):
         super(test, self).__init__(f)
 
         self.timeout = timeout
+        self.timeout_unit = timeout_unit
+        self.wall_timeout = wall_timeout
         self.expect_fail = expect_fail
         self.expect_error = expect_error
         self.skip = skip
         self.stage = stage
         self.im_test = True    # For auto-regressions
         self.name = self._func.__name__
+        self.module = self._func.__module__
 
     def __call__(self, *args, **kwargs):
         return RunningTest(self._func(*args, **kwargs), self)
+
+    def sort_name(self):
+        if self.stage is None:
+            return "%s.%s" % (self.module, self.name)
+        else:
+            return "%s.%d.%s" % (self.module, self.stage, self.name)
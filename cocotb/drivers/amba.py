@@ -27,18 +27,31 @@ SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE. '''
 """Drivers for Advanced Microcontroller Bus Architecture."""
 
 import cocotb
-from cocotb.triggers import RisingEdge, ReadOnly, Lock
-from cocotb.drivers import BusDriver
-from cocotb.result import ReturnValue
-from cocotb.binary import BinaryValue
+from cocotb.triggers import RisingEdge, ReadOnly, Lock, Event
+from cocotb.drivers import BusDriver, ValidatedBusDriver
+from cocotb.result import ReturnValue, TestError
+from cocotb.binary import _resolved_int
+from cocotb.memory import PagedMemory
+from cocotb.utils import integer_types, _int_from_bytes, _int_to_bytes
 
 import array
+import itertools
+import random
+from collections import deque
 
 
 class AXIProtocolError(Exception):
     pass
 
 
+AXI_BURST_FIXED = 0
+AXI_BURST_INCR = 1
+AXI_BURST_WRAP = 2
+
+AXI_RESP_OKAY = 0
+AXI_RESP_SLVERR = 2
+
+
 class AXI4LiteMaster(BusDriver):
     """AXI4-Lite Master.
 
@@ -207,12 +220,493 @@ class AXI4LiteMaster(BusDriver):
     def __len__(self):
         return 2**len(self.bus.ARADDR)
 
+class _AXIOperation(object):
+    """A bulk transfer of :class:`AXI4Master`, completed by several bursts."""
+
+    def __init__(self, address, data):
+        self.address = address
+        self.data = data
+        self.remaining = 0
+        self.resp = AXI_RESP_OKAY
+        self.event = Event()
+
+
+class _AXIMasterBurst(object):
+    """A burst of an :class:`AXI4Master` transfer.
+
+    It covers *length* bytes of the transfer starting at *offset*, at
+    *address* on the bus.
+    """
+
+    __slots__ = ("op", "id", "address", "offset", "length", "beats", "index")
+
+    def __init__(self, op, id, address, offset, length, beats):
+        self.op = op
+        self.id = id
+        self.address = address
+        self.offset = offset
+        self.length = length
+        self.beats = beats
+        self.index = 0
+
+
+class AXI4Master(BusDriver):
+    """AXI4 master for bulk transfers.
+
+    :meth:`write` and :meth:`read` split a transfer into ``INCR`` bursts of
+    full data bus width which don't cross a 4KB boundary, using ``WSTRB`` for
+    the unaligned start and end. The bursts of all transfers are issued back
+    to back on each channel, without waiting for earlier responses, so that
+    up to *max_outstanding* reads and *max_outstanding* writes are in flight
+    and data moves at one beat per clock when the slave allows it.
+
+    Forking a transfer starts it immediately and gives a handle which can be
+    joined for its completion, so several transfers can be kept in flight::
+
+        ops = [cocotb.fork(axim.write(address + i * 4096, page))
+               for i, page in enumerate(pages)]
+        for op in ops:
+            yield op.join()
+
+    Args:
+        entity: Handle to the simulator entity.
+        name (str): Name of this bus.
+        clock: Handle to the clock signal.
+        big_endian (bool, optional): Byte lane 0 of the data bus is the most
+            significant byte rather than the least significant one.
+        max_burst (int, optional): Maximum number of beats in a burst, up to
+            256.
+        max_outstanding (int, optional): Number of read and of write bursts
+            which may be in flight.
+    """
+
+    _signals = [
+        "ARVALID", "ARREADY", "ARADDR",             # Read address channel
+        "ARLEN",   "ARSIZE",  "ARBURST",
+
+        "RVALID",  "RREADY",  "RDATA",   "RLAST",   # Read response channel
+
+        "AWVALID", "AWREADY", "AWADDR",             # Write address channel
+        "AWLEN",   "AWSIZE",  "AWBURST",
+
+        "WVALID",  "WREADY",  "WDATA",   "WSTRB",   # Write data channel
+        "WLAST",
+
+        "BVALID",  "BREADY",                        # Write response channel
+    ]
+
+    _optional_signals = [
+        "ARID",    "RID",     "AWID",    "BID",
+        "RRESP",   "BRESP",   "ARPROT",  "AWPROT",
+        "ARLOCK",  "AWLOCK",  "ARCACHE", "AWCACHE",
+        "ARQOS",   "AWQOS",
+    ]
+
+    def __init__(self, entity, name, clock, big_endian=False, max_burst=256,
+                 max_outstanding=16):
+        BusDriver.__init__(self, entity, name, clock)
+        self.clock = clock
+        self.big_endian = big_endian
+        self.max_burst = max_burst
+        self.max_outstanding = max_outstanding
+
+        self._data_bytes = len(self.bus.WDATA) // 8
+        self._size = self._data_bytes.bit_length() - 1
+
+        self._ar_queue = deque()    # read bursts waiting to be issued
+        self._aw_queue = deque()    # write bursts waiting to be issued
+        self._w_queue = deque()     # write bursts with data still to send
+        self._reads = {}            # ID to the read bursts in flight
+        self._writes = {}           # ID to the write bursts in flight
+        self._n_reads = 0
+        self._n_writes = 0
+        self._work = Event("%s_work" % name)
+
+        # What was driven this cycle, and what was sampled at its end
+        self._arvalid = self._awvalid = self._wvalid = False
+        self._ar_fire = self._aw_fire = self._w_fire = False
+        self._r = self._b = None
+
+        for signal in ("ARVALID", "AWVALID", "WVALID"):
+            getattr(self.bus, signal).setimmediatevalue(0)
+        self.bus.RREADY.setimmediatevalue(1)
+        self.bus.BREADY.setimmediatevalue(1)
+
+        cocotb.fork(self._run())
+
+    def _split(self, op, address, length, id):
+        """Split a transfer into bursts, returning them."""
+        bursts = []
+        max_bytes = self.max_burst * self._data_bytes
+        offset = 0
+        while offset < length:
+            start = address + offset
+            base = start - start % self._data_bytes
+            end = min(address + length, (start | 0xfff) + 1, base + max_bytes)
+            beats = (end - base + self._data_bytes - 1) // self._data_bytes
+            bursts.append(_AXIMasterBurst(op, id, start, offset, end - start,
+                                          beats))
+            offset = end - address
+        op.remaining = len(bursts)
+        return bursts
+
+    def _lanes(self, burst):
+        """Return the byte lanes and transfer offset of the current beat."""
+        if burst.index == 0:
+            lower = burst.address % self._data_bytes
+            offset = burst.offset
+        else:
+            lower = 0
+            offset = (burst.offset + self._data_bytes * burst.index -
+                      burst.address % self._data_bytes)
+        upper = min(self._data_bytes,
+                    lower + burst.offset + burst.length - offset)
+        return lower, upper, offset
+
+    def _wait(self, op):
+        self._work.set()
+        return op.event.wait()
+
+    @cocotb.coroutine
+    def write(self, address, data, id=0):
+        """Write *data* starting at *address*.
+
+        Args:
+            address (int): The address to write to.
+            data (bytes): The bytes to write.
+            id (int, optional): The ``AWID`` to use for its bursts.
+
+        Raises:
+            AXIProtocolError: If a write response from AXI is not ``OKAY``.
+        """
+        op = _AXIOperation(address, bytearray(data))
+        if not op.data:
+            return
+        bursts = self._split(op, address, len(op.data), id)
+        self._aw_queue.extend(bursts)
+        self._w_queue.extend(bursts)
+        yield self._wait(op)
+
+        if op.resp:
+            raise AXIProtocolError("Write of %d bytes to address 0x%08x failed "
+                                   "with BRESP: %d" % (len(op.data), address,
+                                                       op.resp))
+
+    @cocotb.coroutine
+    def read(self, address, length, id=0):
+        """Read *length* bytes starting at *address*.
+
+        Args:
+            address (int): The address to read from.
+            length (int): The number of bytes to read.
+            id (int, optional): The ``ARID`` to use for its bursts.
+
+        Returns:
+            bytearray: The bytes read.
+
+        Raises:
+            AXIProtocolError: If a read response from AXI is not ``OKAY``.
+        """
+        op = _AXIOperation(address, bytearray(length))
+        if length:
+            self._ar_queue.extend(self._split(op, address, length, id))
+            yield self._wait(op)
+
+        if op.resp:
+            raise AXIProtocolError("Read of %d bytes from address 0x%08x failed "
+                                   "with RRESP: %d" % (length, address, op.resp))
+        raise ReturnValue(op.data)
+
+    def _burst_done(self, burst, resp):
+        op = burst.op
+        if resp and not op.resp:
+            op.resp = resp
+        op.remaining -= 1
+        if not op.remaining:
+            op.event.set()
+
+    def _idle(self):
+        return not (self._ar_queue or self._aw_queue or self._w_queue or
+                    self._n_reads or self._n_writes or self._arvalid or
+                    self._awvalid or self._wvalid or self._r or self._b)
+
+    def _commit(self):
+        """Complete the handshakes sampled at the end of the last cycle."""
+        if self._ar_fire:
+            self._arvalid = False
+            burst = self._ar_queue.popleft()
+            self._reads.setdefault(burst.id, deque()).append(burst)
+            self._n_reads += 1
+
+        if self._r is not None:
+            id, value, resp, last = self._r
+            try:
+                burst = self._reads[id][0]
+            except (KeyError, IndexError):
+                raise AXIProtocolError("Read data for ID %d without a read in "
+                                       "flight" % id)
+            lanes = bytearray(_int_to_bytes(value, self._data_bytes))
+            if self.big_endian:
+                lanes.reverse()
+            lower, upper, offset = self._lanes(burst)
+            burst.op.data[offset:offset + upper - lower] = lanes[lower:upper]
+            burst.index += 1
+            if last != (burst.index == burst.beats):
+                raise AXIProtocolError("RLAST %s on beat %d of a %d beat burst"
+                                       % ("set" if last else "clear",
+                                          burst.index, burst.beats))
+            if resp and not burst.op.resp:
+                burst.op.resp = resp
+            if last:
+                self._reads[id].popleft()
+                self._n_reads -= 1
+                self._burst_done(burst, AXI_RESP_OKAY)
+
+        if self._aw_fire:
+            self._awvalid = False
+            burst = self._aw_queue.popleft()
+            self._writes.setdefault(burst.id, deque()).append(burst)
+            self._n_writes += 1
+
+        if self._w_fire:
+            burst = self._w_queue[0]
+            burst.index += 1
+            if burst.index == burst.beats:
+                self._w_queue.popleft()
+
+        if self._b is not None:
+            id, resp = self._b
+            try:
+                burst = self._writes[id].popleft()
+            except (KeyError, IndexError):
+                raise AXIProtocolError("Write response for ID %d without a "
+                                       "write in flight" % id)
+            self._n_writes -= 1
+            self._burst_done(burst, resp)
+
+    def _drive_address(self, prefix, burst):
+        bus = self.bus
+        getattr(bus, prefix + "ADDR") <= burst.address
+        getattr(bus, prefix + "LEN") <= burst.beats - 1
+        getattr(bus, prefix + "SIZE") <= self._size
+        getattr(bus, prefix + "BURST") <= AXI_BURST_INCR
+        id_signal = getattr(bus, prefix + "ID", None)
+        if id_signal is not None:
+            id_signal <= burst.id
+
+    def _drive(self):
+        """Drive the outputs for this cycle."""
+        bus = self.bus
+
+        # VALID is held once asserted, until the handshake completes
+        if not self._arvalid:
+            self._arvalid = bool(self._ar_queue) and (
+                self._n_reads < self.max_outstanding)
+            if self._arvalid:
+                self._drive_address("AR", self._ar_queue[0])
+            bus.ARVALID <= int(self._arvalid)
+
+        if not self._awvalid:
+            self._awvalid = bool(self._aw_queue) and (
+                self._n_writes < self.max_outstanding)
+            if self._awvalid:
+                self._drive_address("AW", self._aw_queue[0])
+            bus.AWVALID <= int(self._awvalid)
+
+        wvalid = bool(self._w_queue)
+        if wvalid and (self._w_fire or not self._wvalid):
+            burst = self._w_queue[0]
+            lower, upper, offset = self._lanes(burst)
+            lanes = bytearray(self._data_bytes)
+            lanes[lower:upper] = burst.op.data[offset:offset + upper - lower]
+            if self.big_endian:
+                lanes.reverse()
+                lower, upper = self._data_bytes - upper, self._data_bytes - lower
+            strobe = ((1 << upper) - 1) & ~((1 << lower) - 1)
+            bus.WDATA <= _int_from_bytes(lanes)
+            bus.WSTRB <= strobe
+            bus.WLAST <= int(burst.index == burst.beats - 1)
+        if wvalid != self._wvalid:
+            bus.WVALID <= int(wvalid)
+        self._wvalid = wvalid
+
+    def _sample(self):
+        """Sample the handshakes which complete at the end of this cycle."""
+        bus = self.bus
+        self._ar_fire = self._arvalid and bool(_resolved_int(bus.ARREADY.value))
+        self._aw_fire = self._awvalid and bool(_resolved_int(bus.AWREADY.value))
+        self._w_fire = self._wvalid and bool(_resolved_int(bus.WREADY.value))
+
+        self._r = None
+        if _resolved_int(bus.RVALID.value):
+            self._r = (_resolved_int(bus.RID.value) if hasattr(bus, "RID") else 0,
+                       _resolved_int(bus.RDATA.value),
+                       _resolved_int(bus.RRESP.value) if hasattr(bus, "RRESP") else 0,
+                       bool(_resolved_int(bus.RLAST.value)))
+
+        self._b = None
+        if _resolved_int(bus.BVALID.value):
+            self._b = (_resolved_int(bus.BID.value) if hasattr(bus, "BID") else 0,
+                       _resolved_int(bus.BRESP.value) if hasattr(bus, "BRESP") else 0)
+
+    @cocotb.coroutine
+    def _run(self):
+        clock_re = RisingEdge(self.clock)
+        read_only = ReadOnly()
+        while True:
+            if self._idle():
+                # Nothing to do until a transfer is started
+                self._work.clear()
+                yield self._work.wait()
+            yield clock_re
+            self._commit()
+            self._drive()
+            yield read_only
+            self._sample()
+
+
+class _AXIBurst(object):
+    """A burst accepted by :class:`AXI4Slave`, answered one beat at a time."""
+
+    __slots__ = ("id", "beats", "index", "ready", "resp")
+
+    def __init__(self, id, beats):
+        self.id = id
+        self.beats = beats
+        self.index = 0
+        self.ready = 0
+        self.resp = AXI_RESP_OKAY
+
+
+def _burst_beats(address, length, size, burst, data_bytes):
+    """Return ``(address, lower_lane, upper_lane)`` for each beat of a burst.
+
+    This follows the address and byte lane equations of the AXI
+    specification: only the first beat of an ``INCR`` or ``WRAP`` burst may be
+    unaligned, and every beat of a ``FIXED`` burst uses the same address.
+
+    Raises:
+        AXIProtocolError: If the burst is not a legal AXI4 burst.
+    """
+    if size > data_bytes:
+        raise AXIProtocolError("Burst size of %d bytes is wider than the %d byte "
+                               "data bus" % (size, data_bytes))
+    if burst == AXI_BURST_WRAP:
+        if length not in (2, 4, 8, 16) or address % size:
+            raise AXIProtocolError("Illegal WRAP burst of %d beats at 0x%x"
+                                   % (length, address))
+        wrap = size * length
+        wrap_base = address - address % wrap
+    elif burst == AXI_BURST_INCR:
+        last = address - address % size + size * length - 1
+        if address >> 12 != last >> 12:
+            raise AXIProtocolError("INCR burst of %d beats at 0x%x crosses a "
+                                   "4KB boundary" % (length, address))
+    elif burst != AXI_BURST_FIXED:
+        raise AXIProtocolError("Reserved burst type %d" % burst)
+
+    beats = []
+    addr = address
+    for _ in range(length):
+        aligned = addr - addr % size
+        lower = addr % data_bytes
+        beats.append((addr, lower, aligned % data_bytes + size - 1))
+        if burst == AXI_BURST_INCR:
+            addr = aligned + size
+        elif burst == AXI_BURST_WRAP:
+            addr += size
+            if addr >= wrap_base + wrap:
+                addr -= wrap
+    return beats
+
+
+class _Throttle(object):
+    """Per-cycle flag from a generator of ``(on, off)`` cycle counts.
+
+    The convention is the same as for the *valid_generator* of
+    :class:`~cocotb.drivers.ValidatedBusDriver`; without a generator, or once
+    it is exhausted, every cycle is on.
+    """
+
+    def __init__(self, generator=None):
+        self._generator = generator
+        self._on = 0
+        self._off = 0
+
+    def __call__(self):
+        while self._generator is not None and not (self._on or self._off):
+            try:
+                self._on, self._off = next(self._generator)
+            except StopIteration:
+                self._generator = None
+        if self._generator is None or self._on:
+            self._on = max(self._on - 1, 0)
+            return True
+        self._off -= 1
+        return False
+
+
+def _latencies(latency):
+    """Return an iterator of latencies from an int or an iterable of ints."""
+    if isinstance(latency, integer_types):
+        return itertools.repeat(latency)
+    return iter(latency)
+
+
 class AXI4Slave(BusDriver):
-    '''
-    AXI4 Slave
+    """AXI4 memory slave.
+
+    Answers read and write bursts from *memory*, which is either a
+    :class:`~cocotb.memory.PagedMemory` or a bytes-like object supporting
+    slice assignment such as a :class:`bytearray` or ``array.array('B')``.
+    Each beat is moved as a single bytes object, placed on the byte lanes
+    given by its address, and ``FIXED``, ``INCR`` and ``WRAP`` bursts of any
+    supported size are handled, including narrow and unaligned transfers.
+    ``WSTRB`` is honoured when present.
+
+    New addresses are accepted while earlier bursts are still being answered,
+    up to *max_outstanding* reads and *max_outstanding* writes. Write data is
+    taken in address order and may arrive before its address. Responses for
+    the same ID are always given in order; with *reorder*, responses for
+    different IDs are given in a random order once their latency has
+    elapsed, otherwise every response is given in order. A read burst is not
+    interleaved with other read data once started.
+
+    Accesses outside *memory* are answered with a ``SLVERR`` response.
+    Illegal bursts, such as a ``WRAP`` of 3 beats, an ``INCR`` crossing a
+    4KB boundary or a ``WLAST`` on the wrong beat, raise
+    :exc:`AXIProtocolError`.
+
+    Args:
+        entity: Handle to the simulator entity.
+        name (str): Name of this bus.
+        clock: Handle to the clock signal.
+        memory: The memory to serve accesses from.
+        big_endian (bool, optional): Byte lane 0 of the data bus is the most
+            significant byte rather than the least significant one.
+        read_latency (int or iterable, optional): Cycles from accepting a read
+            address until its first data beat can be given. An iterable
+            gives a latency per burst.
+        write_latency (int or iterable, optional): Cycles from accepting the
+            last beat of a write until its response can be given. An iterable
+            gives a latency per burst.
+        arready_generator (generator, optional): Generator of ``(on, off)``
+            cycle counts for which ``ARREADY`` is asserted and deasserted,
+            as for the *valid_generator* of
+            :class:`~cocotb.drivers.ValidatedBusDriver`.
+        awready_generator (generator, optional): As *arready_generator*, for
+            ``AWREADY``.
+        wready_generator (generator, optional): As *arready_generator*, for
+            ``WREADY``.
+        rvalid_generator (generator, optional): As *arready_generator*, for
+            whether a read data beat may be started in a cycle. Once
+            asserted, ``RVALID`` stays asserted until the beat is accepted.
+        max_outstanding (int, optional): Number of read and of write
+            transactions which may be outstanding. Defaults to unlimited.
+        reorder (bool, optional): Give responses for different IDs out of
+            order.
+    """
 
-    Monitors an internal memory and handles read and write requests.
-    '''
     _signals = [
         "ARREADY", "ARVALID", "ARADDR",             # Read address channel
         "ARLEN",   "ARSIZE",  "ARBURST", "ARPROT",
@@ -226,7 +720,6 @@ class AXI4Slave(BusDriver):
 
     ]
 
-    # Not currently supported by this driver
     _optional_signals = [
         "WLAST",   "WSTRB",
         "BVALID",  "BREADY",  "BRESP",   "RRESP",
@@ -237,128 +730,423 @@ class AXI4Slave(BusDriver):
     ]
 
     def __init__(self, entity, name, clock, memory, callback=None, event=None,
-                 big_endian=False):
+                 big_endian=False, read_latency=0, write_latency=0,
+                 arready_generator=None, awready_generator=None,
+                 wready_generator=None, rvalid_generator=None,
+                 max_outstanding=None, reorder=False):
 
         BusDriver.__init__(self, entity, name, clock)
         self.clock = clock
 
         self.big_endian = big_endian
-        self.bus.ARREADY.setimmediatevalue(1)
+        self.reorder = reorder
+        self.max_outstanding = max_outstanding
+        self._memory = memory
+        self._paged = isinstance(memory, PagedMemory)
+        self._data_bytes = len(self.bus.RDATA) // 8
+
+        self._read_latency = _latencies(read_latency)
+        self._write_latency = _latencies(write_latency)
+        self._arready_throttle = _Throttle(arready_generator)
+        self._awready_throttle = _Throttle(awready_generator)
+        self._wready_throttle = _Throttle(wready_generator)
+        self._rvalid_throttle = _Throttle(rvalid_generator)
+
+        self._cycle = 0
+        self._reads = []        # read bursts, in the order accepted
+        self._writes = deque()  # write bursts waiting for data
+        self._wdata = deque()   # write beats waiting for their address
+        self._responses = []    # completed writes waiting for a response
+        self._r_burst = None
+        self._b_burst = None
+
+        # What was driven this cycle, and what was sampled at its end
+        self._arready = self._awready = self._wready = False
+        self._rvalid = self._bvalid = False
+        self._ar = self._aw = self._w = None
+        self._r_fire = self._b_fire = False
+
+        self.bus.ARREADY.setimmediatevalue(0)
+        self.bus.AWREADY.setimmediatevalue(0)
+        self.bus.WREADY.setimmediatevalue(0)
         self.bus.RVALID.setimmediatevalue(0)
         self.bus.RLAST.setimmediatevalue(0)
-        self.bus.AWREADY.setimmediatevalue(1)
-        self._memory = memory
-
-        self.write_address_busy = Lock("%s_wabusy" % name)
-        self.read_address_busy = Lock("%s_rabusy" % name)
-        self.write_data_busy = Lock("%s_wbusy" % name)
-
-        cocotb.fork(self._read_data())
-        cocotb.fork(self._write_data())
-
-    def _size_to_bytes_in_beat(self, AxSIZE):
-        if AxSIZE < 7:
-            return 2 ** AxSIZE
-        return None
+        if hasattr(self.bus, "BVALID"):
+            self.bus.BVALID.setimmediatevalue(0)
+
+        cocotb.fork(self._run())
+
+    def _address(self, prefix):
+        """Sample the address channel *prefix* (``AR`` or ``AW``) as a burst."""
+        bus = self.bus
+        id_signal = getattr(bus, prefix + "ID", None)
+        id = _resolved_int(id_signal.value) if id_signal is not None else 0
+        address = _resolved_int(getattr(bus, prefix + "ADDR").value)
+        length = _resolved_int(getattr(bus, prefix + "LEN").value) + 1
+        size = 1 << _resolved_int(getattr(bus, prefix + "SIZE").value)
+        burst = _resolved_int(getattr(bus, prefix + "BURST").value)
+
+        if __debug__:
+            self.log.debug("%s burst: ID %d, address 0x%x, %d beats of %d "
+                           "bytes, type %d" % (prefix, id, address, length,
+                                               size, burst))
+        return _AXIBurst(id, _burst_beats(address, length, size, burst,
+                                          self._data_bytes))
+
+    def _read_memory(self, address, length):
+        if self._paged:
+            return self._memory.read(address, length)
+        if address < 0 or address + length > len(self._memory):
+            raise IndexError("0x%x is outside the memory" % address)
+        return bytearray(self._memory[address:address + length])
+
+    def _write_memory(self, address, data):
+        if self._paged:
+            self._memory.write(address, data)
+            return
+        if address < 0 or address + len(data) > len(self._memory):
+            raise IndexError("0x%x is outside the memory" % address)
+        if isinstance(self._memory, array.array):
+            data = array.array('B', bytes(data))
+        self._memory[address:address + len(data)] = data
+
+    def _select(self, pending):
+        """Return the next of the *pending* bursts to answer, if any is ready."""
+        if not self.reorder:
+            if pending and pending[0].ready <= self._cycle:
+                return pending[0]
+            return None
+        seen = set()
+        ready = []
+        for burst in pending:
+            if burst.id in seen:
+                continue
+            seen.add(burst.id)
+            if burst.ready <= self._cycle:
+                ready.append(burst)
+        return random.choice(ready) if ready else None
+
+    def _write_beat(self, burst, wdata, wstrb, wlast):
+        address, lower, upper = burst.beats[burst.index]
+        burst.index += 1
+        if wlast is not None and wlast != (burst.index == len(burst.beats)):
+            raise AXIProtocolError("WLAST %s on beat %d of a %d beat burst" %
+                                   ("set" if wlast else "clear", burst.index,
+                                    len(burst.beats)))
+
+        lanes = bytearray(_int_to_bytes(wdata, self._data_bytes))
+        enables = [wstrb >> i & 1 for i in range(self._data_bytes)]
+        if self.big_endian:
+            lanes.reverse()
+            enables.reverse()
+
+        # Write each run of enabled byte lanes as a single slice
+        lane = lower
+        while lane <= upper:
+            if not enables[lane]:
+                lane += 1
+                continue
+            end = lane
+            while end < upper and enables[end + 1]:
+                end += 1
+            try:
+                self._write_memory(address + lane - lower, lanes[lane:end + 1])
+            except IndexError:
+                burst.resp = AXI_RESP_SLVERR
+            lane = end + 1
+
+    def _commit(self):
+        """Complete the handshakes sampled at the end of the last cycle."""
+        if self._ar is not None:
+            self._ar.ready = self._cycle + next(self._read_latency, 0)
+            self._reads.append(self._ar)
+
+        if self._r_fire:
+            burst = self._r_burst
+            burst.index += 1
+            if burst.index == len(burst.beats):
+                self._reads.remove(burst)
+                self._r_burst = None
+
+        if self._aw is not None:
+            self._writes.append(self._aw)
+
+        if self._w is not None:
+            self._wdata.append(self._w)
+
+        while self._writes and self._wdata:
+            burst = self._writes[0]
+            self._write_beat(burst, *self._wdata.popleft())
+            if burst.index == len(burst.beats):
+                self._writes.popleft()
+                burst.ready = self._cycle + next(self._write_latency, 0)
+                if hasattr(self.bus, "BVALID"):
+                    self._responses.append(burst)
+
+        if self._b_fire:
+            self._responses.remove(self._b_burst)
+            self._b_burst = None
+
+    def _drive(self):
+        """Drive the outputs for this cycle."""
+        bus = self.bus
+        limit = self.max_outstanding
+
+        self._arready = self._arready_throttle() and (
+            limit is None or len(self._reads) < limit)
+        bus.ARREADY <= int(self._arready)
+
+        self._awready = self._awready_throttle() and (
+            limit is None or len(self._writes) + len(self._responses) < limit)
+        bus.AWREADY <= int(self._awready)
+
+        self._wready = self._wready_throttle()
+        bus.WREADY <= int(self._wready)
+
+        if self._r_burst is None:
+            self._r_burst = self._select(self._reads)
+            self._rvalid = False
+        burst = self._r_burst
+        # Once RVALID is asserted it must stay asserted until RREADY
+        if burst is not None and (self._rvalid or self._rvalid_throttle()):
+            address, lower, upper = burst.beats[burst.index]
+            lanes = bytearray(self._data_bytes)
+            resp = burst.resp
+            try:
+                lanes[lower:upper + 1] = self._read_memory(address,
+                                                           upper - lower + 1)
+            except IndexError:
+                resp = AXI_RESP_SLVERR
+            if self.big_endian:
+                lanes.reverse()
+            bus.RDATA <= _int_from_bytes(lanes)
+            bus.RLAST <= int(burst.index == len(burst.beats) - 1)
+            if hasattr(bus, "RID"):
+                bus.RID <= burst.id
+            if hasattr(bus, "RRESP"):
+                bus.RRESP <= resp
+            self._rvalid = True
+        else:
+            self._rvalid = False
+        bus.RVALID <= int(self._rvalid)
+
+        if hasattr(bus, "BVALID"):
+            if self._b_burst is None:
+                self._b_burst = self._select(self._responses)
+            burst = self._b_burst
+            self._bvalid = burst is not None
+            if self._bvalid:
+                if hasattr(bus, "BID"):
+                    bus.BID <= burst.id
+                if hasattr(bus, "BRESP"):
+                    bus.BRESP <= burst.resp
+            bus.BVALID <= int(self._bvalid)
+
+    def _sample(self):
+        """Sample the handshakes which complete at the end of this cycle."""
+        bus = self.bus
+        self._ar = None
+        if self._arready and _resolved_int(bus.ARVALID.value):
+            self._ar = self._address("AR")
+
+        self._r_fire = self._rvalid and bool(_resolved_int(bus.RREADY.value))
+
+        self._aw = None
+        if self._awready and _resolved_int(bus.AWVALID.value):
+            self._aw = self._address("AW")
+
+        self._w = None
+        if self._wready and _resolved_int(bus.WVALID.value):
+            wstrb = (_resolved_int(bus.WSTRB.value) if hasattr(bus, "WSTRB")
+                     else (1 << self._data_bytes) - 1)
+            wlast = (bool(_resolved_int(bus.WLAST.value)) if hasattr(bus, "WLAST")
+                     else None)
+            self._w = (_resolved_int(bus.WDATA.value), wstrb, wlast)
+
+        self._b_fire = (self._bvalid and (not hasattr(bus, "BREADY") or
+                                          bool(_resolved_int(bus.BREADY.value))))
 
     @cocotb.coroutine
-    def _write_data(self):
+    def _run(self):
         clock_re = RisingEdge(self.clock)
-
+        read_only = ReadOnly()
         while True:
-            while True:
-                self.bus.WREADY <= 0
-                yield ReadOnly()
-                if self.bus.AWVALID.value:
-                    self.bus.WREADY <= 1
-                    break
-                yield clock_re
-
-            yield ReadOnly()
-            _awaddr = int(self.bus.AWADDR)
-            _awlen = int(self.bus.AWLEN)
-            _awsize = int(self.bus.AWSIZE)
-            _awburst = int(self.bus.AWBURST)
-            _awprot = int(self.bus.AWPROT)
-
-            burst_length = _awlen + 1
-            bytes_in_beat = self._size_to_bytes_in_beat(_awsize)
-
-            if __debug__:
-                self.log.debug(
-                    "AWADDR  %d\n" % _awaddr +
-                    "AWLEN   %d\n" % _awlen +
-                    "AWSIZE  %d\n" % _awsize +
-                    "AWBURST %d\n" % _awburst +
-                    "BURST_LENGTH %d\n" % burst_length +
-                    "Bytes in beat %d\n" % bytes_in_beat)
-
-            burst_count = burst_length
-
             yield clock_re
+            self._cycle += 1
+            self._commit()
+            self._drive()
+            yield read_only
+            self._sample()
+
+
+class AXIStreamMaster(ValidatedBusDriver):
+    """AXI4-Stream master, sending whole frames.
+
+    A frame given as bytes is sent least significant byte first, with
+    ``tlast`` on its last beat and ``tkeep`` marking the bytes used in a
+    partial last beat. All the beat words are worked out before the first
+    clock edge, so the clocked loop only assigns integers.
+
+    A frame may instead be an iterable of objects with attributes matching
+    the signal names, one per cycle, to drive arbitrary beats.
+
+    Args:
+        entity: Handle to the simulator entity.
+        name (str): Name of this bus, such as ``m_axis``.
+        clock: Handle to the clock signal.
+        valid_generator (generator, optional): A generator that yields tuples
+            of ``(valid, invalid)`` cycles to insert.
+    """
 
-            while True:
-                if self.bus.WVALID.value:
-                    word = self.bus.WDATA.value
-                    word.big_endian = self.big_endian
-                    _burst_diff = burst_length - burst_count
-                    _st = _awaddr + (_burst_diff * bytes_in_beat)  # start
-                    _end = _awaddr + ((_burst_diff + 1) * bytes_in_beat)  # end
-                    self._memory[_st:_end] = array.array('B', word.get_buff())
-                    burst_count -= 1
-                    if burst_count == 0:
-                        break
-                yield clock_re
+    _signals = ["tvalid", "tdata"]
+    _optional_signals = ["tready", "tlast", "tkeep", "tuser", "tid", "tdest"]
+
+    def __init__(self, entity, name, clock, **kwargs):
+        ValidatedBusDriver.__init__(self, entity, name, clock, **kwargs)
+
+        if len(self.bus.tdata) % 8:
+            raise AttributeError("%s has a tdata width of %d bits, which is "
+                                 "not a whole number of bytes" %
+                                 (self.name, len(self.bus.tdata)))
+        self._data_bytes = len(self.bus.tdata) // 8
+
+        self.bus.tvalid <= 0
+        if hasattr(self.bus, "tlast"):
+            self.bus.tlast <= 0
+
+    def _beats(self, frame):
+        """Return the ``(tdata, tkeep)`` value of each beat of *frame*."""
+        width = self._data_bytes
+        full = (1 << width) - 1
+        beats = [(_int_from_bytes(frame[i:i + width]), full)
+                 for i in range(0, len(frame), width)]
+        partial = len(frame) % width
+        if partial:
+            if not hasattr(self.bus, "tkeep"):
+                raise TestError("%s has no tkeep, so can't send a frame of %d "
+                                "bytes on a %d byte bus" %
+                                (self.name, len(frame), width))
+            beats[-1] = (beats[-1][0], (1 << partial) - 1)
+        return beats
 
     @cocotb.coroutine
-    def _read_data(self):
-        clock_re = RisingEdge(self.clock)
-
-        while True:
-            while True:
+    def _send_frame(self, frame, sync=True, tuser=None, tid=None, tdest=None):
+        """Args:
+            frame (bytes): The frame to send.
+            tuser (int or list, optional): Value of ``tuser``, either for all
+                beats or a list of one value per beat.
+            tid (int, optional): Value of ``tid``.
+            tdest (int, optional): Value of ``tdest``.
+        """
+        bus = self.bus
+        clkedge = RisingEdge(self.clock)
+
+        if not isinstance(frame, bytearray):
+            frame = bytearray(frame)
+        beats = self._beats(frame)
+        if isinstance(tuser, (list, tuple)):
+            if len(tuser) != len(beats):
+                raise TestError("%s: %d tuser values for a frame of %d beats" %
+                                (self.name, len(tuser), len(beats)))
+            tusers = tuser
+        else:
+            tusers = None
+            if tuser is not None:
+                bus.tuser <= tuser
+        if tid is not None:
+            bus.tid <= tid
+        if tdest is not None:
+            bus.tdest <= tdest
+
+        has_tkeep = hasattr(bus, "tkeep")
+        has_tlast = hasattr(bus, "tlast")
+        has_tready = hasattr(bus, "tready")
+        last = len(beats) - 1
+        keep = None
+
+        for i, (tdata, tkeep) in enumerate(beats):
+            if i or sync:
+                yield clkedge
+
+            # Insert a gap where valid is low
+            if not self.on:
+                bus.tvalid <= 0
+                for _ in range(self.off):
+                    yield clkedge
+
+                # Grab the next set of on/off values
+                self._next_valids()
+
+            # Consume a valid cycle
+            if self.on is not True and self.on:
+                self.on -= 1
+
+            bus.tdata <= tdata
+            if has_tkeep and tkeep != keep:
+                bus.tkeep <= tkeep
+                keep = tkeep
+            if has_tlast and (i == 0 or i == last):
+                bus.tlast <= int(i == last)
+            if tusers is not None:
+                bus.tuser <= tusers[i]
+            bus.tvalid <= 1
+
+            if has_tready:
                 yield ReadOnly()
-                if self.bus.ARVALID.value:
-                    break
-                yield clock_re
+                while not bus.tready.value:
+                    yield clkedge
+                    yield ReadOnly()
 
-            yield ReadOnly()
-            _araddr = int(self.bus.ARADDR)
-            _arlen = int(self.bus.ARLEN)
-            _arsize = int(self.bus.ARSIZE)
-            _arburst = int(self.bus.ARBURST)
-            _arprot = int(self.bus.ARPROT)
+        yield clkedge
+        bus.tvalid <= 0
+        if has_tlast:
+            bus.tlast <= 0
+
+    @cocotb.coroutine
+    def _send_iterable(self, frame, sync=True):
+        """Args:
+            frame (iterable): Will yield objects with attributes matching the
+                signal names for each individual bus cycle.
+        """
+        clkedge = RisingEdge(self.clock)
+        firstword = True
 
-            burst_length = _arlen + 1
-            bytes_in_beat = self._size_to_bytes_in_beat(_arsize)
+        for word in frame:
+            if not firstword or sync:
+                yield clkedge
+            firstword = False
 
-            word = BinaryValue(n_bits=bytes_in_beat*8, bigEndian=self.big_endian)
+            if not hasattr(word, "tvalid"):
+                self.bus.tvalid <= 1
+            self.bus <= word
 
-            if __debug__:
-                self.log.debug(
-                    "ARADDR  %d\n" % _araddr +
-                    "ARLEN   %d\n" % _arlen +
-                    "ARSIZE  %d\n" % _arsize +
-                    "ARBURST %d\n" % _arburst +
-                    "BURST_LENGTH %d\n" % burst_length +
-                    "Bytes in beat %d\n" % bytes_in_beat)
+            if (not hasattr(word, "tvalid") or word.tvalid) and hasattr(self.bus, "tready"):
+                yield ReadOnly()
+                while not self.bus.tready.value:
+                    yield clkedge
+                    yield ReadOnly()
 
-            burst_count = burst_length
+        yield clkedge
+        self.bus.tvalid <= 0
 
-            yield clock_re
+    @cocotb.coroutine
+    def _driver_send(self, frame, sync=True, tuser=None, tid=None, tdest=None):
+        """Send a frame over the bus.
 
-            while True:
-                self.bus.RVALID <= 1
-                yield ReadOnly()
-                if self.bus.RREADY.value:
-                    _burst_diff = burst_length - burst_count
-                    _st = _araddr + (_burst_diff * bytes_in_beat)
-                    _end = _araddr + ((_burst_diff + 1) * bytes_in_beat)
-                    word.buff = self._memory[_st:_end].tostring()
-                    self.bus.RDATA <= word
-                    if burst_count == 1:
-                        self.bus.RLAST <= 1
-                yield clock_re
-                burst_count -= 1
-                self.bus.RLAST <= 0
-                if burst_count == 0:
-                    break
+        Args:
+            frame (bytes or iterable): Frame to drive onto the bus.
+            tuser (int or list, optional): Value of ``tuser``, either for all
+                beats or a list of one value per beat.
+            tid (int, optional): Value of ``tid`` for the frame.
+            tdest (int, optional): Value of ``tdest`` for the frame.
+
+        If *frame* is :class:`bytes` or a :class:`bytearray`, it is sent as
+        bytes, otherwise it is assumed to yield objects with attributes
+        matching the signal names.
+        """
+        if isinstance(frame, (bytes, bytearray)):
+            self.log.debug("Sending frame of length %d bytes", len(frame))
+            yield self._send_frame(frame, sync=sync, tuser=tuser, tid=tid,
+                                   tdest=tdest)
+        else:
+            yield self._send_iterable(frame, sync=sync)
@@ -32,6 +32,7 @@ See https://www.intel.com/content/dam/www/programmable/us/en/pdfs/literature/man
 NB Currently we only support a very small subset of functionality
 """
 
+import logging
 import random
 
 import cocotb
@@ -40,6 +41,7 @@ from cocotb.triggers import RisingEdge, FallingEdge, ReadOnly, NextTimeStep, Eve
 from cocotb.drivers import BusDriver, ValidatedBusDriver
 from cocotb.utils import hexdump
 from cocotb.binary import BinaryValue
+from cocotb.memory import PagedMemory, _int_from_bytes
 from cocotb.result import ReturnValue, TestError
 
 
@@ -231,7 +233,19 @@ class AvalonMaster(AvalonMM):
 
 
 class AvalonMemory(BusDriver):
-    """Emulate a memory, with back-door access."""
+    """Emulate a memory, with back-door access.
+
+    The contents of the memory are held in *memory*. By default this is a
+    :class:`dict`, which holds a word per address for single accesses and
+    a byte per address for burst accesses.
+
+    A :class:`~cocotb.memory.PagedMemory` is byte-addressed for all accesses,
+    and accesses whole words at a time, which is much faster for large
+    memories. It can also be loaded from and dumped to files.
+
+    The same *memory* can be given to several instances to model
+    a multi-port memory.
+    """
     _signals = ["address"]
     _optional_signals = ["write", "read", "writedata", "readdatavalid",
                          "readdata", "waitrequest", "burstcount", "byteenable"]
@@ -285,6 +299,7 @@ class AvalonMemory(BusDriver):
             self._mem = {}
         else:
             self._mem = memory
+        self._paged = isinstance(self._mem, PagedMemory)
 
         self._val = BinaryValue(n_bits=self._width, bigEndian=False)
         self._readlatency_min = readlatency_min
@@ -361,6 +376,10 @@ class AvalonMemory(BusDriver):
     def _writing_byte_value(self, byteaddr):
         """Writing value in _mem with byteaddr size."""
         yield FallingEdge(self.clock)
+        if self._paged:
+            self._mem.write_word(byteaddr, self.bus.writedata.value.integer,
+                                 self.dataByteSize)
+            return
         for i in range(self.dataByteSize):
             data = self.bus.writedata.value.integer
             addrtmp = byteaddr + i
@@ -397,7 +416,17 @@ class AvalonMemory(BusDriver):
                 if not self._burstread:
                     self._pad()
                     addr = self.bus.address.value.integer
-                    if addr not in self._mem:
+                    if self._paged:
+                        if not self._mem.is_initialised(addr, self.dataByteSize):
+                            self.log.warning("Attempt to read from uninitialised "
+                                             "address 0x%x", addr)
+                            self._responses.append(True)
+                        else:
+                            value = self._mem.read_word(addr, self.dataByteSize)
+                            self.log.debug("Read from address 0x%x returning 0x%x",
+                                           addr, value)
+                            self._responses.append(value)
+                    elif addr not in self._mem:
                         self.log.warning("Attempt to read from uninitialised "
                                          "address 0x%x", addr)
                         self._responses.append(True)
@@ -434,16 +463,25 @@ class AvalonMemory(BusDriver):
                     for i in range(self._avalon_properties["readLatency"]):
                         yield edge
                     for count in range(burstcount):
-                        if (addr + count)*self.dataByteSize not in self._mem:
-                            self.log.warning("Attempt to burst read from uninitialised "
-                                             "address 0x%x (addr 0x%x count 0x%x)",
-                                             (addr + count) * self.dataByteSize, addr, count)
-                            self._responses.append(True)
+                        if self._paged:
+                            byteaddr = (addr + count) * self.dataByteSize
+                            if self._mem.is_initialised(byteaddr, self.dataByteSize):
+                                value = self._mem.read_word(byteaddr, self.dataByteSize)
+                            else:
+                                value = None
+                        elif (addr + count)*self.dataByteSize not in self._mem:
+                            value = None
                         else:
                             value = 0
                             for i in range(self.dataByteSize):
                                 rvalue = self._mem[(addr + count)*self.dataByteSize + i]
                                 value += rvalue << i*8
+                        if value is None:
+                            self.log.warning("Attempt to burst read from uninitialised "
+                                             "address 0x%x (addr 0x%x count 0x%x)",
+                                             (addr + count) * self.dataByteSize, addr, count)
+                            self._responses.append(True)
+                        else:
                             self.log.debug("Read from address 0x%x returning 0x%x",
                                            (addr + count) * self.dataByteSize, value)
                             self._responses.append(value)
@@ -451,7 +489,15 @@ class AvalonMemory(BusDriver):
                         self._do_response()
 
             if self._writeable and self.bus.write.value:
-                if not self._burstwrite:
+                if not self._burstwrite and self._paged:
+                    addr = self.bus.address.value.integer
+                    data = self.bus.writedata.value.integer
+                    byteenable = None
+                    if hasattr(self.bus, "byteenable"):
+                        byteenable = int(self.bus.byteenable.value)
+                    self.log.debug("Write to address 0x%x -> 0x%x", addr, data)
+                    self._mem.write_word(addr, data, self.dataByteSize, byteenable)
+                elif not self._burstwrite:
                     addr = self.bus.address.value.integer
                     data = self.bus.writedata.value.integer
                     if hasattr(self.bus, "byteenable"):
@@ -637,15 +683,14 @@ class AvalonSTPkts(ValidatedBusDriver):
         word.binstr   = "x" * len(self.bus.data)
         single.binstr = "x"
 
-        self.bus.valid <= 0
-        self.bus.data <= word
-        self.bus.startofpacket <= single
-        self.bus.endofpacket <= single
+        # Values driven between packets, reused for every packet
+        self._idle_values = [("data", word), ("startofpacket", single),
+                             ("endofpacket", single)]
 
         if self.use_empty:
             empty = BinaryValue(n_bits=len(self.bus.empty), bigEndian=False,
                                 value="x" * len(self.bus.empty))
-            self.bus.empty <= empty
+            self._idle_values.append(("empty", empty))
 
         if hasattr(self.bus, 'channel'):
             if len(self.bus.channel) > 128:
@@ -658,7 +703,11 @@ class AvalonSTPkts(ValidatedBusDriver):
                                      (self.name, self.config['maxChannel'], maxChannel, len(self.bus.channel)))
             channel = BinaryValue(n_bits=len(self.bus.channel), bigEndian=False,
                                   value="x" * len(self.bus.channel))
-            self.bus.channel <= channel
+            self._idle_values.append(("channel", channel))
+
+        self.bus.valid <= 0
+        for name, value in self._idle_values:
+            getattr(self.bus, name) <= value
 
     @coroutine
     def _wait_ready(self):
@@ -673,6 +722,37 @@ class AvalonSTPkts(ValidatedBusDriver):
             yield RisingEdge(self.clock)
             yield ReadOnly()
 
+    def _pack_string(self, string):
+        """Split a packet into the integer value of each word on the bus.
+
+        Returns:
+            tuple: The list of word values, and the ``empty`` value of the
+            last word.
+        """
+        # FIXME busses that aren't integer numbers of bytes
+        bus_width = len(self.bus.data) // 8
+
+        if isinstance(string, bytearray):
+            data = string
+        elif isinstance(string, bytes):
+            data = bytearray(string)
+        else:
+            data = bytearray(string.encode("latin-1"))
+
+        empty = -len(data) % bus_width
+        length = len(data) + empty
+        if self.config["firstSymbolInHighOrderBits"]:
+            # The first symbol of each word is its most significant byte, so
+            # read little-endian words backwards from the end of the packet
+            data += bytearray(empty)
+            data.reverse()
+            words = [_int_from_bytes(data[length - i - bus_width:length - i])
+                     for i in range(0, length, bus_width)]
+        else:
+            words = [_int_from_bytes(data[i:i + bus_width])
+                     for i in range(0, length, bus_width)]
+        return words, empty
+
     @coroutine
     def _send_string(self, string, sync=True, channel=None):
         """Args:
@@ -681,17 +761,11 @@ class AvalonSTPkts(ValidatedBusDriver):
         """
         # Avoid spurious object creation by recycling
         clkedge = RisingEdge(self.clock)
-        firstword = True
 
-        # FIXME busses that aren't integer numbers of bytes
-        bus_width = int(len(self.bus.data) / 8)
-
-        word = BinaryValue(n_bits=len(self.bus.data),
-                           bigEndian=self.config["firstSymbolInHighOrderBits"])
-
-        single = BinaryValue(n_bits=1, bigEndian=False)
-        if self.use_empty:
-            empty = BinaryValue(n_bits=len(self.bus.empty), bigEndian=False)
+        # Work out every word before the first clock edge, so that the
+        # clocked loop below only has to assign integers
+        words, empty = self._pack_string(string)
+        last = len(words) - 1
 
         # Drive some defaults since we don't know what state we're in
         if self.use_empty:
@@ -703,12 +777,19 @@ class AvalonSTPkts(ValidatedBusDriver):
             self.bus.error <= 0
 
         if hasattr(self.bus, 'channel'):
-            self.bus.channel <= 0
+            if channel is None:
+                channel = 0
+            elif channel > self.config['maxChannel'] or channel < 0:
+                raise TestError("%s: Channel value %d is outside range 0-%d" %
+                                (self.name, channel, self.config['maxChannel']))
+            self.bus.channel <= channel
         elif channel is not None:
             raise TestError("%s does not have a channel signal" % self.name)
 
-        while string:
-            if not firstword or (firstword and sync):
+        has_ready = hasattr(self.bus, "ready")
+
+        for i, word in enumerate(words):
+            if i or sync:
                 yield clkedge
 
             # Insert a gap where valid is low
@@ -725,56 +806,28 @@ class AvalonSTPkts(ValidatedBusDriver):
                 self.on -= 1
 
             self.bus.valid <= 1
-            if hasattr(self.bus, 'channel'):
-                if channel is None:
-                    self.bus.channel <= 0
-                elif channel > self.config['maxChannel'] or channel < 0:
-                    raise TestError("%s: Channel value %d is outside range 0-%d" %
-                                    (self.name, channel, self.config['maxChannel']))
-                else:
-                    self.bus.channel <= channel
 
-            if firstword:
+            if i == 0:
                 self.bus.startofpacket <= 1
-                firstword = False
-            else:
+            elif i == 1:
                 self.bus.startofpacket <= 0
 
-            nbytes = min(len(string), bus_width)
-            data = string[:nbytes]
-            word.buff = data
-
-            if len(string) <= bus_width:
+            if i == last:
                 self.bus.endofpacket <= 1
                 if self.use_empty:
-                    self.bus.empty <= bus_width - len(string)
-                string = ""
-            else:
-                string = string[bus_width:]
+                    self.bus.empty <= empty
 
             self.bus.data <= word
 
             # If this is a bus with a ready signal, wait for this word to
             # be acknowledged
-            if hasattr(self.bus, "ready"):
+            if has_ready:
                 yield self._wait_ready()
 
         yield clkedge
         self.bus.valid <= 0
-        self.bus.endofpacket <= 0
-        word.binstr   = "x" * len(self.bus.data)
-        single.binstr = "x"
-        self.bus.data <= word
-        self.bus.startofpacket <= single
-        self.bus.endofpacket <= single
-
-        if self.use_empty:
-            empty.binstr = "x" * len(self.bus.empty)
-            self.bus.empty <= empty
-        if hasattr(self.bus, 'channel'):
-            channel_value = BinaryValue(n_bits=len(self.bus.channel), bigEndian=False,
-                                        value="x" * len(self.bus.channel))
-            self.bus.channel <= channel_value
+        for name, value in self._idle_values:
+            getattr(self.bus, name) <= value
 
     @coroutine
     def _send_iterable(self, pkt, sync=True):
@@ -822,7 +875,7 @@ class AvalonSTPkts(ValidatedBusDriver):
         """Send a packet over the bus.
 
         Args:
-            pkt (str or iterable): Packet to drive onto the bus.
+            pkt (str, bytes or iterable): Packet to drive onto the bus.
             channel (None or int): Channel attributed to the packet.
 
         If ``pkt`` is a string, we simply send it word by word
@@ -832,9 +885,10 @@ class AvalonSTPkts(ValidatedBusDriver):
         """
 
         # Avoid spurious object creation by recycling
-        if isinstance(pkt, str):
-            self.log.debug("Sending packet of length %d bytes", len(pkt))
-            self.log.debug(hexdump(pkt))
+        if isinstance(pkt, (str, bytes, bytearray)):
+            if self.log.isEnabledFor(logging.DEBUG):
+                self.log.debug("Sending packet of length %d bytes", len(pkt))
+                self.log.debug(hexdump(pkt))
             yield self._send_string(pkt, sync=sync, channel=channel)
             self.log.debug("Successfully sent packet of length %d bytes", len(pkt))
         else:
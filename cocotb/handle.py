@@ -29,7 +29,9 @@
 
 # -*- coding: utf-8 -*-
 
-import ctypes
+import collections
+import re
+import sys
 import warnings
 
 import os
@@ -41,13 +43,169 @@ else:
 
 import cocotb
 from cocotb.binary import BinaryValue
-from cocotb.log import SimLog
+from cocotb.log import SimLog, SimLogAdapter
 from cocotb.result import TestError
-from cocotb.utils import integer_types
+from cocotb.utils import integer_types, lazy_property, _int_from_bytes, _int_to_bytes
 
 # Only issue a warning for each deprecated attribute access
 _deprecation_warned = {}
 
+# A step of a path for SimHandleBase._get: a name, an extended identifier
+# between backslashes or an index in square brackets
+_PATH_STEP = re.compile(r"\.?(\\[^\\]*\\|[^.\[\]\\]+)|\[(-?\d+)\]")
+
+# A write of a whole array, packed for set_array_vals_bulk
+_ArrayWrite = collections.namedtuple("_ArrayWrite", "ranges width nbytes data")
+
+
+def _array_elements(hdl, ranges):
+    """Yield the GPI handles of the elements of an array, in row-major order."""
+    left, right = ranges[0]
+    step = 1 if left <= right else -1
+    for index in range(left, right + step, step):
+        element = simulator.get_handle_by_index(hdl, index)
+        if not element:
+            raise IndexError("Array contains no object at index %d" % index)
+        if len(ranges) > 1:
+            for sub_element in _array_elements(element, ranges[1:]):
+                yield sub_element
+        else:
+            yield element
+
+
+def _get_handle_by_path(hdl, path):
+    """Fallback for simulator libraries without ``get_handle_by_path``."""
+    handles = []
+    for name, index in _PATH_STEP.findall(path):
+        if name:
+            hdl = simulator.get_handle_by_name(hdl, name)
+        else:
+            hdl = simulator.get_handle_by_index(hdl, int(index))
+        if not hdl:
+            break
+        handles.append(hdl)
+    return handles
+
+
+def _leaf_name(name):
+    """The last name in a hierarchical name, which may be an extended identifier."""
+    if len(name) > 1 and name.endswith("\\"):
+        start = name.rfind("\\", 0, -1)
+        if start >= 0:
+            return name[start:]
+    return name.rpartition(".")[2]
+
+
+def _find_handles(hdl, pattern, depth, prefix=""):
+    """Fallback for simulator libraries without ``find_handles``."""
+    import fnmatch
+
+    found = []
+    if depth == 0:
+        return found
+    iterator = simulator.iterate(hdl, simulator.OBJECTS)
+    while True:
+        try:
+            child = simulator.next(iterator)
+        except StopIteration:
+            break
+        name = _leaf_name(simulator.get_name_string(child))
+        path = prefix + "." + name if prefix else name
+        if pattern is None or fnmatch.fnmatchcase(name, pattern):
+            found.append((child, path))
+        child_type = simulator.get_type(child)
+        if child_type in (simulator.MODULE, simulator.STRUCTURE, simulator.GENARRAY):
+            found += _find_handles(child, pattern, depth - 1,
+                                   prefix if child_type == simulator.GENARRAY else path)
+    return found
+
+
+def _get_array_vals_bulk(hdl, ranges, width, nbytes):
+    """Fallback for simulator libraries without ``get_array_vals_bulk``."""
+    data = bytearray()
+    mask = bytearray()
+    for element in _array_elements(hdl, ranges):
+        binstr = simulator.get_signal_val_binstr(element)
+        mask.append(1 if binstr.strip("01") else 0)
+        value = int("".join("1" if c == "1" else "0" for c in binstr) or "0", 2)
+        data += _int_to_bytes(value & ((1 << (8 * nbytes)) - 1), nbytes)
+    return bytes(data), bytes(mask)
+
+
+def _set_array_vals_bulk(hdl, ranges, width, nbytes, data):
+    """Fallback for simulator libraries without ``set_array_vals_bulk``."""
+    elements = list(_array_elements(hdl, ranges))
+    if len(data) != len(elements) * nbytes:
+        raise ValueError("Expected %d bytes for %d elements, got %d" %
+                         (len(elements) * nbytes, len(elements), len(data)))
+    for i, element in enumerate(elements):
+        value = _int_from_bytes(data[i * nbytes:(i + 1) * nbytes])
+        simulator.set_signal_val_str(element, format(value, "0%db" % width)[-width:])
+
+
+def _element_bytes(width):
+    """Bytes of the little-endian word holding an element of *width* bits."""
+    for nbytes in (1, 2, 4, 8):
+        if width <= 8 * nbytes:
+            return nbytes
+    return 8 * ((width + 63) // 64)
+
+
+def _flatten(values, shape):
+    """Flatten nested sequences of *shape*, in row-major order."""
+    if len(values) != shape[0]:
+        raise ValueError("Expected %d values, got %d" % (shape[0], len(values)))
+    if len(shape) == 1:
+        return list(values)
+    return [value for sub in values for value in _flatten(sub, shape[1:])]
+
+
+class ReadCache(object):
+    """Cache of the values of signals read while the scheduler reacts to a trigger.
+
+    Monitors, scoreboards and :attr:`~cocotb.monitors.BusMonitor.in_reset`
+    often read the same signals in the same :class:`~cocotb.triggers.ReadOnly`
+    phase. With the cache enabled, the first read of a signal asks the
+    simulator for its value and the next ones reuse it until the scheduler
+    reacts to another trigger or a value is written. Each read still returns
+    a new :class:`~cocotb.binary.BinaryValue`, which may be modified.
+
+    Only signals read as a :class:`~cocotb.binary.BinaryValue` are cached. The
+    cache of the simulation is :data:`cocotb.handle.read_cache`, enabled by
+    setting :envvar:`COCOTB_READ_CACHE` or :attr:`enabled`.
+
+    Attributes:
+        enabled (bool): Whether reads are cached.
+        hits (int): The number of reads answered from the cache.
+        misses (int): The number of reads which asked the simulator.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._values = {}
+
+    def invalidate(self):
+        """Forget the values read so far, as they may have changed."""
+        if self._values:
+            self._values.clear()
+
+    def reset_stats(self):
+        """Reset :attr:`hits` and :attr:`misses` to 0."""
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def hit_rate(self):
+        """The fraction of reads answered from the cache."""
+        reads = self.hits + self.misses
+        return float(self.hits) / reads if reads else 0.0
+
+
+#: The :class:`ReadCache` of the simulation.
+read_cache = ReadCache(enabled=os.getenv("COCOTB_READ_CACHE", "0") not in ("", "0"))
+
 
 class SimHandleBase(object):
     """Base class for all simulation objects.
@@ -75,15 +233,89 @@ class SimHandleBase(object):
         self._len = None
         self._sub_handles = {}  # Dictionary of children
         self._invalid_sub_handles = {}  # Dictionary of invalid queries
-
-        self._name = simulator.get_name_string(self._handle)
-        self._type = simulator.get_type_string(self._handle)
-        self._fullname = self._name + "(%s)" % self._type
         self._path = self._name if path is None else path
-        self._log = SimLog("cocotb.%s" % self._name)
-        self._log.debug("Created")
-        self._def_name = simulator.get_definition_name(self._handle)
-        self._def_file = simulator.get_definition_file(self._handle)
+
+    # Most objects never log or have their type or definition asked for, so
+    # these are only looked up on first use
+
+    @lazy_property
+    def _name(self):
+        return simulator.get_name_string(self._handle)
+
+    @lazy_property
+    def _type(self):
+        return simulator.get_type_string(self._handle)
+
+    @lazy_property
+    def _fullname(self):
+        return self._name + "(%s)" % self._type
+
+    @lazy_property
+    def _def_name(self):
+        return simulator.get_definition_name(self._handle)
+
+    @lazy_property
+    def _def_file(self):
+        return simulator.get_definition_file(self._handle)
+
+    @lazy_property
+    def _log(self):
+        # Objects of the same name share a logger, and records carry the path
+        return SimLogAdapter(SimLog("cocotb.%s" % self._name), {"sim_path": self._path})
+
+    def _get(self, path):
+        """Return the object at *path* below this one.
+
+        The objects along *path* are found with a single simulator call, and
+        cached as if each had been accessed with ``.`` or ``[]``, so that
+        ``dut._get("a.b[3].c")`` is ``dut.a.b[3].c``. Extended identifiers
+        are written between backslashes.
+
+        Raises:
+            AttributeError: If there is no object of one of the names.
+            IndexError: If there is no object at one of the indices.
+            ValueError: If *path* is not a valid path.
+        """
+        steps = []
+        pos = 0
+        for match in _PATH_STEP.finditer(path):
+            if match.start() != pos:
+                break
+            name, index = match.groups()
+            steps.append(name if name else int(index))
+            pos = match.end()
+        if pos != len(path) or not path:
+            raise ValueError("Invalid path %r" % path)
+
+        # Start from the deepest object already found
+        obj = self
+        for i, step in enumerate(steps):
+            sub_handle = obj._sub_handles.get(step)
+            if sub_handle is None or isinstance(sub_handle, list):
+                break
+            obj = sub_handle
+        else:
+            return obj
+
+        steps = steps[i:]
+        rest = "".join("[%d]" % step if isinstance(step, int) else "." + step
+                       for step in steps)
+        get_handle_by_path = getattr(simulator, "get_handle_by_path", _get_handle_by_path)
+        handles = get_handle_by_path(obj._handle, rest.lstrip("."))
+        for step, new_handle in zip(steps, handles):
+            if isinstance(step, int):
+                sub_path = obj._path + "[" + str(step) + "]"
+            else:
+                sub_path = obj._path + "." + step
+            sub_handle = SimHandle(new_handle, sub_path)
+            obj._sub_handles[step] = sub_handle
+            obj = sub_handle
+        if len(handles) < len(steps):
+            step = steps[len(handles)]
+            if isinstance(step, int):
+                raise IndexError("%s contains no object at index %d" % (obj._fullname, step))
+            raise AttributeError("%s contains no object named %s" % (obj._name, step))
+        return obj
 
     def get_definition_name(self):
         return object.__getattribute__(self, "_def_name")
@@ -205,6 +437,45 @@ class RegionObject(SimHandleBase):
 
         self._discovered = True
 
+    def _find(self, pattern, depth=None):
+        """Return the objects below this one whose names match *pattern*.
+
+        The hierarchy is searched by the simulator library, and only the
+        objects which match are created, which is much faster than iterating
+        over every object.
+
+        Args:
+            pattern: A glob pattern such as ``"*_valid"``, with the wildcards
+                of :func:`fnmatch.fnmatchcase`, or a compiled regular
+                expression, which is matched with its ``match`` method. The
+                name of an object doesn't include the names above it.
+            depth (int, optional): The number of levels of hierarchy to
+                search, 1 for only the objects directly below this one.
+                Defaults to all levels.
+
+        Returns:
+            list: The objects found, in the order they are iterated over.
+        """
+        regex = pattern if hasattr(pattern, "match") else None
+        find_handles = getattr(simulator, "find_handles", _find_handles)
+        found = find_handles(self._handle, None if regex else pattern,
+                             -1 if depth is None else depth)
+
+        # The names of the elements of a generate array include its name
+        prefix = self._path
+        if type(self) is HierarchyArrayObject:
+            prefix = prefix.rpartition(".")[0] or prefix
+
+        result = []
+        for hdl, path in found:
+            if regex is not None and not regex.match(_leaf_name(path)):
+                continue
+            try:
+                result.append(SimHandle(hdl, prefix + "." + path))
+            except TestError as e:
+                self._log.debug("%s", e)
+        return result
+
     def _child_path(self, name):
         """Returns a string of the path of the child :any:`SimHandle` for a given name."""
         return self._path + "." + name
@@ -241,6 +512,17 @@ class HierarchyObject(RegionObject):
                 if len(sub) != len(value):
                     raise IndexError("Attempting to set %s with list length %d but target has length %d" % (
                         name, len(value), len(sub)))
+                # A list of ints for a one dimensional array of logic vectors
+                # indexed from 0 is written with a single call, value[idx] to
+                # sub[idx]
+                try:
+                    ranges, _, _ = sub._array_layout()
+                except TypeError:
+                    ranges = None
+                if (ranges is not None and len(ranges) == 1 and min(ranges[0]) == 0 and
+                        all(isinstance(v, integer_types) for v in value)):
+                    sub.write_array(value if ranges[0][0] == 0 else value[::-1])
+                    return
                 for idx in range(len(value)):
                     sub[idx] = value[idx]
                 return
@@ -521,6 +803,123 @@ class NonHierarchyIndexableObject(NonHierarchyObject):
             pass
 
 
+    def _array_layout(self):
+        """Return the ``(left, right)`` range of each dimension, the width of the
+        elements and the number of bytes they are packed in."""
+        if type(self) is not NonHierarchyIndexableObject:
+            raise TypeError("%s is not an array" % self._fullname)
+        ranges = []
+        element = self
+        while type(element) is NonHierarchyIndexableObject:
+            if element._range is None:
+                raise TypeError("%s is not indexable" % element._fullname)
+            ranges.append(element._range)
+            element = element[element._range[0]]
+        # Integers, enums, reals and strings have their own value conversions
+        if type(element) is not ModifiableObject:
+            raise TypeError("%s is not an array of logic vectors" % self._fullname)
+        width = len(simulator.get_signal_val_binstr(element._handle))
+        return ranges, width, _element_bytes(width)
+
+    def _read_array_bytes(self, ranges, width, nbytes):
+        """Return the elements packed as little-endian words, and a byte for
+        each which is 1 if its value is not resolved."""
+        get_array_vals_bulk = getattr(simulator, "get_array_vals_bulk", _get_array_vals_bulk)
+        return get_array_vals_bulk(self._handle, ranges, width, nbytes)
+
+    def _write_array_bytes(self, ranges, width, nbytes, data):
+        """Schedule a write of the elements packed as little-endian words."""
+        scheduler = cocotb.scheduler
+        # Writes to elements made earlier are replaced by this one, and made
+        # later, are applied after it
+        for element in self._accessed_elements():
+            scheduler._discard_write(element)
+        scheduler.save_write(self, _ArrayWrite(ranges, width, nbytes, data))
+
+    def _accessed_elements(self):
+        """Iterate over the handles of the elements accessed so far, at any depth."""
+        pending = list(self._sub_handles.values())
+        while pending:
+            element = pending.pop()
+            yield element
+            pending.extend(element._sub_handles.values())
+
+    def read_array(self):
+        """Read all the elements of this array in a single simulator call.
+
+        Requires :mod:`numpy`. Multi-dimensional arrays are read as a whole,
+        and the elements of each dimension are in order from the left of its
+        range.
+
+        Returns:
+            numpy.ndarray: The elements, of type ``uint8``, ``uint16``,
+            ``uint32`` or ``uint64``, the smallest which fits them, or Python
+            ints if they are wider than 64 bits. If the value of any element
+            is not resolved, it is masked in a :class:`numpy.ma.MaskedArray`.
+
+        Raises:
+            TypeError: If this is not an array of logic vectors.
+        """
+        import numpy as np
+
+        ranges, width, nbytes = self._array_layout()
+        data, mask = self._read_array_bytes(ranges, width, nbytes)
+
+        shape = tuple(abs(left - right) + 1 for left, right in ranges)
+        if nbytes <= 8:
+            values = np.frombuffer(data, dtype="<u%d" % nbytes).reshape(shape).copy()
+        else:
+            values = np.array([_int_from_bytes(data[i:i + nbytes])
+                               for i in range(0, len(data), nbytes)],
+                              dtype=object).reshape(shape)
+        mask = np.frombuffer(mask, dtype=np.bool_).reshape(shape)
+        if mask.any():
+            return np.ma.masked_array(values, mask=mask.copy())
+        return values
+
+    def write_array(self, values):
+        """Write all the elements of this array in a single simulator call.
+
+        As for other signals, the write takes place in the next
+        :class:`~cocotb.triggers.ReadWrite` phase.
+
+        Args:
+            values: A :class:`numpy.ndarray` or nested sequences of ints,
+                with the shape of the array, in the order of
+                :meth:`read_array`. Only the bits which fit in an element
+                are written.
+
+        Raises:
+            TypeError: If this is not an array of logic vectors.
+            ValueError: If *values* doesn't have the shape of the array.
+        """
+        ranges, width, nbytes = self._array_layout()
+        shape = tuple(abs(left - right) + 1 for left, right in ranges)
+
+        np = sys.modules.get("numpy")
+        if (np is not None and isinstance(values, np.ndarray) and nbytes <= 8 and
+                values.dtype.kind in "iub"):
+            if values.shape != shape:
+                raise ValueError("Expected values of shape %s, got %s" % (shape, values.shape))
+            data = np.ascontiguousarray(values.astype("<u%d" % nbytes)).tobytes()
+        else:
+            mask = (1 << (8 * nbytes)) - 1
+            data = b"".join(_int_to_bytes(int(value) & mask, nbytes)
+                            for value in _flatten(values, shape))
+        self._write_array_bytes(ranges, width, nbytes, data)
+
+    def setimmediatevalue(self, value):
+        """Write an array as scheduled by :meth:`write_array`."""
+        if cocotb.scheduler.skip_redundant_writes:
+            # The values last written to the elements are no longer driven
+            last_written = cocotb.scheduler._last_written
+            for element in self._accessed_elements():
+                last_written.pop(element._handle, None)
+        if type(self) is not NonHierarchyIndexableObject or not isinstance(value, _ArrayWrite):
+            return NonHierarchyObject.setimmediatevalue(self, value)
+        set_array_vals_bulk = getattr(simulator, "set_array_vals_bulk", _set_array_vals_bulk)
+        set_array_vals_bulk(self._handle, value.ranges, value.width, value.nbytes, value.data)
+
     def _range_iter(self, left, right):
         try:
             if left > right:
@@ -584,11 +983,18 @@ class ModifiableObject(NonConstantObject):
             TypeError: If target is not wide enough or has an unsupported type
                  for value assignment.
         """
+        read_cache.invalidate()
+        if cocotb.scheduler.skip_redundant_writes:
+            # The value last written by the scheduler is no longer driven
+            cocotb.scheduler._last_written.pop(self._handle, None)
         if isinstance(value, integer_types) and value < 0x7fffffff and len(self) <= 32:
             simulator.set_signal_val_long(self._handle, value)
             return
 
-        if isinstance(value, ctypes.Structure):
+        # ctypes is only imported when needed; if it hasn't been imported
+        # yet, value can't be a ctypes.Structure
+        ctypes = sys.modules.get("ctypes")
+        if ctypes is not None and isinstance(value, ctypes.Structure):
             value = BinaryValue(value=cocotb.utils.pack(value), n_bits=len(self))
         elif isinstance(value, integer_types):
             value = BinaryValue(value=value, n_bits=len(self), bigEndian=False)
@@ -614,9 +1020,19 @@ class ModifiableObject(NonConstantObject):
         simulator.set_signal_val_str(self._handle, value.binstr)
 
     def _getvalue(self):
-        binstr = simulator.get_signal_val_binstr(self._handle)
-        result = BinaryValue(binstr, len(binstr))
-        return result
+        cache = read_cache
+        if cache.enabled:
+            try:
+                binstr = cache._values[self._handle]
+            except KeyError:
+                cache.misses += 1
+                binstr = cache._values[self._handle] = \
+                    simulator.get_signal_val_binstr(self._handle)
+            else:
+                cache.hits += 1
+        else:
+            binstr = simulator.get_signal_val_binstr(self._handle)
+        return BinaryValue(binstr, len(binstr))
 
     def _setcachedvalue(self, value):
         """Intercept the store of a value and hold in cache.
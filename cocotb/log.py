@@ -95,11 +95,116 @@ class SimBaseLog(logging.getLoggerClass()):
         return self
 
 
+class SimLogAdapter(logging.LoggerAdapter):
+    """A logger for one of many objects which share a logger.
+
+    The attributes in *extra* are added to each record logged, so that the
+    object can be told apart without a logger of its own, which would never
+    be freed. A level set with :meth:`setLevel` only applies to this object,
+    other attributes, such as handlers, are those of the shared logger.
+    """
+
+    def __init__(self, logger, extra):
+        logging.LoggerAdapter.__init__(self, logger, extra)
+        self._level = logging.NOTSET
+
+    def process(self, msg, kwargs):
+        if "extra" in kwargs:
+            extra = dict(self.extra)
+            extra.update(kwargs["extra"])
+            kwargs["extra"] = extra
+        else:
+            kwargs["extra"] = self.extra
+        return msg, kwargs
+
+    def __getattr__(self, name):
+        if name == "logger":
+            raise AttributeError(name)
+        return getattr(self.logger, name)
+
+    @property
+    def level(self):
+        return self._level
+
+    def setLevel(self, level):
+        """Set the level of this object's records, ``NOTSET`` for the level
+        of the shared logger."""
+        self._level = logging._checkLevel(level)
+
+    def getEffectiveLevel(self):
+        return self._level or self.logger.getEffectiveLevel()
+
+    def isEnabledFor(self, level):
+        if self.logger.manager.disable >= level:
+            return False
+        return level >= self.getEffectiveLevel()
+
+    def log(self, level, msg, *args, **kwargs):
+        if self.isEnabledFor(level):
+            msg, kwargs = self.process(msg, kwargs)
+            self._log(level, msg, args, **kwargs)
+
+    def debug(self, msg, *args, **kwargs):
+        self.log(logging.DEBUG, msg, *args, **kwargs)
+
+    def info(self, msg, *args, **kwargs):
+        self.log(logging.INFO, msg, *args, **kwargs)
+
+    def warning(self, msg, *args, **kwargs):
+        self.log(logging.WARNING, msg, *args, **kwargs)
+
+    warn = warning
+
+    def error(self, msg, *args, **kwargs):
+        self.log(logging.ERROR, msg, *args, **kwargs)
+
+    def exception(self, msg, *args, **kwargs):
+        kwargs.setdefault("exc_info", True)
+        self.log(logging.ERROR, msg, *args, **kwargs)
+
+    def critical(self, msg, *args, **kwargs):
+        self.log(logging.CRITICAL, msg, *args, **kwargs)
+
+    def _log(self, level, msg, args, exc_info=None, extra=None, **kwargs):
+        # The shared logger would drop records below its own level, so the
+        # record is made here, as Logger._log does
+        filename, lineno, function = _find_caller()
+        if exc_info:
+            if isinstance(exc_info, BaseException):
+                exc_info = (type(exc_info), exc_info,
+                            getattr(exc_info, "__traceback__", None))
+            elif not isinstance(exc_info, tuple):
+                exc_info = sys.exc_info()
+        record = self.logger.makeRecord(self.logger.name, level, filename, lineno,
+                                        msg, args, exc_info, function, extra)
+        self.logger.handle(record)
+
+
+def _find_caller():
+    """Return the file, line and function logging, outside of this module
+    and :mod:`logging`."""
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = os.path.normcase(frame.f_code.co_filename)
+        if filename not in _logging_files:
+            return frame.f_code.co_filename, frame.f_lineno, frame.f_code.co_name
+        frame = frame.f_back
+    return "(unknown file)", 0, "(unknown function)"
+
+
+_logging_files = (os.path.normcase(_find_caller.__code__.co_filename),
+                  logging._srcfile)
+
+
 # this used to be a class, hence the unusual capitalization
 def SimLog(name, ident=None):
-    """ Like logging.getLogger, but append a numeric identifier to the name """
+    """ Like logging.getLogger, but append a numeric identifier to the name
+
+    The identifier is passed with each record as ``sim_ident``, and the logger
+    of *name* is shared by all the identifiers, see :class:`SimLogAdapter`.
+    """
     if ident is not None:
-        name = "%s.0x%x" % (name, ident)
+        return SimLogAdapter(logging.getLogger(name), {"sim_ident": ident})
     return logging.getLogger(name)
 
 
@@ -124,7 +229,14 @@ class SimLogFormatter(logging.Formatter):
         simtime = "%6.2fns" % (time_ns)
         prefix = simtime.rjust(11) + ' ' + level + ' '
         if not _suppress:
-            prefix += self.ljust(record.name, _RECORD_CHARS) + \
+            name = record.name
+            path = getattr(record, "sim_path", None)
+            if path is not None:
+                name = "cocotb.%s" % path
+            ident = getattr(record, "sim_ident", None)
+            if ident is not None:
+                name = "%s.0x%x" % (name, ident)
+            prefix += self.ljust(name, _RECORD_CHARS) + \
                       self.rjust(os.path.split(record.filename)[1], _FILENAME_CHARS) + \
                       ':' + self.ljust(str(record.lineno), _LINENO_CHARS) + \
                       ' in ' + self.ljust(str(record.funcName), _FUNCNAME_CHARS) + ' '
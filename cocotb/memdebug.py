@@ -25,14 +25,166 @@ ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
 (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
 SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE. '''
 
-import cherrypy
-import dowser
+"""Debugging of the memory usage of the Python side of cocotb.
+
+:func:`start` serves an interactive view of the heap over HTTP (see
+:envvar:`MEMCHECK`), while :class:`MemoryTracker` reports the growth of the
+heap over each test of a regression (see :envvar:`COCOTB_MEMTRACE`).
+"""
+
+import gc
+import os
 
 
 def start(port):
+    import cherrypy
+    import dowser
+
     cherrypy.tree.mount(dowser.Root())
     cherrypy.config.update({
         'environment': 'embedded',
         'server.socket_port': port
     })
     cherrypy.engine.start()
+
+
+def _parse_size(size):
+    """Parse a size in bytes with an optional ``K``, ``M`` or ``G`` suffix."""
+    size = size.strip().upper()
+    multiplier = 1
+    for suffix, m in (("K", 1 << 10), ("M", 1 << 20), ("G", 1 << 30)):
+        if size.endswith(suffix):
+            size = size[:-1]
+            multiplier = m
+            break
+    return int(float(size) * multiplier)
+
+
+def _format_size(size):
+    if abs(size) < 1024:
+        return "%d B" % size
+    for unit in ("KiB", "MiB"):
+        size /= 1024.0
+        if abs(size) < 1024:
+            return "%.1f %s" % (size, unit)
+    return "%.1f GiB" % (size / 1024.0)
+
+
+class MemoryTracker(object):
+    """Track the growth of the Python heap over each test using :mod:`tracemalloc`.
+
+    A snapshot of the heap is taken when each test starts and again once it
+    has completed and the scheduler has been cleaned up. The difference is
+    reported by allocating file and line, together with the number of
+    coroutines and triggers that survived the test.
+
+    Args:
+        top (int, optional): Number of allocation sites to report per test.
+        limit (int, optional): Heap growth in bytes above which a test is
+            considered to leak. Defaults to ``None``, meaning tests never
+            fail because of their memory usage.
+        frames (int, optional): Number of stack frames to record per
+            allocation; more frames make the report slower but more precise.
+
+    Raises:
+        ImportError: If :mod:`tracemalloc` is not available (Python < 3.4).
+    """
+
+    def __init__(self, top=10, limit=None, frames=1):
+        import tracemalloc
+        from cocotb.log import SimLog
+
+        self._tracemalloc = tracemalloc
+        self.top = top
+        self.limit = limit
+        self.frames = frames
+        self.log = SimLog("cocotb.memdebug")
+        self._snapshot = None
+        self._counts = None
+        self._filters = [
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<unknown>"),
+        ]
+
+    @classmethod
+    def from_environment(cls):
+        """Create a tracker configured by the ``COCOTB_MEMTRACE*`` variables.
+
+        Returns ``None`` if :envvar:`COCOTB_MEMTRACE` is not set.
+        """
+        if os.getenv("COCOTB_MEMTRACE", "0") in ("", "0"):
+            return None
+        limit = os.getenv("COCOTB_MEMTRACE_LIMIT")
+        return cls(top=int(os.getenv("COCOTB_MEMTRACE_TOP", "10")),
+                   limit=_parse_size(limit) if limit else None,
+                   frames=int(os.getenv("COCOTB_MEMTRACE_FRAMES", "1")))
+
+    def start(self):
+        if not self._tracemalloc.is_tracing():
+            self._tracemalloc.start(self.frames)
+
+    def stop(self):
+        self._tracemalloc.stop()
+        self._snapshot = None
+
+    def _take_snapshot(self):
+        gc.collect()
+        return self._tracemalloc.take_snapshot().filter_traces(self._filters)
+
+    @staticmethod
+    def _count_objects():
+        """Count live coroutines, other than tests, and live triggers."""
+        from cocotb.decorators import RunningCoroutine, RunningTest
+        from cocotb.triggers import Trigger
+
+        coroutines = 0
+        triggers = 0
+        for obj in gc.get_objects():
+            if isinstance(obj, RunningCoroutine):
+                if not isinstance(obj, RunningTest):
+                    coroutines += 1
+            elif isinstance(obj, Trigger):
+                triggers += 1
+        return coroutines, triggers
+
+    def test_started(self, test):
+        """Record the state of the heap before *test* runs."""
+        self._counts = self._count_objects()
+        self._snapshot = self._take_snapshot()
+
+    def test_finished(self, test):
+        """Report the growth of the heap since :meth:`test_started`.
+
+        Returns:
+            int: The number of bytes by which the heap grew, or ``None``
+            if no snapshot was taken when the test started.
+        """
+        if self._snapshot is None:
+            return None
+        snapshot = self._take_snapshot()
+        stats = snapshot.compare_to(self._snapshot, "lineno")
+        self._snapshot = None
+        growth = sum(stat.size_diff for stat in stats)
+
+        coroutines, triggers = self._count_objects()
+        coroutines -= self._counts[0]
+        triggers -= self._counts[1]
+
+        lines = ["Heap grew by %s during %s (%d coroutines, %d triggers "
+                 "more than before the test)" %
+                 (_format_size(growth), test.funcname, coroutines, triggers)]
+        growing = [stat for stat in stats if stat.size_diff > 0]
+        for stat in growing[:self.top]:
+            frame = stat.traceback[0]
+            lines.append("  %10s in %6d blocks  %s:%d" %
+                         ("+" + _format_size(stat.size_diff), stat.count_diff,
+                          frame.filename, frame.lineno))
+        self.log.info("\n".join(lines))
+        return growth
+
+    def leaked(self, growth):
+        """Whether a heap growth of *growth* bytes exceeds the leak limit."""
+        return (self.limit is not None and growth is not None and
+                growth > self.limit)
@@ -0,0 +1,540 @@
+"""
+Models of memories, to be shared by the drivers of memory-mapped busses.
+
+Unlike a :class:`dict` keyed by address, :class:`PagedMemory` stores bytes in
+:class:`bytearray` pages, so that large images can be loaded, accessed a word
+at a time and dumped efficiently.
+
+Images are copied between a :class:`PagedMemory` and a memory in the design,
+such as a Verilog ``reg`` array, with :func:`load_ram` and :func:`dump_ram`.
+"""
+import binascii
+import mmap
+import os
+import re
+import struct
+
+from cocotb.utils import _int_from_bytes, _int_to_bytes
+
+# Comments of $readmemh files, in the syntax of Verilog
+_MEMH_COMMENT = re.compile(r"//[^\n]*|/\*.*?\*/", re.S)
+
+_PT_LOAD = 1
+
+
+def _swap_words(data, size):
+    """Reverse the order of the bytes within each word of *size* bytes."""
+    if size == 1:
+        return bytearray(data)
+    result = bytearray(len(data))
+    for i in range(size):
+        result[i::size] = data[size - 1 - i::size]
+    return result
+
+
+def _resize_words(data, size, new_size):
+    """Pad or truncate each little-endian word of *size* bytes to *new_size*."""
+    if size == new_size:
+        return bytearray(data)
+    count = len(data) // size
+    result = bytearray(count * new_size)
+    for i in range(min(size, new_size)):
+        result[i::new_size] = data[i::size]
+    return result
+
+
+def _reverse_words(data, size):
+    """Reverse the order of the words of *size* bytes."""
+    return bytearray().join(data[i:i + size] for i in range(len(data) - size, -1, -size))
+
+
+class PagedMemory(object):
+    """Byte-addressed sparse memory backed by :class:`bytearray` pages.
+
+    Pages are allocated when first written, so only the parts of a large
+    address space which are used take up memory. A page is considered
+    initialised as a whole once any byte in it has been written, unwritten
+    bytes of it read as *fill*.
+
+    With *filename*, the whole memory is instead a memory-mapped file of
+    *size* bytes, created if it does not exist, which is entirely
+    initialised. This suits images of several GB which should not be read
+    into memory.
+
+    The same instance can be given to several drivers to model a multi-port
+    memory.
+
+    Args:
+        size (int, optional): Size of the address space in bytes. Accesses
+            beyond it raise :exc:`IndexError`. Defaults to unlimited, unless
+            *filename* is given.
+        page_size (int, optional): Size of a page in bytes, a power of two.
+        fill (int, optional): Value of the bytes of a page not yet written.
+        filename (str, optional): File to memory-map instead of using pages.
+            If *size* is not given, the size of the existing file is used.
+    """
+
+    def __init__(self, size=None, page_size=1 << 16, fill=0, filename=None):
+        if page_size & (page_size - 1):
+            raise ValueError("page_size must be a power of two, got %d" % page_size)
+        self.size = size
+        self.page_size = page_size
+        self._shift = page_size.bit_length() - 1
+        self._mask = page_size - 1
+        self._blank = bytearray([fill]) * page_size
+        self._pages = {}
+        self._mmap = None
+
+        if filename is not None:
+            if size is None:
+                size = os.path.getsize(filename)
+            mode = "r+b" if os.path.exists(filename) else "w+b"
+            with open(filename, mode) as f:
+                if os.path.getsize(filename) < size:
+                    f.truncate(size)
+                self._mmap = mmap.mmap(f.fileno(), size)
+            self.size = size
+
+    def close(self):
+        """Flush and unmap the file given as *filename*, if any."""
+        if self._mmap is not None:
+            self._mmap.flush()
+            self._mmap.close()
+            self._mmap = None
+
+    def _check(self, address, length):
+        if address < 0 or (self.size is not None and address + length > self.size):
+            raise IndexError("Access of %d bytes at 0x%x is outside the memory "
+                             "of %s bytes" % (length, address, self.size))
+
+    def _chunks(self, address, length):
+        """Split an access into ``(page, offset, start, end)`` for each page."""
+        pos = 0
+        while pos < length:
+            page = (address + pos) >> self._shift
+            offset = (address + pos) & self._mask
+            n = min(self.page_size - offset, length - pos)
+            yield page, offset, pos, pos + n
+            pos += n
+
+    def read(self, address, length):
+        """Read *length* bytes starting at *address*.
+
+        Returns:
+            bytearray: The bytes read.
+        """
+        self._check(address, length)
+        if self._mmap is not None:
+            return bytearray(self._mmap[address:address + length])
+        result = bytearray(length)
+        for page, offset, start, end in self._chunks(address, length):
+            buf = self._pages.get(page, self._blank)
+            result[start:end] = buf[offset:offset + end - start]
+        return result
+
+    def write(self, address, data):
+        """Write the bytes-like *data* starting at *address*."""
+        length = len(data)
+        self._check(address, length)
+        if self._mmap is not None:
+            self._mmap[address:address + length] = bytes(data)
+            return
+        data = memoryview(data)
+        for page, offset, start, end in self._chunks(address, length):
+            try:
+                buf = self._pages[page]
+            except KeyError:
+                buf = self._pages[page] = bytearray(self._blank)
+            buf[offset:offset + end - start] = data[start:end]
+
+    def read_word(self, address, size):
+        """Read a little-endian word of *size* bytes at *address*."""
+        if self._mmap is None and (address & self._mask) + size <= self.page_size:
+            # fast path for a word within a page
+            self._check(address, size)
+            buf = self._pages.get(address >> self._shift, self._blank)
+            offset = address & self._mask
+            return _int_from_bytes(buf[offset:offset + size])
+        return _int_from_bytes(self.read(address, size))
+
+    def write_word(self, address, value, size, byteenable=None):
+        """Write a little-endian word of *size* bytes at *address*.
+
+        Args:
+            byteenable (int, optional): Bit *i* set enables writing byte *i*
+                of the word. Defaults to writing all bytes.
+        """
+        if byteenable is not None and byteenable != (1 << size) - 1:
+            mask = 0
+            for i in range(size):
+                if byteenable >> i & 1:
+                    mask |= 0xff << (8 * i)
+            value = (value & mask) | (self.read_word(address, size) & ~mask)
+        self.write(address, _int_to_bytes(value & ((1 << (8 * size)) - 1), size))
+
+    def is_initialised(self, address, length=1):
+        """Whether all of the *length* bytes at *address* have been written."""
+        if self._mmap is not None or length <= 0:
+            return address >= 0 and address + length <= self.size
+        first = address >> self._shift
+        last = (address + length - 1) >> self._shift
+        return all(page in self._pages for page in range(first, last + 1))
+
+    def __contains__(self, address):
+        return self.is_initialised(address)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            if key.step not in (None, 1):
+                raise ValueError("PagedMemory slices must be contiguous")
+            start = key.start or 0
+            stop = self.size if key.stop is None else key.stop
+            if stop is None:
+                raise ValueError("A PagedMemory without a size cannot be "
+                                 "sliced without an end")
+            return self.read(start, max(0, stop - start))
+        return self.read(key, 1)[0]
+
+    def __setitem__(self, key, value):
+        if isinstance(key, slice):
+            start = key.start or 0
+            if key.step not in (None, 1):
+                raise ValueError("PagedMemory slices must be contiguous")
+            if key.stop is not None and key.stop - start != len(value):
+                raise ValueError("Cannot resize a PagedMemory")
+            self.write(start, value)
+        else:
+            self.write(key, bytearray([value]))
+
+    def clear(self):
+        """Forget all pages written so far."""
+        self._pages.clear()
+
+    def load(self, filename, address=0, chunk_size=1 << 20):
+        """Copy the contents of a binary file into memory at *address*.
+
+        Returns:
+            int: The number of bytes loaded.
+        """
+        total = 0
+        with open(filename, "rb") as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                self.write(address + total, chunk)
+                total += len(chunk)
+        return total
+
+    def dump(self, filename, address, length, chunk_size=1 << 20):
+        """Write *length* bytes of memory starting at *address* to a binary file.
+
+        Returns:
+            int: The CRC-32 of the bytes written, as :meth:`checksum`.
+        """
+        crc = 0
+        with open(filename, "wb") as f:
+            for pos in range(0, length, chunk_size):
+                chunk = bytes(self.read(address + pos, min(chunk_size, length - pos)))
+                crc = binascii.crc32(chunk, crc)
+                f.write(chunk)
+        return crc & 0xffffffff
+
+    def checksum(self, address, length, chunk_size=1 << 20):
+        """Return the CRC-32 of *length* bytes of memory starting at *address*.
+
+        The CRC is the one of :func:`zlib.crc32`, so that it can be compared
+        with the checksum of a file.
+        """
+        crc = 0
+        for pos in range(0, length, chunk_size):
+            crc = binascii.crc32(bytes(self.read(address + pos, min(chunk_size, length - pos))), crc)
+        return crc & 0xffffffff
+
+    def load_memh(self, filename, word_size=1, address=0):
+        """Load a hex image in the format read by the Verilog ``$readmemh`` task.
+
+        Word *i* of the image is stored as *word_size* little-endian bytes at
+        ``address + i * word_size``. ``@`` directives set the index of the
+        next word, ``//`` and ``/* */`` comments are skipped, and X and Z
+        digits are loaded as 0.
+
+        Returns:
+            int: The number of bytes loaded.
+        """
+        with open(filename) as f:
+            tokens = _MEMH_COMMENT.sub(" ", f.read()).split()
+        digits = 2 * word_size
+        total = 0
+        index = 0
+        run = []
+
+        def flush():
+            hexstr = "".join(word.replace("_", "").zfill(digits)[-digits:] for word in run)
+            hexstr = re.sub("[xXzZ?]", "0", hexstr)
+            try:
+                data = binascii.unhexlify(hexstr.encode("ascii"))
+            except (TypeError, ValueError):
+                raise ValueError("%s: not a hex image, in the words from index 0x%x" %
+                                 (filename, index))
+            self.write(address + index * word_size, _swap_words(data, word_size))
+            return len(data)
+
+        for token in tokens:
+            if token.startswith("@"):
+                if run:
+                    total += flush()
+                    run = []
+                try:
+                    index = int(token[1:].replace("_", ""), 16)
+                except ValueError:
+                    raise ValueError("%s: bad address %s" % (filename, token))
+            else:
+                run.append(token)
+        if run:
+            total += flush()
+        return total
+
+    def dump_memh(self, filename, address, length, word_size=1, chunk_size=1 << 16):
+        """Write *length* bytes of memory starting at *address* as a hex image.
+
+        The image can be read by :meth:`load_memh` at the same *address* or
+        by the Verilog ``$readmemh`` task, with one word per line. Only the
+        words in initialised pages are written, the index of the word
+        following words skipped is given by an ``@`` directive.
+
+        Returns:
+            int: The CRC-32 of the bytes of the words written, in address
+            order. It equals :meth:`checksum` of the same range only if all of
+            the range is initialised.
+        """
+        if length % word_size:
+            raise ValueError("The length of %d bytes is not a whole number of "
+                             "%d byte words" % (length, word_size))
+        chunk_size = max(word_size, chunk_size - chunk_size % word_size)
+        digits = 2 * word_size
+        crc = 0
+        skipped = True
+        with open(filename, "w") as f:
+            pos = 0
+            while pos < length:
+                # Whole words up to the end of the page, so that a page not
+                # written doesn't hide the rest of the chunk
+                n = self.page_size - ((address + pos) & self._mask)
+                n = min(-(-n // word_size) * word_size, chunk_size, length - pos)
+                if not self.is_initialised(address + pos, n):
+                    skipped = True
+                    pos += n
+                    continue
+                if skipped:
+                    f.write("@%x\n" % (pos // word_size))
+                    skipped = False
+                data = self.read(address + pos, n)
+                crc = binascii.crc32(bytes(data), crc)
+                hexstr = binascii.hexlify(bytes(_swap_words(data, word_size))).decode("ascii")
+                f.write("\n".join(hexstr[i:i + digits] for i in range(0, len(hexstr), digits)))
+                f.write("\n")
+                pos += n
+        return crc & 0xffffffff
+
+    def load_elf(self, filename, chunk_size=1 << 20):
+        """Load the segments of an ELF executable at their physical addresses.
+
+        The part of each loadable segment which is not in the file, such as
+        its ``.bss`` section, is filled with zeroes.
+
+        Returns:
+            int: The number of bytes loaded.
+        """
+        with open(filename, "rb") as f:
+            ident = bytearray(f.read(16))
+            if ident[:4] != bytearray(b"\x7fELF") or ident[4] not in (1, 2):
+                raise ValueError("%s: not an ELF file" % filename)
+            order = "<" if ident[5] == 1 else ">"
+            if ident[4] == 1:
+                header = struct.Struct(order + "HHIIIIIHHH")
+                program_header = struct.Struct(order + "IIIIII")
+                fields = (1, 3, 4, 5)       # p_offset, p_paddr, p_filesz, p_memsz
+            else:
+                header = struct.Struct(order + "HHIQQQIHHH")
+                program_header = struct.Struct(order + "IIQQQQQ")
+                fields = (2, 4, 5, 6)
+            elf_header = header.unpack(f.read(header.size))
+            e_phoff, e_phentsize, e_phnum = elf_header[4], elf_header[8], elf_header[9]
+
+            segments = []
+            for i in range(e_phnum):
+                f.seek(e_phoff + i * e_phentsize)
+                entry = program_header.unpack(f.read(program_header.size))
+                if entry[0] == _PT_LOAD:
+                    segments.append([entry[j] for j in fields])
+
+            total = 0
+            for offset, paddr, filesz, memsz in segments:
+                f.seek(offset)
+                for pos in range(0, filesz, chunk_size):
+                    chunk = f.read(min(chunk_size, filesz - pos))
+                    if not chunk:
+                        raise ValueError("%s: segment at 0x%x is truncated" % (filename, paddr))
+                    self.write(paddr + pos, chunk)
+                for pos in range(filesz, memsz, chunk_size):
+                    self.write(paddr + pos, bytearray(min(chunk_size, memsz - pos)))
+                total += max(filesz, memsz)
+        return total
+
+    def load_ihex(self, filename):
+        """Load an Intel HEX file.
+
+        Returns:
+            int: The number of bytes loaded.
+        """
+        total = 0
+        base = 0
+        with open(filename) as f:
+            for lineno, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                if not line.startswith(":"):
+                    raise ValueError("%s:%d: not an Intel HEX record" % (filename, lineno))
+                record = bytearray(binascii.unhexlify(line[1:]))
+                if sum(record) & 0xff:
+                    raise ValueError("%s:%d: bad checksum" % (filename, lineno))
+                count = record[0]
+                offset = record[1] << 8 | record[2]
+                kind = record[3]
+                data = record[4:4 + count]
+                if kind == 0x00:
+                    self.write(base + offset, data)
+                    total += count
+                elif kind == 0x01:
+                    break
+                elif kind == 0x02:
+                    base = (data[0] << 8 | data[1]) << 4
+                elif kind == 0x04:
+                    base = (data[0] << 8 | data[1]) << 16
+                # start address records (0x03, 0x05) don't affect memory
+        return total
+
+    def dump_ihex(self, filename, address, length, record_size=16):
+        """Write *length* bytes of memory starting at *address* as Intel HEX.
+
+        Only initialised pages are written.
+
+        Returns:
+            int: The CRC-32 of the bytes of the data records written, in
+            address order. It equals :meth:`checksum` of the same range only
+            if all of the range is initialised.
+        """
+        def record(kind, offset, data):
+            body = bytearray([len(data), offset >> 8 & 0xff, offset & 0xff, kind]) + data
+            body.append(-sum(body) & 0xff)
+            return ":" + binascii.hexlify(bytes(body)).decode("ascii").upper() + "\n"
+
+        upper = None
+        crc = 0
+        with open(filename, "w") as f:
+            pos = address
+            end = address + length
+            while pos < end:
+                # A record doesn't cross a page, so that a page not written
+                # doesn't hide the rest of the record
+                n = min(record_size, end - pos, 0x10000 - (pos & 0xffff),
+                        self.page_size - (pos & self._mask))
+                if not self.is_initialised(pos, n):
+                    pos += n
+                    continue
+                if pos >> 16 != upper:
+                    upper = pos >> 16
+                    f.write(record(0x04, 0, bytearray([upper >> 8 & 0xff, upper & 0xff])))
+                data = self.read(pos, n)
+                crc = binascii.crc32(bytes(data), crc)
+                f.write(record(0x00, pos & 0xffff, data))
+                pos += n
+            f.write(record(0x01, 0, bytearray()))
+        return crc & 0xffffffff
+
+
+def _ram_layout(handle):
+    """Return the index range and the element widths of a RAM in the design."""
+    from cocotb.handle import NonHierarchyIndexableObject
+
+    if type(handle) is not NonHierarchyIndexableObject:
+        raise TypeError("%s is not an array" % handle._fullname)
+    ranges, width, nbytes = handle._array_layout()
+    if len(ranges) != 1:
+        raise TypeError("%s is not a one dimensional array" % handle._fullname)
+    return ranges, width, nbytes
+
+
+def load_ram(handle, memory, address=0):
+    """Load a memory in the design with a single simulator call.
+
+    Each element of the one dimensional array *handle* is loaded with a
+    little-endian word of as many bytes as needed for its width, the element
+    with the lowest index from *address* on. As for other signals, the
+    elements are written in the next :class:`~cocotb.triggers.ReadWrite`
+    phase.
+
+    For example, to load firmware into a RAM of 32 bit words::
+
+        image = PagedMemory()
+        image.load_elf("firmware.elf")
+        load_ram(dut.cpu.ram.mem, image, 0x80000000)
+
+    Args:
+        handle (NonHierarchyIndexableObject): The memory in the design.
+        memory: The :class:`PagedMemory` or bytes-like object to load from.
+        address (int, optional): The address in *memory* of the element with
+            the lowest index.
+
+    Returns:
+        int: The number of bytes loaded.
+
+    Raises:
+        TypeError: If *handle* is not a one dimensional array of logic
+            vectors.
+        IndexError: If *memory* is too small.
+    """
+    ranges, width, nbytes = _ram_layout(handle)
+    (left, right), = ranges
+    size = (width + 7) // 8
+    length = (abs(left - right) + 1) * size
+    data = memory[address:address + length]
+    if len(data) != length:
+        raise IndexError("%s needs %d bytes at 0x%x, but the memory only has %d" %
+                         (handle._fullname, length, address, len(data)))
+    data = _resize_words(data, size, nbytes)
+    if left > right:
+        data = _reverse_words(data, nbytes)
+    handle._write_array_bytes(ranges, width, nbytes, bytes(data))
+    return length
+
+
+def dump_ram(handle, memory, address=0):
+    """Dump a memory in the design with a single simulator call.
+
+    This is the reverse of :func:`load_ram`, bits whose value is not
+    resolved are dumped as 0.
+
+    Args:
+        handle (NonHierarchyIndexableObject): The memory in the design.
+        memory: The :class:`PagedMemory` or :class:`bytearray` to dump to.
+        address (int, optional): The address in *memory* of the element with
+            the lowest index.
+
+    Returns:
+        int: The CRC-32 of the bytes dumped, as :meth:`PagedMemory.checksum`.
+
+    Raises:
+        TypeError: If *handle* is not a one dimensional array of logic
+            vectors.
+    """
+    ranges, width, nbytes = _ram_layout(handle)
+    (left, right), = ranges
+    data, _ = handle._read_array_bytes(ranges, width, nbytes)
+    if left > right:
+        data = _reverse_words(data, nbytes)
+    data = _resize_words(data, nbytes, (width + 7) // 8)
+    memory[address:address + len(data)] = data
+    return binascii.crc32(bytes(data)) & 0xffffffff
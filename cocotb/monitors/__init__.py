@@ -41,6 +41,7 @@ from cocotb.triggers import Event, Timer
 from cocotb.bus import Bus
 from cocotb.log import SimLog
 from cocotb.result import ReturnValue
+from cocotb.sampler import BusSampler
 
 
 class MonitorStatistics(object):
@@ -195,3 +196,77 @@ class BusMonitor(Monitor):
 
     def __str__(self):
         return "%s(%s)" % (self.__class__.__name__, self.name)
+
+
+class SampledBusMonitor(BusMonitor):
+    """A :class:`BusMonitor` whose bus is recorded by a :class:`~cocotb.sampler.BusSampler`.
+
+    Instead of waiting for every edge of the clock, the monitor drains the
+    samples recorded by the simulator every *interval* and passes each one
+    to :meth:`_monitor_sample`, which subclasses implement instead of
+    :meth:`_monitor_recv`. If :attr:`_qualifier` names a signal of the bus,
+    only the samples taken while it is high are recorded. Samples taken in
+    reset are skipped.
+
+    Samples hold the values of the bus just before the edge of the clock,
+    which are those a monitor waiting for :class:`~cocotb.triggers.ReadOnly`
+    after the previous edge sees.
+
+    As samples are only passed on every *interval*, call :meth:`flush`
+    before checking what was received at the end of a test.
+
+    Args:
+        interval (int, optional): Time between drains of the samples.
+        units (str, optional): Units of *interval*.
+        depth (int, optional): Number of samples kept between drains.
+    """
+    _qualifier = None
+
+    def __init__(self, *args, **kwargs):
+        self._interval = kwargs.pop("interval", 1)
+        self._units = kwargs.pop("units", "us")
+        self._depth = kwargs.pop("depth", 4096)
+        self._sampler = None
+        BusMonitor.__init__(self, *args, **kwargs)
+
+    @coroutine
+    def _monitor_recv(self):
+        signals = dict(self.bus._signals)
+        for name, hdl in (("reset", self._reset), ("reset_n", self._reset_n)):
+            if hdl is not None and signals.setdefault(name, hdl) is not hdl:
+                raise ValueError("%s has a signal named %s which is not its %s" %
+                                 (self, name, name))
+        qualifier = None
+        if self._qualifier is not None:
+            qualifier = self.bus._signals[self._qualifier]
+        self._sampler = BusSampler(self.clock, signals, qualifier=qualifier,
+                                   depth=self._depth)
+
+        timer = Timer(self._interval, self._units)
+        try:
+            while True:
+                yield timer
+                self.flush()
+        finally:
+            self._sampler.stop()
+
+    def flush(self):
+        """Pass the samples recorded so far to :meth:`_monitor_sample`."""
+        for sample in self._sampler.drain():
+            # Unresolved resets are treated as asserted
+            if self._reset_n is not None and not sample.reset_n:
+                continue
+            if self._reset is not None and sample.reset != 0:
+                continue
+            self._monitor_sample(sample)
+
+    def _monitor_sample(self, sample):
+        """Handle a sample of the bus, calling :any:`_recv` with transactions.
+
+        Args:
+            sample: A :attr:`cocotb.sampler.BusSampler.Sample` with a field
+                for each signal of the bus, holding an int or ``None`` if
+                its value was not resolved.
+        """
+        raise NotImplementedError("Attempt to use SampledBusMonitor without "
+                                  "providing a ``_monitor_sample`` method")
@@ -0,0 +1,90 @@
+"""Monitors for ARM Advanced Microcontroller Bus Architecture interfaces."""
+
+from cocotb.binary import _resolved_int
+from cocotb.decorators import coroutine
+from cocotb.monitors import BusMonitor
+from cocotb.triggers import RisingEdge, ReadOnly
+from cocotb.utils import _int_to_bytes
+
+
+class AXIStreamMonitor(BusMonitor):
+    """AXI4-Stream monitor, receiving whole frames.
+
+    Each frame is reassembled from the bytes marked by ``tkeep`` in each
+    beat, least significant byte first, up to the beat with ``tlast``, and
+    received as :class:`bytes`. Without ``tlast``, every beat is a frame.
+
+    The ``tuser`` value of each beat of the last frame received is kept as a
+    list in :attr:`tuser`, and its ``tid`` and ``tdest`` as :attr:`tid` and
+    :attr:`tdest`, for use by callbacks.
+    """
+
+    _signals = ["tvalid", "tdata"]
+    _optional_signals = ["tready", "tlast", "tkeep", "tuser", "tid", "tdest"]
+
+    def __init__(self, *args, **kwargs):
+        BusMonitor.__init__(self, *args, **kwargs)
+
+        if len(self.bus.tdata) % 8:
+            raise AttributeError("%s has a tdata width of %d bits, which is "
+                                 "not a whole number of bytes" %
+                                 (self.name, len(self.bus.tdata)))
+        self.tuser = []
+        self.tid = None
+        self.tdest = None
+
+    @coroutine
+    def _monitor_recv(self):
+        """Watch the pins and reconstruct frames."""
+
+        # Avoid spurious object creation by recycling
+        clkedge = RisingEdge(self.clock)
+        rdonly = ReadOnly()
+
+        bus = self.bus
+        width = len(bus.tdata) // 8
+        full = (1 << width) - 1
+        has_tready = hasattr(bus, "tready")
+        has_tlast = hasattr(bus, "tlast")
+        has_tkeep = hasattr(bus, "tkeep")
+        has_tuser = hasattr(bus, "tuser")
+
+        frame = bytearray()
+        tuser = []
+
+        while True:
+            yield clkedge
+            yield rdonly
+
+            if self.in_reset:
+                continue
+
+            if not bus.tvalid.value.integer:
+                continue
+            if has_tready and not bus.tready.value.integer:
+                continue
+
+            data = _int_to_bytes(_resolved_int(bus.tdata.value), width)
+            keep = _resolved_int(bus.tkeep.value) if has_tkeep else full
+            if keep == full:
+                frame += data
+            elif keep and not (keep + (keep & -keep)) & keep:
+                # A contiguous run of bytes, such as the end of a frame
+                low = (keep & -keep).bit_length() - 1
+                frame += data[low:keep.bit_length()]
+            else:
+                frame += bytearray(b for i, b in enumerate(bytearray(data))
+                                   if keep >> i & 1)
+            if has_tuser:
+                tuser.append(_resolved_int(bus.tuser.value))
+
+            if not has_tlast or bus.tlast.value.integer:
+                self.tuser = tuser
+                if hasattr(bus, "tid"):
+                    self.tid = _resolved_int(bus.tid.value)
+                if hasattr(bus, "tdest"):
+                    self.tdest = _resolved_int(bus.tdest.value)
+                self.log.debug("Received a frame of %d bytes", len(frame))
+                self._recv(bytes(frame))
+                frame = bytearray()
+                tuser = []
@@ -32,11 +32,15 @@ See https://www.intel.com/content/dam/www/programmable/us/en/pdfs/literature/man
 NB Currently we only support a very small subset of functionality.
 """
 
-from cocotb.utils import hexdump
+import logging
+import re
+from collections import deque
+
+from cocotb.utils import hexdump, integer_types, _int_to_bytes
 from cocotb.decorators import coroutine
 from cocotb.monitors import BusMonitor
 from cocotb.triggers import RisingEdge, ReadOnly
-from cocotb.binary import BinaryValue
+from cocotb.result import TestFailure
 
 class AvalonProtocolError(Exception):
     pass
@@ -87,7 +91,23 @@ class AvalonST(BusMonitor):
 
 
 class AvalonSTPkts(BusMonitor):
-    """Packetised Avalon-ST bus."""
+    """Packetised Avalon-ST bus.
+
+    Packets are reassembled into a :class:`bytearray` sized like the previous
+    packet. The type of the packets received is set by the ``packetType``
+    config option: ``"str"`` (the default), ``"bytes"``, or ``"memoryview"``
+    for a view of the reassembled packet without copying it.
+
+    With a non-zero ``maxInFlightBytes``, a packet growing beyond that many
+    bytes raises :exc:`AvalonProtocolError`, and :exc:`~cocotb.result.TestFailure`
+    is raised if the packets queued would take more than that many bytes, to
+    bound the memory used when the consumer doesn't keep up. Packets are only
+    queued when the monitor has no callbacks, and stay queued until taken
+    from the front of the queue; :meth:`wait_for_recv` doesn't take them.
+
+    The bus is read with a single call to
+    :meth:`~cocotb.bus.Bus.capture_values` each clock cycle.
+    """
 
     _signals = ["valid", "data", "startofpacket", "endofpacket"]
     _optional_signals = ["error", "channel", "ready", "empty"]
@@ -98,6 +118,8 @@ class AvalonSTPkts(BusMonitor):
         "maxChannel"                    : 0,
         "readyLatency"                  : 0,
         "invalidTimeout"                : 0,
+        "maxInFlightBytes"              : 0,
+        "packetType"                    : "str",
     }
 
     def __init__(self, *args, **kwargs):
@@ -123,6 +145,15 @@ class AvalonSTPkts(BusMonitor):
                 (self.name, num_data_symbols))
 
         self.config["useEmpty"] = (num_data_symbols > 1)
+        self._data_bytes = len(self.bus.data) // 8
+
+        # Lengths of the packets queued, oldest first, and their total
+        self._queued_lengths = deque()
+        self._queued_total = 0
+
+        if self.config["packetType"] not in ("str", "bytes", "memoryview"):
+            raise ValueError("%s: unknown packetType %r" %
+                             (self.name, self.config["packetType"]))
 
         if hasattr(self.bus, 'channel'):
             if "channel" in self._optional_signals:
@@ -138,6 +169,47 @@ class AvalonSTPkts(BusMonitor):
                                      "(2**channel_width)-1=%d, channel_width=%d" %
                                      (self.name, self.config['maxChannel'], maxChannel, len(self.bus.channel)))
 
+    def _beat_bytes(self, data, empty):
+        """Return the symbols of a beat in the order they were sent.
+
+        Args:
+            data: The value of the data signal, as an int or as a binary
+                string if it has X or Z bits.
+            empty (int): The number of empty symbols in the beat.
+        """
+        width = self._data_bytes
+        if isinstance(data, integer_types):
+            value = data
+        else:
+            # X's are allowed in the empty symbols of the last beat
+            binstr = data
+            if empty:
+                if self.config["firstSymbolInHighOrderBits"]:
+                    binstr = binstr[:-empty * 8] + "0" * (empty * 8)
+                else:
+                    binstr = "0" * (empty * 8) + binstr[empty * 8:]
+            if re.search("[^01]", binstr):
+                raise AvalonProtocolError("After empty masking value is still bad?  "
+                                          "Had empty {:d}, got value {:s}".format(empty,
+                                                                                  data))
+            value = int(binstr, 2)
+        symbols = bytearray(_int_to_bytes(value, width))
+        if self.config["firstSymbolInHighOrderBits"]:
+            symbols.reverse()
+        if empty:
+            del symbols[width - empty:]
+        return symbols
+
+    def _queued_bytes(self):
+        """Return the number of bytes of the packets queued.
+
+        Packets taken from the queue are assumed to be taken from the front.
+        """
+        lengths = self._queued_lengths
+        while len(lengths) > len(self._recvQ):
+            self._queued_total -= lengths.popleft()
+        return self._queued_total
+
     @coroutine
     def _monitor_recv(self):
         """Watch the pins and reconstruct transactions."""
@@ -145,15 +217,18 @@ class AvalonSTPkts(BusMonitor):
         # Avoid spurious object creation by recycling
         clkedge = RisingEdge(self.clock)
         rdonly = ReadOnly()
-        pkt = ""
+        bus = self.bus
+
+        # Each packet is reassembled into a buffer sized like the previous
+        # packet, and truncated to its length at the end of the packet
+        pkt = bytearray()
+        length = 0
         in_pkt = False
         invalid_cyclecount = 0
         channel = None
 
-        def valid():
-            if hasattr(self.bus, 'ready'):
-                return self.bus.valid.value and self.bus.ready.value
-            return self.bus.valid.value
+        has_ready = hasattr(bus, 'ready')
+        has_channel = hasattr(bus, 'channel')
 
         while True:
             yield clkedge
@@ -162,56 +237,75 @@ class AvalonSTPkts(BusMonitor):
             if self.in_reset:
                 continue
 
-            if valid():
+            values = bus.capture_values()
+            # X or Z, read as a binary string, isn't a valid beat
+            if values["valid"] == 1 and (not has_ready or values["ready"] == 1):
                 invalid_cyclecount = 0
 
-                if self.bus.startofpacket.value:
-                    if pkt:
+                if values["startofpacket"] == 1:
+                    if length:
                         raise AvalonProtocolError("Duplicate start-of-packet received on %s" %
-                                                  str(self.bus.startofpacket))
-                    pkt = ""
+                                                  str(bus.startofpacket))
                     in_pkt = True
 
                 if not in_pkt:
                     raise AvalonProtocolError("Data transfer outside of "
                                               "packet")
 
-                # Handle empty and X's in empty / data
-                vec = BinaryValue()
-                if not self.bus.endofpacket.value:
-                    vec = self.bus.data.value
-                else:
-                    value = self.bus.data.value.get_binstr()
-                    if self.config["useEmpty"] and self.bus.empty.value.integer:
-                        empty = self.bus.empty.value.integer * self.config["dataBitsPerSymbol"]
-                        if self.config["firstSymbolInHighOrderBits"]:
-                            value = value[:-empty]
-                        else:
-                            value = value[empty:]
-                    vec.assign(value)
-                    if not vec.is_resolvable:
-                        raise AvalonProtocolError("After empty masking value is still bad?  "
-                                                  "Had empty {:d}, got value {:s}".format(empty,
-                                                                                          self.bus.data.value.get_binstr()))
-
-                vec.big_endian = self.config['firstSymbolInHighOrderBits']
-                pkt += vec.buff
-
-                if hasattr(self.bus, 'channel'):
+                # self.config isn't set yet when this coroutine is started
+                max_in_flight = self.config["maxInFlightBytes"]
+                endofpacket = values["endofpacket"] == 1
+                empty = 0
+                if endofpacket and self.config["useEmpty"]:
+                    empty = values["empty"]
+                    if not isinstance(empty, integer_types):
+                        raise AvalonProtocolError("Empty is %s on the last beat of a packet" % empty)
+                symbols = self._beat_bytes(values["data"], empty)
+                pkt[length:length + len(symbols)] = symbols
+                length += len(symbols)
+
+                if max_in_flight and length > max_in_flight:
+                    raise AvalonProtocolError(
+                        "Packet exceeds maxInFlightBytes=%d without an end-of-packet" %
+                        max_in_flight)
+
+                if has_channel:
                     if channel is None:
-                        channel = self.bus.channel.value.integer
+                        channel = values["channel"]
+                        if not isinstance(channel, integer_types):
+                            raise AvalonProtocolError("Channel is %s during a packet" % channel)
                         if channel > self.config["maxChannel"]:
                             raise AvalonProtocolError("Channel value (%d) is greater than maxChannel (%d)" %
                                                       (channel, self.config["maxChannel"]))
-                    elif self.bus.channel.value.integer != channel:
+                    elif values["channel"] != channel:
                         raise AvalonProtocolError("Channel value changed during packet")
 
-                if self.bus.endofpacket.value:
-                    self.log.info("Received a packet of %d bytes", len(pkt))
-                    self.log.debug(hexdump(str((pkt))))
+                if endofpacket:
+                    del pkt[length:]
+                    self.log.info("Received a packet of %d bytes", length)
+                    if self.log.isEnabledFor(logging.DEBUG):
+                        self.log.debug(hexdump(bytes(pkt)))
+
+                    if max_in_flight and self._queued_bytes() + length > max_in_flight:
+                        raise TestFailure(
+                            "%s: more than maxInFlightBytes=%d bytes of received packets "
+                            "are waiting to be consumed" % (self.name, max_in_flight))
+
+                    packet_type = self.config["packetType"]
+                    if packet_type == "memoryview":
+                        received = memoryview(pkt)
+                    elif packet_type == "bytes" or str is bytes:
+                        received = bytes(pkt)
+                    else:
+                        received = pkt.decode("latin-1")
+
                     self.channel = channel
-                    self._recv(pkt)
-                    pkt = ""
+                    self._recv(received)
+                    if max_in_flight and not self._callbacks:
+                        self._queued_lengths.append(length)
+                        self._queued_total += length
+                    pkt = bytearray(length)
+                    length = 0
                     in_pkt = False
                     channel = None
             else:
@@ -28,34 +28,31 @@
 """All things relating to regression capabilities."""
 
 import time
-import inspect
-from itertools import product
+from itertools import product, combinations
 import sys
 import os
 import traceback
+import weakref
 
 if "COCOTB_SIM" in os.environ:
     import simulator
 else:
     simulator = None
 
-# Optional support for coverage collection of testbench files
-coverage = None
-if "COVERAGE" in os.environ:
-    try:
-        import coverage
-    except ImportError as e:
-        msg = ("Coverage collection requested but coverage module not available"
-               "\n"
-               "Import error was: %s\n" % repr(e))
-        sys.stderr.write(msg)
-
 import cocotb
 import cocotb.ANSI as ANSI
 from cocotb.log import SimLog
 from cocotb.result import TestError, TestFailure, TestSuccess, SimFailure
 from cocotb.utils import get_sim_time, raise_from
-from cocotb.xunit_reporter import XUnitReporter
+
+# Modules only needed once tests are run, or only by optional features, are
+# imported where they are used to keep ``import cocotb`` fast.
+
+if sys.version_info.major < 3:
+    # range is not lazy on python 2
+    _range = xrange  # noqa
+else:
+    _range = range
 
 
 def _my_import(name):
@@ -66,6 +63,105 @@ def _my_import(name):
     return mod
 
 
+def _module_file(name):
+    """Find the file a module would be imported from, without importing it."""
+    try:
+        if sys.version_info.major >= 3:
+            import importlib.util
+            spec = importlib.util.find_spec(name)
+            return spec.origin if spec is not None else None
+        import pkgutil
+        loader = pkgutil.get_loader(name)
+        return loader.get_filename(name) if loader is not None else None
+    except Exception:
+        return None
+
+
+def _error_expected(test, result):
+    """Whether *result*, which is not a success, is an error *test* expects."""
+    if isinstance(test.expect_error, bool):
+        return test.expect_error
+    return isinstance(result, test.expect_error)
+
+
+class _DiscoveryCache(object):
+    """Remembers which tests a module defines, keyed by its file and mtime.
+
+    This allows a run selecting tests with :envvar:`TESTCASE` to skip
+    importing modules which do not contain any of them. A module is only
+    known not to define a test by its own file, so it is still imported if
+    no other module defines the test.
+    """
+
+    _version = 1
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.log = SimLog("cocotb.regression")
+        self._modules = {}
+        self._dirty = False
+        import json
+        try:
+            with open(filename) as f:
+                data = json.load(f)
+            if isinstance(data, dict) and data.get("version") == self._version:
+                self._modules = data["modules"]
+        except (IOError, OSError, ValueError, KeyError):
+            pass
+
+    def tests(self, module_name):
+        """Return the cached ``{name: flags}`` dict of a module's tests, or
+        ``None`` if the module is unknown or changed since it was cached."""
+        entry = self._modules.get(module_name)
+        if entry is None:
+            return None
+        filename = _module_file(module_name)
+        if filename is None or filename != entry["file"]:
+            return None
+        try:
+            if os.path.getmtime(filename) != entry["mtime"]:
+                return None
+        except OSError:
+            return None
+        return entry["tests"]
+
+    def update(self, module_name, module):
+        """Record the tests found in an imported module."""
+        filename = _module_file(module_name)
+        if filename is None:
+            return
+        try:
+            mtime = os.path.getmtime(filename)
+        except OSError:
+            return
+        tests = {}
+        for thing in vars(module).values():
+            if hasattr(thing, "im_test"):
+                tests[thing.name] = {
+                    "skip": thing.skip,
+                    "stage": thing.stage,
+                    "expect_fail": thing.expect_fail,
+                    "expect_error": bool(thing.expect_error),
+                }
+        entry = {"file": filename, "mtime": mtime, "tests": tests}
+        if self._modules.get(module_name) != entry:
+            self._modules[module_name] = entry
+            self._dirty = True
+
+    def save(self):
+        if not self._dirty:
+            return
+        import json
+        try:
+            with open(self.filename, "w") as f:
+                json.dump({"version": self._version, "modules": self._modules},
+                          f, indent=1, sort_keys=True)
+        except (IOError, OSError) as e:
+            self.log.warning("Unable to write test discovery cache %s: %s",
+                             self.filename, e)
+        self._dirty = False
+
+
 class RegressionManager(object):
     """Encapsulates all regression capability into a single place"""
 
@@ -91,6 +187,80 @@ class RegressionManager(object):
         self.log = SimLog("cocotb.regression")
         self._seed = seed
         self._hooks = hooks
+        self._imported = {}
+        self._discovery_cache = None
+        self._memtracker = None
+        self._scoreboards = []
+        self._new_scoreboards = []
+        self._scoreboard_stats = []
+
+    def _may_contain_test(self, module_name, test_name):
+        """Whether a module may define a test, going by the discovery cache."""
+        if module_name in self._imported or self._discovery_cache is None:
+            return True
+        tests = self._discovery_cache.tests(module_name)
+        if tests is None:
+            return True
+        if test_name not in tests:
+            self.log.debug("Searching %s last, it did not define %s (cached)",
+                           module_name, test_name)
+            return False
+        return True
+
+    def _find_test(self, test_name):
+        """Find a test in the modules, importing as few of them as possible.
+
+        Returns:
+            The test and the name of its module, or ``(None, None)``.
+        """
+        # The cache may be stale, so modules it says do not define
+        # the test are still searched if no other module defines it
+        likely = [name for name in self._modules
+                  if self._may_contain_test(name, test_name)]
+        unlikely = [name for name in self._modules if name not in likely]
+        for module_name in likely + unlikely:
+            module = self._import_module(module_name)
+            _test = getattr(module, test_name, None)
+            if _test is not None:
+                return _test, module_name
+        return None, None
+
+    def _import_module(self, module_name):
+        """Import a test module, reporting how long it took."""
+        try:
+            return self._imported[module_name]
+        except KeyError:
+            pass
+
+        start = time.time()
+        try:
+            self.log.debug("Python Path: " + ",".join(sys.path))
+            self.log.debug("PWD: " + os.getcwd())
+            module = _my_import(module_name)
+        except Exception as E:
+            self.log.critical("Failed to import module %s: %s", module_name, E)
+            self.log.info("MODULE variable was \"%s\"", ".".join(self._modules))
+            self.log.info("Traceback: ")
+            self.log.info(traceback.format_exc())
+            raise
+        self.log.info("Imported module %s in %.3f s", module_name,
+                      time.time() - start)
+
+        self._imported[module_name] = module
+        if self._discovery_cache is not None:
+            self._discovery_cache.update(module_name, module)
+        return module
+
+    def _skip_test(self, test, module_name):
+        self.log.info("Skipping test %s" % test.name)
+        self.xunit.add_testcase(name=test.name,
+                                classname=module_name,
+                                time="0.0",
+                                sim_time_ns="0.0",
+                                ratio_time="0.0")
+        self.xunit.add_skipped()
+        self.skipped += 1
+        self._store_test_result(module_name, test.name, None, 0.0, 0.0, 0.0)
 
     def initialise(self):
 
@@ -101,11 +271,14 @@ class RegressionManager(object):
         self.skipped = 0
         self.failures = 0
 
+        from cocotb.xunit_reporter import XUnitReporter
+
         results_filename = os.getenv('COCOTB_RESULTS_FILE', "results.xml")
         suite_name = os.getenv('RESULT_TESTSUITE', "all")
         package_name = os.getenv('RESULT_TESTPACKAGE', "all")
         
         self.xunit = XUnitReporter(filename=results_filename)
+        self._scoreboard_filename = os.path.splitext(results_filename)[0] + "_scoreboard.json"
 
         self.xunit.add_testsuite(name=suite_name, tests=repr(self.ntests),
                                  package=package_name)
@@ -113,10 +286,26 @@ class RegressionManager(object):
         if (self._seed is not None):
             self.xunit.add_property(name="random_seed", value=("%d"%self._seed))
 
-        if coverage is not None:
-            self.log.info("Enabling coverage collection of Python code")
-            self._cov = coverage.coverage(branch=True, omit=["*cocotb*"])
-            self._cov.start()
+        if "COVERAGE" in os.environ:
+            try:
+                import coverage
+            except ImportError as e:
+                self.log.error("Coverage collection requested but coverage "
+                               "module not available: %r", e)
+            else:
+                self.log.info("Enabling coverage collection of Python code")
+                self._cov = coverage.coverage(branch=True, omit=["*cocotb*"])
+                self._cov.start()
+
+        try:
+            from cocotb.memdebug import MemoryTracker
+            self._memtracker = MemoryTracker.from_environment()
+        except ImportError as e:
+            self.log.error("Memory tracking requested but tracemalloc module "
+                           "not available: %r", e)
+        if self._memtracker is not None:
+            self.log.info("Enabling per-test memory tracking")
+            self._memtracker.start()
 
         handle = simulator.get_root_handle(self._root_name)
 
@@ -126,67 +315,49 @@ class RegressionManager(object):
             raise AttributeError("Can not find Root Handle (%s)" %
                                  self._root_name)
 
-        # Auto discovery
-        for module_name in self._modules:
-            try:
-                self.log.debug("Python Path: " + ",".join(sys.path))
-                self.log.debug("PWD: " + os.getcwd())
-                module = _my_import(module_name)
-            except Exception as E:
-                self.log.critical("Failed to import module %s: %s", module_name, E)
-                self.log.info("MODULE variable was \"%s\"", ".".join(self._modules))
-                self.log.info("Traceback: ")
-                self.log.info(traceback.format_exc())
-                raise
-
-            if self._functions:
-
-                # Specific functions specified, don't auto discover
-                for test in self._functions.rsplit(','):
-                    try:
-                        _test = getattr(module, test)
-                    except AttributeError:
-                        self.log.error("Requested test %s wasn't found in module %s", test, module_name)
-                        err = AttributeError("Test %s doesn't exist in %s" % (test, module_name))
-                        raise_from(err, None)  # discard nested traceback
-
-                    if not hasattr(_test, "im_test"):
-                        self.log.error("Requested %s from module %s isn't a cocotb.test decorated coroutine", test, module_name)
-                        raise ImportError("Failed to find requested test %s" % test)
-                    self._queue.append(_test(self._dut))
-                    self.ntests += 1
-                break
+        cache_filename = os.getenv('COCOTB_DISCOVERY_CACHE')
+        if cache_filename:
+            self._discovery_cache = _DiscoveryCache(cache_filename)
 
-            for thing in vars(module).values():
-                if hasattr(thing, "im_test"):
-                    try:
-                        test = thing(self._dut)
-                        skip = test.skip
-                    except Exception:
-                        skip = True
-                        self.log.warning("Failed to initialize test %s" %
-                                         thing.name, exc_info=True)
-
-                    if skip:
-                        self.log.info("Skipping test %s" % thing.name)
-                        self.xunit.add_testcase(name=thing.name,
-                                                classname=module_name,
-                                                time="0.0",
-                                                sim_time_ns="0.0",
-                                                ratio_time="0.0")
-                        self.xunit.add_skipped()
-                        self.skipped += 1
-                        self._store_test_result(module_name, thing.name, None, 0.0, 0.0, 0.0)
-                    else:
-                        self._queue.append(test)
-                        self.ntests += 1
+        if self._functions:
+
+            # Specific functions specified, don't auto discover
+            for test in self._functions.rsplit(','):
+                _test, module_name = self._find_test(test)
+
+                if _test is None:
+                    self.log.error("Requested test %s wasn't found in module(s) %s", test, ",".join(self._modules))
+                    err = AttributeError("Test %s doesn't exist in %s" % (test, ",".join(self._modules)))
+                    raise_from(err, None)  # discard nested traceback
+
+                if not hasattr(_test, "im_test"):
+                    self.log.error("Requested %s from module %s isn't a cocotb.test decorated coroutine", test, module_name)
+                    raise ImportError("Failed to find requested test %s" % test)
+                self._queue.append(_test)
+                self.ntests += 1
+
+        else:
+            # Auto discovery
+            for module_name in self._modules:
+                module = self._import_module(module_name)
+
+                for thing in vars(module).values():
+                    if hasattr(thing, "im_test"):
+                        if thing.skip:
+                            self._skip_test(thing, module_name)
+                        else:
+                            self._queue.append(thing)
+                            self.ntests += 1
+
+        if self._discovery_cache is not None:
+            self._discovery_cache.save()
 
         self._queue.sort(key=lambda test: test.sort_name())
 
         for valid_tests in self._queue:
             self.log.info("Found test %s.%s" %
                           (valid_tests.module,
-                           valid_tests.funcname))
+                           valid_tests.name))
 
         for module_name in self._hooks:
             self.log.info("Loading hook from module '"+module_name+"'")
@@ -215,18 +386,73 @@ class RegressionManager(object):
             self.log.info("Writing coverage data")
             self._cov.save()
             self._cov.html_report()
+        if self._memtracker is not None:
+            self._memtracker.stop()
         if len(self.test_results) > 0:
             self._log_test_summary()
+        if self._scoreboard_stats:
+            self._log_scoreboard_summary()
+            self._write_scoreboard_stats()
+        if cocotb.handle.read_cache.enabled:
+            cache = cocotb.handle.read_cache
+            self.log.info("Read cache: %d hits, %d misses (%.1f%% hit rate)" %
+                          (cache.hits, cache.misses, 100 * cache.hit_rate))
+        if cocotb.scheduler.skip_redundant_writes:
+            writes = cocotb.scheduler.writes
+            skipped = cocotb.scheduler.writes_skipped
+            self.log.info("Skipped %d redundant writes out of %d (%.1f%%)" %
+                          (skipped, writes, 100.0 * skipped / writes if writes else 0))
         self._log_sim_summary()
         self.log.info("Shutting down...")
         self.xunit.write()
         simulator.stop_simulator()
 
     def next_test(self):
-        """Get the next test to run"""
-        if not self._queue:
-            return None
-        return self._queue.pop(0)
+        """Get the next test to run.
+
+        Tests are only instantiated once they are about to run.
+        """
+        while self._queue:
+            test = self._queue.pop(0)
+            try:
+                return test(self._dut)
+            except Exception:
+                self.log.warning("Failed to initialize test %s" %
+                                 test.name, exc_info=True)
+                self._skip_test(test, test.module)
+        return None
+
+    def register_scoreboard(self, scoreboard):
+        """Report the statistics of *scoreboard* at the end of each test.
+
+        Called by :class:`~cocotb.scoreboard.Scoreboard` when it is created.
+        The statistics are reported for the test creating the scoreboard,
+        and for any later test it receives transactions in, and are reset
+        after each report. Only a weak reference to *scoreboard* is kept.
+        """
+        self._new_scoreboards.append(weakref.ref(scoreboard))
+
+    def _collect_scoreboard_stats(self, test):
+        alive = []
+        registered = [(ref, False) for ref in self._scoreboards]
+        registered += [(ref, True) for ref in self._new_scoreboards]
+        for ref, new in registered:
+            scoreboard = ref()
+            if scoreboard is None:
+                continue
+            alive.append(ref)
+            if not new and not any(stats.received
+                                   for stats in scoreboard.stats.values()):
+                continue
+            interfaces = scoreboard.statistics()
+            if interfaces:
+                self._scoreboard_stats.append({
+                    'test': '.'.join([test.module, test.funcname]),
+                    'scoreboard': scoreboard.log.name,
+                    'interfaces': interfaces})
+            scoreboard._reset_statistics()
+        self._scoreboards = alive
+        self._new_scoreboards = []
 
     def _add_failure(self, result):
         self.xunit.add_failure(stdout=repr(str(result)),
@@ -243,11 +469,18 @@ class RegressionManager(object):
             test: The test that completed
         """
         assert test is self._running_test
+        cocotb.log.removeHandler(test.handler)
 
         real_time   = time.time() - test.start_time
         sim_time_ns = get_sim_time('ns') - test.start_sim_time
         ratio_time  = self._safe_divide(sim_time_ns, real_time)
-        
+
+        self._collect_scoreboard_stats(test)
+
+        heap_growth = None
+        if self._memtracker is not None:
+            heap_growth = self._memtracker.test_finished(test)
+
         self.xunit.add_testcase(name=test.funcname,
                                 classname=test.module,
                                 time=repr(real_time),
@@ -293,7 +526,7 @@ class RegressionManager(object):
             result_pass = False
 
         elif isinstance(result, SimFailure):
-            if test.expect_error:
+            if _error_expected(test, result):
                 self.log.info("Test errored as expected: " + _result_was())
             else:
                 self.log.error("Test error has lead to simulator shutting us "
@@ -303,7 +536,7 @@ class RegressionManager(object):
                 self.tear_down()
                 return
 
-        elif test.expect_error:
+        elif _error_expected(test, result):
             self.log.info("Test errored as expected: " + _result_was())
 
         else:
@@ -311,6 +544,12 @@ class RegressionManager(object):
             self._add_failure(result)
             result_pass = False
 
+        if result_pass and self._memtracker is not None and self._memtracker.leaked(heap_growth):
+            self.log.error("Test leaked memory: %s (heap grew by %d bytes, limit is %d)" %
+                           (test.funcname, heap_growth, self._memtracker.limit))
+            self._add_failure(TestFailure("Heap grew by %d bytes" % heap_growth))
+            result_pass = False
+
         self._store_test_result(test.module, test.funcname, result_pass, sim_time_ns, real_time, ratio_time)
 
         self.execute()
@@ -330,6 +569,8 @@ class RegressionManager(object):
                            end,
                            self._running_test.funcname))
 
+            if self._memtracker is not None:
+                self._memtracker.test_started(self._running_test)
             cocotb.scheduler.add_test(self._running_test)
             self.count += 1
         else:
@@ -382,6 +623,48 @@ class RegressionManager(object):
 
         self.log.info(summary)
 
+    def _log_scoreboard_summary(self):
+        def fmt(value, spec):
+            return "-" if value is None else spec.format(value)
+
+        header = ('INTERFACE', 'MATCHED', 'MISMATCHED', 'REORDERED', 'MAX OUTSTANDING',
+                  'BYTES/US', 'LATENCY P50/P99(NS)')
+        rows = []
+        for entry in self._scoreboard_stats:
+            for name, stats in entry['interfaces'].items():
+                latency = stats['latency_ns']
+                rows.append(('.'.join([entry['test'], name]),
+                             str(stats['matched']),
+                             str(stats['mismatched'] + stats['unexpected']),
+                             str(stats['reordered']),
+                             str(stats['max_outstanding']),
+                             fmt(stats['throughput_bytes_per_us'], '{0:.2f}'),
+                             '-' if latency is None else
+                             '{0:.2f}/{1:.2f}'.format(latency['p50'], latency['p99'])))
+
+        widths = [max(len(row[i]) for row in rows + [header]) for i in range(len(header))]
+        line_sep = "*" * (sum(widths) + 2 * (len(widths) - 1) + 6) + "\n"
+
+        def format_row(row):
+            cells = [row[0].ljust(widths[0])] + [c.rjust(w) for c, w in zip(row[1:], widths[1:])]
+            return "** " + "  ".join(cells) + " **\n"
+
+        summary = line_sep + format_row(header) + line_sep
+        for row in rows:
+            summary += format_row(row)
+        summary += line_sep
+
+        self.log.info(summary)
+
+    def _write_scoreboard_stats(self):
+        import json
+        try:
+            with open(self._scoreboard_filename, "w") as f:
+                json.dump({'scoreboards': self._scoreboard_stats}, f, indent=1)
+        except (IOError, OSError) as e:
+            self.log.warning("Unable to write scoreboard statistics to %s: %s",
+                             self._scoreboard_filename, e)
+
     def _log_sim_summary(self):
         real_time   = time.time() - self.start_time
         sim_time_ns = get_sim_time('ns')
@@ -516,10 +799,129 @@ class TestFactory(object):
         """
         self.kwargs[name] = optionlist
 
-    def generate_tests(self, prefix="", postfix=""):
+    def _n_combinations(self):
+        """Number of combinations in the full cartesian product."""
+        total = 1
+        for optionlist in self.kwargs.values():
+            total *= len(optionlist)
+        return total
+
+    def _decode_index(self, names, index):
+        """Return the option values of the ``index``-th combination.
+
+        Indices follow the order of :func:`itertools.product`, i.e. the last
+        option varies fastest, so no combination has to be materialized to
+        find another one.
         """
-        Generates exhaustive set of tests using the cartesian product of the
-        possible keyword arguments.
+        values = []
+        for name in reversed(names):
+            optionlist = self.kwargs[name]
+            index, pos = divmod(index, len(optionlist))
+            values.append(optionlist[pos])
+        return dict(zip(names, reversed(values)))
+
+    def _covering_indices(self, names, strength):
+        """Greedily build an ``strength``-wise covering array.
+
+        Every combination of values for every group of ``strength`` options
+        appears in at least one of the selected tests.  Only the (much
+        smaller) set of value tuples to cover is held in memory, never the
+        full cartesian product.
+
+        Returns:
+            list: Sorted indices of the selected combinations.
+        """
+        sizes = [len(self.kwargs[name]) for name in names]
+        nopts = len(names)
+        if strength >= nopts:
+            return list(_range(self._n_combinations()))
+
+        groups = list(combinations(range(nopts), strength))
+        uncovered = set()
+        for group in groups:
+            for values in product(*[range(sizes[o]) for o in group]):
+                uncovered.add((group, values))
+
+        groups_with = [[g for g in groups if opt in g] for opt in range(nopts)]
+
+        selected = set()
+        while uncovered:
+            # Seed the row with the first uncovered tuple, then fill in the
+            # remaining options one by one choosing the value that covers the
+            # most still uncovered tuples.
+            group, values = min(uncovered)
+            row = [None] * nopts
+            for opt, value in zip(group, values):
+                row[opt] = value
+            for opt in range(nopts):
+                if row[opt] is not None:
+                    continue
+                best_value, best_gain = 0, -1
+                for value in range(sizes[opt]):
+                    row[opt] = value
+                    gain = 0
+                    for g in groups_with[opt]:
+                        if all(row[o] is not None for o in g):
+                            if (g, tuple(row[o] for o in g)) in uncovered:
+                                gain += 1
+                    if gain > best_gain:
+                        best_value, best_gain = value, gain
+                row[opt] = best_value
+            for g in groups:
+                uncovered.discard((g, tuple(row[o] for o in g)))
+
+            index = 0
+            for opt in range(nopts):
+                index = index * sizes[opt] + row[opt]
+            selected.add(index)
+
+        return sorted(selected)
+
+    def _select_indices(self, names, n_wise=None, sample=None, seed=None,
+                        shard=None):
+        """Return an iterable of the combination indices to generate."""
+        total = self._n_combinations()
+
+        if n_wise is not None and sample is not None:
+            raise ValueError("n_wise and sample are mutually exclusive")
+
+        if n_wise is not None:
+            if n_wise < 1:
+                raise ValueError("n_wise must be at least 1, got %r" % n_wise)
+            indices = self._covering_indices(names, n_wise)
+        elif sample is not None:
+            import random
+            if seed is None:
+                seed = getattr(cocotb, "RANDOM_SEED", None)
+            rng = random.Random(seed)
+            indices = sorted(rng.sample(_range(total), min(sample, total)))
+        else:
+            indices = None
+
+        nselected = total if indices is None else len(indices)
+        start, stop = 0, nselected
+        if shard is not None:
+            shard_index, nshards = shard
+            if not 0 <= shard_index < nshards:
+                raise ValueError("Invalid shard %r" % (shard,))
+            start = shard_index * nselected // nshards
+            stop = (shard_index + 1) * nselected // nshards
+
+        if indices is None:
+            return _range(start, stop)
+        return indices[start:stop]
+
+    def generate_tests(self, prefix="", postfix="", n_wise=None, sample=None,
+                       seed=None, shard=None):
+        """
+        Generates tests from the cartesian product of the possible keyword
+        arguments.
+
+        By default the exhaustive set of tests is generated.  For factories
+        with many options a subset can be selected instead; only the selected
+        combinations are ever instantiated.  Generated tests keep the name
+        they would have in the exhaustive set, so a failing test can be
+        reproduced independently of the selection used.
 
         The generated tests are appended to the namespace of the calling
         module.
@@ -533,17 +935,28 @@ class TestFactory(object):
                      when naming generated test cases. This allows reuse of
                      a single ``test_function`` with multiple
                      :class:`TestFactories <.TestFactory>` without name clashes.
+            n_wise (int, optional): Only generate enough tests to cover every
+                     combination of values of any ``n_wise`` options
+                     (``2`` gives pairwise testing).
+            sample (int, optional): Only generate this many randomly chosen
+                     tests.
+            seed (int, optional): Seed used to draw the ``sample``.
+                     Defaults to the seed of the regression.
+            shard (tuple, optional): A tuple ``(index, count)`` splitting the
+                     selected tests into ``count`` contiguous ranges and only
+                     generating the ``index``-th of them.
         """
 
+        import inspect
         frm = inspect.stack()[1]
         mod = inspect.getmodule(frm[0])
 
-        d = self.kwargs
+        names = list(self.kwargs.keys())
+        indices = self._select_indices(names, n_wise=n_wise, sample=sample,
+                                       seed=seed, shard=shard)
 
-        for index, testoptions in enumerate((
-                                            dict(zip(d, v)) for v in
-                                            product(*d.values())
-                                            )):
+        for index in indices:
+            testoptions = self._decode_index(names, index)
 
             name = "%s%s%s_%03d" % (prefix, self.name, postfix, index + 1)
             doc = "Automatically generated test\n\n"
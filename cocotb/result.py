@@ -105,6 +105,11 @@ class TestSuccess(TestComplete):
     pass
 
 
+class SimTimeoutError(TestError):
+    """Exception showing that a test exceeded its simulation or wall-clock time budget."""
+    pass
+
+
 class SimFailure(TestComplete):
     """Exception showing that simulator exited unsuccessfully."""
     pass
@@ -0,0 +1,204 @@
+"""
+Record signals on the edges of a clock without waking up Python every cycle.
+
+A :class:`BusSampler` keeps a ring buffer in the simulator library which the
+values of a set of signals are written into on each edge of a clock. Python
+drains it in batches, as a list of named tuples or as a :mod:`numpy`
+structured array, which is much cheaper for passive monitors than a
+coroutine waiting for every edge.
+"""
+import collections
+import itertools
+import os
+import struct
+
+if "COCOTB_SIM" in os.environ:
+    import simulator
+else:
+    simulator = None
+
+import cocotb
+from cocotb.decorators import coroutine
+from cocotb.result import TestError
+from cocotb.triggers import RisingEdge
+from cocotb.utils import get_sim_time
+
+
+def _is_high(binstr):
+    """Whether a binary string is resolved and not zero."""
+    return not binstr.strip("01") and "1" in binstr
+
+
+class BusSampler(object):
+    """Records signals on each edge of *clock* into a ring buffer.
+
+    Each sample holds the simulation time of the edge, in simulator steps,
+    and the value of each signal just before the edge, which is the value a
+    flip-flop clocked by it samples and the value a coroutine waiting for
+    :class:`~cocotb.triggers.ReadOnly` saw in the previous cycle.
+
+    Samples are recorded by the simulator library without calling Python.
+    With a simulator library built without samplers, they are recorded by a
+    coroutine instead.
+
+    Args:
+        clock (SimHandle): The clock to sample on.
+        signals: A :class:`~cocotb.bus.Bus`, a dict of names to signal
+            handles, or a list of signal handles named after themselves.
+            At most 64 signals can be recorded.
+        qualifier (SimHandle, optional): Only record samples when this
+            signal is high.
+        edge (optional): :class:`~cocotb.triggers.RisingEdge`,
+            :class:`~cocotb.triggers.FallingEdge` or
+            :class:`~cocotb.triggers.Edge` of *clock* to sample on.
+        depth (int, optional): Number of samples kept until drained.
+
+    Raises:
+        ValueError: If a signal is named ``time`` or ``unresolved``.
+    """
+
+    def __init__(self, clock, signals, qualifier=None, edge=RisingEdge, depth=4096):
+        if hasattr(signals, "_signals"):
+            signals = sorted(signals._signals.items())
+        elif isinstance(signals, dict):
+            signals = sorted(signals.items())
+        else:
+            signals = [(hdl._name, hdl) for hdl in signals]
+        self.names = [name for name, _ in signals]
+        for reserved in ("time", "unresolved"):
+            if reserved in self.names:
+                raise ValueError("A signal can't be sampled as %r" % reserved)
+        self._handles = [hdl for _, hdl in signals]
+        self._words = [max(1, (len(hdl) + 63) // 64) for hdl in self._handles]
+        self._row_words = 2 + sum(self._words)
+        self._narrow = all(words == 1 for words in self._words)
+        self.Sample = collections.namedtuple("Sample", ["time"] + self.names)
+
+        self.clock = clock
+        self.qualifier = qualifier
+        self.depth = depth
+        self._edge = edge
+        self._sampler = None
+        self._thread = None
+        self._rows = []         # recorded by the coroutine
+        self._data = b""        # drained from a stopped sampler
+        self._dropped = 0
+        self.start()
+
+    def start(self):
+        """Start recording, called on creation."""
+        if self._sampler is not None or self._thread is not None:
+            return
+        if hasattr(simulator, "create_sampler"):
+            # An edge trigger of the clock already waited on is passed on by
+            # the sampler, which takes over its simulator callback
+            armed = self._edge(self.clock).cbhdl
+            self._sampler = simulator.create_sampler(
+                self.clock._handle, self._edge._edge_type,
+                [hdl._handle for hdl in self._handles],
+                [len(hdl) for hdl in self._handles],
+                None if self.qualifier is None else self.qualifier._handle,
+                self.depth, armed)
+        else:
+            self._thread = cocotb.fork(self._record())
+
+    def stop(self):
+        """Stop recording, the samples recorded so far can still be drained."""
+        if self._sampler is not None:
+            data, count, dropped = simulator.drain_sampler(self._sampler)
+            simulator.destroy_sampler(self._sampler)
+            self._sampler = None
+            self._data += data
+            self._dropped += dropped
+        if self._thread is not None:
+            self._thread.kill()
+            self._thread = None
+
+    @coroutine
+    def _record(self):
+        """Record samples with a coroutine, without simulator support."""
+        edge = self._edge(self.clock)
+        while True:
+            yield edge
+            if self.qualifier is not None and not _is_high(self.qualifier.value.binstr):
+                continue
+            if len(self._rows) >= self.depth:
+                self._dropped += 1
+                continue
+            row = [get_sim_time(), 0]
+            for i, (hdl, words) in enumerate(zip(self._handles, self._words)):
+                binstr = hdl.value.binstr
+                if binstr.strip("01"):
+                    row[1] |= 1 << i
+                    binstr = "".join(c if c == "1" else "0" for c in binstr)
+                value = int(binstr, 2) if binstr else 0
+                row.extend((value >> (64 * w)) & 0xffffffffffffffff for w in range(words))
+            self._rows.append(row)
+
+    def _drain_bytes(self):
+        data, self._data = self._data, b""
+        if self._sampler is not None:
+            more, count, dropped = simulator.drain_sampler(self._sampler)
+            data += more
+            self._dropped += dropped
+        if self._rows:
+            words = list(itertools.chain.from_iterable(self._rows))
+            data += struct.pack("=%dQ" % len(words), *words)
+            self._rows = []
+        if self._dropped:
+            dropped, self._dropped = self._dropped, 0
+            raise TestError("%d samples of %s were dropped because the buffer of "
+                            "%d samples was full, drain it more often or increase "
+                            "its depth" % (dropped, self.clock._name, self.depth))
+        return data
+
+    def drain(self, numpy=False):
+        """Return the samples recorded since the last drain.
+
+        Args:
+            numpy (bool, optional): Return a :mod:`numpy` structured array
+                instead of a list.
+
+        Returns:
+            A list of :attr:`Sample` named tuples, with the field ``time``
+            and a field for each signal, holding an int or ``None`` if its
+            value was not resolved. With *numpy*, an array with the fields
+            ``time`` and ``unresolved``, whose bit *i* is set if the value
+            of the signal *i* in :attr:`names` was not resolved, and a
+            ``uint64`` field for each signal, or an array of ``uint64``
+            words, least significant first, for signals wider than 64 bits.
+            Bits which are not resolved are 0.
+
+        Raises:
+            TestError: If samples were dropped because the buffer was full.
+        """
+        data = self._drain_bytes()
+        if numpy:
+            import numpy as np
+            dtype = [("time", "=u8"), ("unresolved", "=u8")]
+            dtype += [(name, "=u8") if words == 1 else (name, "=u8", (words,))
+                      for name, words in zip(self.names, self._words)]
+            return np.frombuffer(data, dtype=np.dtype(dtype))
+
+        flat = struct.unpack("=%dQ" % (len(data) // 8), data)
+        step = self._row_words
+        make = self.Sample._make
+        samples = []
+        for base in range(0, len(flat), step):
+            unresolved = flat[base + 1]
+            if self._narrow and not unresolved:
+                samples.append(make((flat[base],) + flat[base + 2:base + step]))
+                continue
+            values = [flat[base]]
+            pos = base + 2
+            for i, words in enumerate(self._words):
+                if unresolved >> i & 1:
+                    values.append(None)
+                else:
+                    value = 0
+                    for w in range(words):
+                        value |= flat[pos + w] << (64 * w)
+                    values.append(value)
+                pos += words
+            samples.append(make(values))
+        return samples
@@ -39,6 +39,7 @@ import os
 import sys
 import logging
 import threading
+import traceback
 
 # Debug mode controlled by environment variables
 if "COCOTB_ENABLE_PROFILING" in os.environ:
@@ -59,11 +60,13 @@ else:
 
 import cocotb
 import cocotb.decorators
+from cocotb.binary import BinaryValue
+from cocotb.handle import ModifiableObject, read_cache
 from cocotb.triggers import (Trigger, GPITrigger, Timer, ReadOnly,
                              NextTimeStep, ReadWrite, Event, Join, NullTrigger)
 from cocotb.log import SimLog
-from cocotb.result import TestComplete
-from cocotb.utils import nullcontext
+from cocotb.result import TestComplete, SimTimeoutError
+from cocotb.utils import integer_types, lazy_property, nullcontext
 
 # On python 3.7 onwards, `dict` is guaranteed to preserve insertion order.
 # Since `OrderedDict` is a little slower that `dict`, we prefer the latter
@@ -74,6 +77,16 @@ else:
     _ordered_dict = collections.OrderedDict
 
 
+def _write_key(value):
+    """The value driven by a write to a :class:`~cocotb.handle.ModifiableObject`,
+    or ``None`` if it isn't compared with the previous one."""
+    if isinstance(value, integer_types):
+        return value
+    if isinstance(value, BinaryValue):
+        return value.binstr
+    return None
+
+
 class InternalError(RuntimeError):
     """ An error internal to scheduler. If you see this, report a bug! """
     pass
@@ -105,7 +118,11 @@ class external_waiter(object):
         self.event = Event()
         self.state = external_state.INIT
         self.cond = threading.Condition()
-        self._log = SimLog("cocotb.external.thead.%s" % self.thread, id(self))
+        self.abandoned = False
+
+    @lazy_property
+    def _log(self):
+        return SimLog("cocotb.external.thread", id(self))
 
     @property
     def result(self):
@@ -113,15 +130,22 @@ class external_waiter(object):
 
     def _propogate_state(self, new_state):
         with self.cond:
+            if self.abandoned:
+                # Whoever was waiting has moved on, possibly to another test
+                return
             if _debug:
                 self._log.debug("Changing state from %d -> %d from %s" % (self.state, new_state, threading.current_thread()))
             self.state = new_state
             self.cond.notify()
 
-    def thread_done(self):
+    def thread_done(self, outcome):
         if _debug:
             self._log.debug("Thread finished from %s" % (threading.current_thread()))
-        self._propogate_state(external_state.EXITED)
+        with self.cond:
+            if self.abandoned:
+                return
+            self._outcome = outcome
+            self._propogate_state(external_state.EXITED)
 
     def thread_suspend(self):
         self._propogate_state(external_state.PAUSED)
@@ -137,6 +161,18 @@ class external_waiter(object):
     def thread_resume(self):
         self._propogate_state(external_state.RUNNING)
 
+    def thread_abandon(self, exc):
+        """Stop waiting for a thread which is not going to finish.
+
+        The thread itself keeps running, but whoever is waiting for its
+        result gets *exc* instead, and it finishing or yielding later is
+        ignored.
+        """
+        with self.cond:
+            self._outcome = outcomes.Error(exc)
+            self._propogate_state(external_state.EXITED)
+            self.abandoned = True
+
     def thread_wait(self):
         if _debug:
             self._log.debug("Waiting for the condition lock %s" % threading.current_thread())
@@ -158,6 +194,78 @@ class external_waiter(object):
 
         return self.state
 
+class wall_clock_watchdog(object):
+    """Aborts the running test when it exceeds a wall-clock time budget.
+
+    The watchdog runs in its own thread. When the budget is exhausted it
+    first asks the scheduler to abort the test the next time it is entered,
+    and releases the main thread if it is blocked waiting on an
+    :class:`~cocotb.external` thread. If the test still has not ended after
+    *grace* seconds, :exc:`~cocotb.result.SimTimeoutError` is raised
+    asynchronously in the main thread, which also stops Python code that
+    never yields back to the scheduler. It is only raised while the main
+    thread is running a coroutine, never in the scheduler's own code or in
+    the simulator.
+    """
+
+    def __init__(self, scheduler, test, timeout, grace=5.0):
+        self.scheduler = scheduler
+        self.test = test
+        self.timeout = timeout
+        self.grace = grace
+        self.expired = False
+        self._cancelled = threading.Event()
+        self._thread = threading.Thread(target=self._run,
+                                        name="cocotb_wall_clock_watchdog")
+        self._thread.daemon = True
+
+    def start(self):
+        self._thread.start()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def _run(self):
+        if self._cancelled.wait(self.timeout):
+            return
+
+        self.scheduler.log.error(
+            "Test %s exceeded its wall-clock budget of %s s, aborting\n%s" %
+            (self.test.funcname, self.timeout,
+             self.scheduler._format_pending(main_thread_stack=True)))
+        self.expired = True
+
+        exc = SimTimeoutError("Test exceeded its wall-clock budget of %s s" %
+                              self.timeout)
+        for ext in list(self.scheduler._pending_threads):
+            ext.thread_abandon(exc)
+
+        if self._cancelled.wait(self.grace):
+            return
+
+        # A simulator which is busy on its own enters the scheduler, which
+        # aborts the test, once it is done
+        while not self._cancelled.wait(0.1):
+            with self.scheduler._interrupt_lock:
+                if self.scheduler._interruptible:
+                    self.scheduler.log.error(
+                        "Test %s did not return control to the scheduler, "
+                        "interrupting it" % self.test.funcname)
+                    _raise_in_thread(self.scheduler._main_thread, SimTimeoutError)
+                    return
+
+
+def _raise_in_thread(thread, exc_type):
+    """Asynchronously raise *exc_type* in *thread*."""
+    import ctypes
+    if sys.version_info[:2] >= (3, 7):
+        ident = ctypes.c_ulong(thread.ident)
+    else:
+        ident = ctypes.c_long(thread.ident)
+    ctypes.pythonapi.PyThreadState_SetAsyncExc(ident,
+                                               ctypes.py_object(exc_type))
+
+
 class Scheduler(object):
     """The main scheduler.
 
@@ -203,6 +311,14 @@ class Scheduler(object):
     mode (for example wanting to sample the finally settled value after all
     delta delays) then it can reasonably be expected to be scheduled during
     "normal mode" i.e. where writes are permitted.
+
+    With :attr:`skip_redundant_writes`, set by :envvar:`COCOTB_SKIP_REDUNDANT_WRITES`,
+    the value last written to each signal is kept and writing it again is
+    skipped, unless the signal is excluded with :meth:`always_write`. Signals
+    also driven by the HDL must be excluded, as the value they were last
+    written is not necessarily the value they have. The values are forgotten
+    when a test starts. The number of writes and of writes skipped since
+    then are counted in :attr:`writes` and :attr:`writes_skipped`.
     """
 
     _MODE_NORMAL   = 1  # noqa
@@ -234,9 +350,13 @@ class Scheduler(object):
         # Our main state
         self._mode = Scheduler._MODE_NORMAL
 
-        # A dictionary of pending writes
+        # A dictionary of pending writes, applied in the order they were made
         self._writes = _ordered_dict()
 
+        # The pending write of a Bus which each handle's write is merged into,
+        # as (bus, index), so that a later write to the handle replaces it
+        self._merged_writes = {}
+
         self._pending_coros = []
         self._pending_triggers = []
         self._pending_threads = []
@@ -251,6 +371,19 @@ class Scheduler(object):
         self._write_coro_inst = None
         self._writes_pending = Event()
 
+        # The value last written to each GPI handle, to skip writing it again
+        self._skip_redundant_writes = os.getenv("COCOTB_SKIP_REDUNDANT_WRITES", "0") not in ("", "0")
+        self._last_written = {}
+        self._always_written = set()
+        self.writes = 0
+        self.writes_skipped = 0
+
+        self._wall_clock_watchdog = None
+        # Whether the main thread is running a coroutine, which the watchdog
+        # may interrupt
+        self._interrupt_lock = threading.Lock()
+        self._interruptible = False
+
     @cocotb.decorators.coroutine
     def _do_writes(self):
         """ An internal coroutine that performs pending writes """
@@ -261,11 +394,106 @@ class Scheduler(object):
 
             yield self._read_write
 
-            while self._writes:
-                handle, value = self._writes.popitem()
-                handle.setimmediatevalue(value)
+            writes = self._take_writes()
+            if self._skip_redundant_writes:
+                self._do_tracked_writes(writes)
+            else:
+                for handle, value in writes.items():
+                    handle.setimmediatevalue(value)
+            read_cache.invalidate()
             self._writes_pending.clear()
 
+    @property
+    def skip_redundant_writes(self):
+        """Whether writes of the value last written to a signal are skipped."""
+        return self._skip_redundant_writes
+
+    @skip_redundant_writes.setter
+    def skip_redundant_writes(self, value):
+        # Writes made while disabled weren't recorded
+        self._last_written.clear()
+        self._skip_redundant_writes = value
+
+    def _take_writes(self):
+        """Return the pending writes, leaving none pending."""
+        writes = self._writes
+        self._writes = _ordered_dict()
+        self._merged_writes.clear()
+        return writes
+
+    def _do_tracked_writes(self, writes):
+        """Perform *writes*, skipping those of the value last written."""
+        last_written = self._last_written
+        for handle, value in writes.items():
+            self.writes += 1
+            if type(handle) is not ModifiableObject:
+                handle.setimmediatevalue(value)
+                continue
+            key = _write_key(value)
+            hdl = handle._handle
+            if key is not None and last_written.get(hdl, self) == key:
+                self.writes_skipped += 1
+                continue
+            handle.setimmediatevalue(value)
+            if key is not None and hdl not in self._always_written:
+                last_written[hdl] = key
+
+    def _record_write(self, hdl, value):
+        """Record a write of *value*, an int or a binary string, to the GPI
+        handle *hdl* by another write path, such as the bulk writes of
+        :class:`~cocotb.bus.Bus`.
+
+        Returns:
+            bool: Whether the write is redundant and can be skipped.
+        """
+        self.writes += 1
+        if self._last_written.get(hdl, self) == value:
+            self.writes_skipped += 1
+            return True
+        if hdl not in self._always_written:
+            self._last_written[hdl] = value
+        return False
+
+    def always_write(self, *handles):
+        """Never skip the writes to *handles* as redundant.
+
+        With :attr:`skip_redundant_writes`, a write of the value last written
+        to a signal is skipped, which is only correct as long as nothing else
+        changes it. Signals which are also driven from the HDL, or forced
+        from a simulator's command line, need to be excluded.
+        """
+        for handle in handles:
+            self._always_written.add(handle._handle)
+            self._last_written.pop(handle._handle, None)
+
+    @cocotb.decorators.coroutine
+    def _sim_time_watchdog(self, test):
+        """ An internal coroutine that aborts a test running for too long """
+        yield Timer(test.timeout, test.timeout_unit)
+        units = test.timeout_unit if test.timeout_unit is not None else "steps"
+        msg = ("Test %s exceeded its simulation time budget of %s %s" %
+               (test.funcname, test.timeout, units))
+        self.log.error("%s, aborting\n%s" % (msg, self._format_pending()))
+        raise SimTimeoutError(msg)
+
+    def _format_pending(self, main_thread_stack=False):
+        """Describe where every pending coroutine is currently waiting."""
+        lines = []
+        if main_thread_stack:
+            frame = sys._current_frames().get(self._main_thread.ident)
+            if frame is not None:
+                lines.append("Main thread:\n")
+                lines.extend(traceback.format_stack(frame))
+        try:
+            pending = list(self._coro2trigger.items())
+        except RuntimeError:
+            # modified by the main thread while we were looking at it
+            pending = []
+        for coro, trigger in pending:
+            lines.append("Coroutine %s waiting on %s:\n" % (coro, trigger))
+            lines.extend(coro._format_stack())
+        return "".join(lines)
+
     def _check_termination(self):
         """
         Handle a termination that causes us to move onto the next test.
@@ -274,6 +502,10 @@ class Scheduler(object):
             if _debug:
                 self.log.debug("Test terminating, scheduling Timer")
 
+            if self._wall_clock_watchdog is not None:
+                self._wall_clock_watchdog.cancel()
+                self._wall_clock_watchdog = None
+
             if self._write_coro_inst is not None:
                 self._write_coro_inst.kill()
                 self._write_coro_inst = None
@@ -288,7 +520,7 @@ class Scheduler(object):
             self._trigger2coros = _ordered_dict()
             self._coro2trigger = _ordered_dict()
             self._terminate = False
-            self._writes = _ordered_dict()
+            self._take_writes()
             self._writes_pending.clear()
             self._mode = Scheduler._MODE_TERM
 
@@ -335,6 +567,9 @@ class Scheduler(object):
         We ensure that we only start the event loop once, rather than
         letting it recurse.
         """
+        # Signals may have changed since the last trigger
+        read_cache.invalidate()
+
         if self._is_reacting:
             # queue up the trigger, the event loop will get to it
             self._pending_triggers.append(trigger)
@@ -381,6 +616,15 @@ class Scheduler(object):
                                    str(trigger))
                 return
 
+            watchdog = self._wall_clock_watchdog
+            if (watchdog is not None and watchdog.expired and
+                    self._test._outcome is None):
+                self.finish_test(SimTimeoutError(
+                    "Test exceeded its wall-clock budget of %s s" %
+                    watchdog.timeout))
+                self._check_termination()
+                return
+
             if trigger is self._read_only:
                 self._mode = Scheduler._MODE_READONLY
             # Only GPI triggers affect the simulator scheduling mode
@@ -516,9 +760,22 @@ class Scheduler(object):
             self._write_coro_inst = self._do_writes()
             self.schedule(self._write_coro_inst)
 
+        if self._merged_writes:
+            merged = self._merged_writes.pop(handle, None)
+            if merged is not None:
+                bus, index = merged
+                self._writes[bus].pop(index, None)
         self._writes[handle] = value
         self._writes_pending.set()
 
+    def _discard_write(self, handle):
+        """Drop the pending write to *handle*, replaced by a write covering it."""
+        self._writes.pop(handle, None)
+        merged = self._merged_writes.pop(handle, None)
+        if merged is not None:
+            bus, index = merged
+            self._writes[bus].pop(index, None)
+
     def _coroutine_yielded(self, coro, trigger):
         """Prime the trigger and update our internal mappings."""
         self._coro2trigger[coro] = trigger
@@ -554,6 +811,27 @@ class Scheduler(object):
                 # wake up the coroutines
                 error_trigger.prime(self.react)
 
+    def _advance_interruptible(self, coroutine, outcome):
+        """Advance *coroutine*, allowing the wall-clock watchdog to interrupt it.
+
+        A :exc:`~cocotb.result.SimTimeoutError` raised by the watchdog while
+        the coroutine runs ends the coroutine. If it is raised just after the
+        coroutine yields, it is caught here instead, and the test is aborted.
+        """
+        try:
+            try:
+                with self._interrupt_lock:
+                    self._interruptible = True
+                return coroutine._advance(outcome)
+            finally:
+                with self._interrupt_lock:
+                    self._interruptible = False
+        except SimTimeoutError as e:
+            self._interruptible = False
+            if self._test._outcome is None:
+                self.finish_test(e)
+            return None
+
     def queue(self, coroutine):
         """Queue a coroutine for execution"""
         self._pending_coros.append(coroutine)
@@ -590,10 +868,10 @@ class Scheduler(object):
         #   calling coroutine (but not the thread) until the external completes
 
         def execute_external(func, _waiter):
-            _waiter._outcome = outcomes.capture(func, *args, **kwargs)
+            outcome = outcomes.capture(func, *args, **kwargs)
             if _debug:
                 self.log.debug("Execution of external routine done %s" % threading.current_thread())
-            _waiter.thread_done()
+            _waiter.thread_done(outcome)
 
         waiter = external_waiter()
         thread = threading.Thread(group=None, target=execute_external,
@@ -639,6 +917,14 @@ class Scheduler(object):
         if self._test is not None:
             raise InternalError("Test was added while another was in progress")
         self._test = test_coro
+        # Signals may have changed since the previous test wrote them
+        self._last_written.clear()
+        if test_coro.wall_timeout is not None:
+            self._wall_clock_watchdog = wall_clock_watchdog(
+                self, test_coro, test_coro.wall_timeout)
+            self._wall_clock_watchdog.start()
+        if test_coro.timeout is not None:
+            self.schedule(self._sim_time_watchdog(test_coro))
         return self.add(test_coro)
 
     # This collection of functions parses a trigger out of the object
@@ -713,7 +999,10 @@ class Scheduler(object):
 
         coro_completed = False
         try:
-            result = coroutine._advance(send_outcome)
+            if self._wall_clock_watchdog is None:
+                result = coroutine._advance(send_outcome)
+            else:
+                result = self._advance_interruptible(coroutine, send_outcome)
             if _debug:
                 self.log.debug("Coroutine %s yielded %s (mode %d)" %
                                (coroutine.__name__, str(result), self._mode))
@@ -773,6 +1062,9 @@ class Scheduler(object):
            once we return the sim will close us so no cleanup is needed.
         """
         self.log.debug("Issue sim closedown result to regression object")
+        if self._wall_clock_watchdog is not None:
+            self._wall_clock_watchdog.cancel()
+            self._wall_clock_watchdog = None
         self._test.abort(exc)
         cocotb.regression_manager.handle_result(self._test)
 
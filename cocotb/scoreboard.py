@@ -29,25 +29,393 @@
 
 """Common scoreboarding capability."""
 
+import bisect
+import collections
 import logging
+import math
 
-from cocotb.utils import hexdump, hexdiffs
+import cocotb
+from cocotb.utils import hexdump, hexdiffs, get_sim_time
 from cocotb.log import SimLog
 from cocotb.monitors import Monitor
 from cocotb.result import TestFailure, TestSuccess
 
 
+class ExpectedQueue(object):
+    """Queue of expected transactions, indexed for out-of-order matching.
+
+    Can be passed to :meth:`Scoreboard.add_interface` instead of a list.
+    Finding the transaction that matches a received one is independent of the
+    number of outstanding transactions, where a list has to be scanned.
+
+    Transactions are matched by key. Among expected transactions with the
+    same key, the oldest is matched first.
+
+    Unless *track_latency* is false, the simulation time at which each
+    transaction is added is recorded, so that the scoreboard can measure how
+    long it took to be received.
+
+    A received transaction matching an expected one by key is still checked
+    by :meth:`Scoreboard.compare`, so a *key* that does not identify
+    a transaction completely makes matching strict in-order per key.
+
+    Args:
+        iterable (iterable, optional): Initial expected transactions.
+        key (callable, optional): Function returning the key of a
+            transaction, e.g. its AXI ID. Defaults to the transaction itself,
+            or its :func:`repr` if it is not hashable.
+        track_latency (bool, optional): Record when each transaction is
+            added, which takes a simulator call per transaction.
+    """
+
+    _unhashable = object()
+
+    def __init__(self, iterable=(), key=None, track_latency=True):
+        self._key = key
+        self.track_latency = track_latency
+        self._items = collections.OrderedDict()  # sequence number -> (key, transaction, time)
+        self._index = {}  # key -> deque of sequence numbers
+        self._holes = []  # sorted sequence numbers removed out of order
+        self._next_seq = 0
+        self.max_len = 0
+        self.extend(iterable)
+
+    def _key_of(self, transaction):
+        if self._key is not None:
+            return self._key(transaction)
+        try:
+            hash(transaction)
+        except TypeError:
+            return (self._unhashable, repr(transaction))
+        return transaction
+
+    def append(self, transaction):
+        """Add an expected transaction at the end of the queue."""
+        key = self._key_of(transaction)
+        seq = self._next_seq
+        self._next_seq += 1
+        self._items[seq] = (key, transaction,
+                            get_sim_time("ns") if self.track_latency else None)
+        try:
+            self._index[key].append(seq)
+        except KeyError:
+            self._index[key] = collections.deque((seq,))
+        if len(self._items) > self.max_len:
+            self.max_len = len(self._items)
+
+    def extend(self, transactions):
+        """Add several expected transactions at the end of the queue."""
+        for transaction in transactions:
+            self.append(transaction)
+
+    def __len__(self):
+        return len(self._items)
+
+    def __iter__(self):
+        for key, transaction, time in self._items.values():
+            yield transaction
+
+    def clear(self):
+        self._items.clear()
+        self._index.clear()
+        self._holes = []
+
+    def _oldest(self):
+        return next(iter(self._items))
+
+    def _position(self, seq, oldest):
+        """Number of transactions in front of the one numbered *seq*."""
+        return seq - oldest - bisect.bisect_left(self._holes, seq)
+
+    def _remove(self, seq):
+        oldest = self._oldest()
+        key, transaction, time = self._items.pop(seq)
+        seqs = self._index[key]
+        seqs.popleft()  # always the oldest transaction with this key
+        if not seqs:
+            del self._index[key]
+
+        if not self._items:
+            self._holes = []
+        elif seq == oldest:
+            # holes in front of the new oldest transaction no longer matter
+            del self._holes[:bisect.bisect_left(self._holes, self._oldest())]
+        else:
+            bisect.insort(self._holes, seq)
+        return transaction, time, seq != oldest
+
+    def popleft(self):
+        """Remove and return the oldest expected transaction."""
+        if not self._items:
+            raise IndexError("pop from an empty ExpectedQueue")
+        return self._remove(self._oldest())[0]
+
+    def pop_match(self, transaction, reorder_depth=0):
+        """Remove and return the expected transaction matching *transaction*.
+
+        Args:
+            transaction: The received transaction.
+            reorder_depth (int, optional): Only consider the first
+                ``reorder_depth + 1`` expected transactions.
+                ``None`` considers the whole queue.
+
+        Returns:
+            The oldest expected transaction with the same key as *transaction*
+            within the reorder window, or the oldest expected transaction
+            if there is none.
+
+        Raises:
+            :any:`IndexError`: If the queue is empty.
+        """
+        return self._pop_match(transaction, reorder_depth)[0]
+
+    def _pop_match(self, transaction, reorder_depth):
+        """Like :meth:`pop_match`, also returning when the match was added
+        and whether it was not the oldest transaction."""
+        if not self._items:
+            raise IndexError("pop from an empty ExpectedQueue")
+        seqs = self._index.get(self._key_of(transaction))
+        if seqs:
+            seq = seqs[0]
+            if (reorder_depth is None or
+                    self._position(seq, self._oldest()) <= reorder_depth):
+                return self._remove(seq)
+        return self._remove(self._oldest())
+
+
+class ExpectedStream(ExpectedQueue):
+    """Expected transactions pulled on demand from an iterable.
+
+    Only the transactions needed to match those received are held, so memory
+    use is bounded by the reorder window rather than by the length of the
+    test. Transactions are pulled when a transaction is received, to fill the
+    window of ``reorder_depth + 1`` candidates, or with an unlimited
+    ``reorder_depth`` until one with the same key is found. With an
+    unlimited ``reorder_depth``, a received transaction which matches none
+    pulls the rest of the source into memory, unless *max_lookahead* is
+    given.
+
+    As transactions are only pulled once they are needed, no match latency
+    is recorded. A reference model which produces expected transactions as
+    the stimulus is sent should instead append them to an
+    :class:`ExpectedQueue`, whose size is then bounded by the number of
+    transactions in flight.
+
+    Args:
+        source (iterable): Expected transactions, typically a generator.
+            Its end means no more transactions are expected.
+        key (callable, optional): As for :class:`ExpectedQueue`.
+        max_lookahead (int, optional): With an unlimited ``reorder_depth``,
+            stop pulling transactions to look for a match once this many
+            are held. The oldest is then taken as the match.
+    """
+
+    def __init__(self, source, key=None, max_lookahead=None):
+        ExpectedQueue.__init__(self, key=key, track_latency=False)
+        self._source = iter(source)
+        self.max_lookahead = max_lookahead
+
+    def _pull_one(self):
+        """Move one transaction from the source to the queue, if there is one."""
+        try:
+            transaction = next(self._source)
+        except StopIteration:
+            return False
+        self.append(transaction)
+        return True
+
+    def fill(self, count):
+        """Pull transactions from the source until *count* are queued.
+
+        Returns:
+            bool: Whether *count* transactions are queued.
+        """
+        while len(self) < count:
+            if not self._pull_one():
+                return False
+        return True
+
+    def _pop_match(self, transaction, reorder_depth):
+        if reorder_depth is None:
+            key = self._key_of(transaction)
+            limit = self.max_lookahead
+            while (key not in self._index and
+                   (limit is None or len(self) < limit) and self._pull_one()):
+                pass
+        else:
+            self.fill(reorder_depth + 1)
+        return ExpectedQueue._pop_match(self, transaction, reorder_depth)
+
+
+class MatchLatency(object):
+    """Simulation time in ns between expecting and receiving transactions.
+
+    Only summary values are kept, so recording is constant in time and memory.
+    """
+
+    # Histogram buckets are spaced by a factor of 2 ** (1 / 8), so
+    # percentiles are accurate to within 9 %
+    _buckets_per_octave = 8
+
+    def __init__(self):
+        self._reset()
+
+    def _reset(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self._histogram = collections.defaultdict(int)
+
+    def add(self, latency):
+        self.count += 1
+        self.total += latency
+        if self.min is None or latency < self.min:
+            self.min = latency
+        if self.max is None or latency > self.max:
+            self.max = latency
+        if latency > 0:
+            bucket = int(math.floor(math.log(latency, 2) * self._buckets_per_octave))
+        else:
+            bucket = None
+        self._histogram[bucket] += 1
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    def percentile(self, percent):
+        """Estimate the latency below which *percent* % of latencies fall."""
+        if not self.count:
+            return None
+        rank = max(1, int(math.ceil(self.count * percent / 100.0)))
+        seen = self._histogram.get(None, 0)
+        if seen >= rank:
+            return 0.0
+        for bucket in sorted(b for b in self._histogram if b is not None):
+            seen += self._histogram[bucket]
+            if seen >= rank:
+                upper = 2 ** ((bucket + 1.0) / self._buckets_per_octave)
+                return max(self.min, min(upper, self.max))
+        return self.max
+
+    def __str__(self):
+        if not self.count:
+            return "no matches"
+        return ("%d matches, latency min %.2f ns, mean %.2f ns, max %.2f ns" %
+                (self.count, self.min, self.mean, self.max))
+
+
+class InterfaceStatistics(object):
+    """Statistics of the transactions received on a scoreboarded interface.
+
+    Updating them takes constant time and memory per transaction.
+
+    Attributes:
+        name (str): Name of the interface.
+        received (int): Transactions received.
+        matched (int): Transactions equal to the expected transaction.
+        mismatched (int): Transactions different from the expected transaction.
+        unexpected (int): Transactions received when none were expected.
+        reordered (int): Transactions which matched an expected transaction
+            other than the oldest.
+        max_outstanding (int): Most expected transactions waiting to be received.
+        bytes (int): Total length of the transactions received which have one.
+        first_time, last_time (float): Simulation times in ns at which the
+            first and last transactions were received.
+        latency (MatchLatency): Time from expecting to receiving transactions,
+            only measured for an :class:`ExpectedQueue`.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.latency = MatchLatency()
+        self._reset()
+
+    def _reset(self):
+        self.received = 0
+        self.matched = 0
+        self.mismatched = 0
+        self.unexpected = 0
+        self.reordered = 0
+        self.max_outstanding = 0
+        self.bytes = 0
+        self.first_time = None
+        self.last_time = None
+        self.latency._reset()
+
+    def _receive(self, transaction, now, outstanding):
+        self.received += 1
+        if self.first_time is None:
+            self.first_time = now
+        self.last_time = now
+        if outstanding > self.max_outstanding:
+            self.max_outstanding = outstanding
+        try:
+            self.bytes += len(transaction)
+        except TypeError:
+            pass
+
+    @property
+    def duration(self):
+        """Simulation time in ns between the first and last transactions."""
+        if self.first_time is None:
+            return 0.0
+        return self.last_time - self.first_time
+
+    @property
+    def throughput(self):
+        """Bytes per microsecond of simulation time over :attr:`duration`."""
+        return self.bytes * 1000.0 / self.duration if self.duration else None
+
+    @property
+    def transaction_rate(self):
+        """Transactions per microsecond of simulation time over :attr:`duration`."""
+        return (self.received - 1) * 1000.0 / self.duration if self.duration else None
+
+    def to_dict(self):
+        """Return the statistics as a dictionary suitable for JSON output."""
+        latency = None
+        if self.latency.count:
+            latency = {
+                "count": self.latency.count,
+                "min": self.latency.min,
+                "mean": self.latency.mean,
+                "max": self.latency.max,
+                "p50": self.latency.percentile(50),
+                "p90": self.latency.percentile(90),
+                "p99": self.latency.percentile(99),
+            }
+        return {
+            "received": self.received,
+            "matched": self.matched,
+            "mismatched": self.mismatched,
+            "unexpected": self.unexpected,
+            "reordered": self.reordered,
+            "max_outstanding": self.max_outstanding,
+            "bytes": self.bytes,
+            "duration_ns": self.duration,
+            "throughput_bytes_per_us": self.throughput,
+            "transactions_per_us": self.transaction_rate,
+            "latency_ns": latency,
+        }
+
+
 class Scoreboard(object):
     """Generic scoreboarding class.
 
     We can add interfaces by providing a monitor and an expected output queue.
 
-    The expected output can either be a function which provides a transaction
-    or a simple list containing the expected output.
+    The expected output can either be a function which provides a transaction,
+    a simple list containing the expected output, an :class:`ExpectedQueue`
+    or an :class:`ExpectedStream`.
+
+    :class:`InterfaceStatistics` are kept for each interface in :attr:`stats`,
+    and reported by the regression manager at the end of the test.
+    For an :class:`ExpectedQueue` tracking latency, the time between
+    expecting and receiving each transaction is also recorded in the :class:`MatchLatency` of its
+    monitor in :attr:`latency`.
 
-    TODO:
-        Statistics for end-of-test summary etc.
-        
     Args:
         dut (SimHandle): Handle to the DUT.
         reorder_depth (int, optional): Consider up to `reorder_depth` elements 
@@ -64,7 +432,26 @@ class Scoreboard(object):
         self.log = SimLog("cocotb.scoreboard.%s" % self.dut._name)
         self.errors = 0
         self.expected = {}
+        self.stats = collections.OrderedDict()
+        self.latency = {}
         self._imm = fail_immediately
+        if cocotb.regression_manager is not None:
+            cocotb.regression_manager.register_scoreboard(self)
+
+    def statistics(self):
+        """Return the statistics of all interfaces, keyed by interface name.
+
+        Interface names are unique within a scoreboard, see :meth:`add_interface`.
+        """
+        return collections.OrderedDict(
+            (stats.name, stats.to_dict()) for stats in self.stats.values())
+
+    def _reset_statistics(self):
+        for stats in self.stats.values():
+            stats._reset()
+        for expected_output in self.expected.values():
+            if isinstance(expected_output, ExpectedQueue):
+                expected_output.max_len = len(expected_output)
 
     @property
     def result(self):
@@ -81,9 +468,14 @@ class Scoreboard(object):
                                "expected output is callable function rather "
                                "than a list" % str(monitor))
                 continue
+            if isinstance(expected_output, ExpectedStream):
+                # Only look far enough ahead to list the first few
+                more = "at least " if expected_output.fill(8) else ""
+            else:
+                more = ""
             if len(expected_output):
-                self.log.warn("Still expecting %d transactions on %s" %
-                              (len(expected_output), str(monitor)))
+                self.log.warn("Still expecting %s%d transactions on %s" %
+                              (more, len(expected_output), str(monitor)))
                 for index, transaction in enumerate(expected_output):
                     self.log.info("Expecting %d:\n%s" %
                                   (index, hexdump(str(transaction))))
@@ -173,6 +565,26 @@ class Scoreboard(object):
             except Exception:
                 pass
 
+    def _unexpected(self, transaction, log):
+        self.errors += 1
+        log.error("Received a transaction but wasn't expecting "
+                  "anything")
+        log.info("Got: %s" % (hexdump(str(transaction))))
+        if self._imm:
+            raise TestFailure("Received a transaction but wasn't "
+                              "expecting anything")
+
+    def _interface_name(self, monitor):
+        """Name *monitor*'s interface, numbering monitors of the same name."""
+        name = getattr(monitor, "name", None) or monitor.__class__.__name__
+        taken = set(stats.name for other, stats in self.stats.items()
+                    if other is not monitor)
+        unique, n = name, 1
+        while unique in taken:
+            n += 1
+            unique = "%s_%d" % (name, n)
+        return unique
+
     def add_interface(self, monitor, expected_output, compare_fn=None,
                       reorder_depth=0, strict_type=True):
         """Add an interface to be scoreboarded.
@@ -181,15 +593,23 @@ class Scoreboard(object):
         transactions.
 
         Simply check against the expected output.
+
+        The interface is named after the monitor, or its class if the monitor
+        has no name, with a ``_2``, ``_3``... suffix for further monitors
+        of the same name.
         
         Args:
             monitor: The monitor object.
             expected_output: Queue of expected outputs.
+                An :class:`ExpectedQueue` makes out-of-order matching
+                with a large *reorder_depth* efficient, an :class:`ExpectedStream`
+                avoids holding all expected outputs in memory.
             compare_fn (callable, optional): Function doing the actual comparison.
             reorder_depth (int, optional): Consider up to *reorder_depth* elements 
                 of the expected result list as passing matches.
                 Default is 0, meaning only the first element in the expected result list
                 is considered for a passing match.
+                ``None`` considers all elements of the expected result list.
             strict_type (bool, optional): Require transaction type to match
                 exactly if ``True``, otherwise compare its string representation.
 
@@ -213,39 +633,62 @@ class Scoreboard(object):
             raise TypeError("Expected a callable compare function but got %s" %
                             str(type(compare_fn)))
 
-        self.log.info("Created with reorder_depth %d" % reorder_depth)
+        self.log.info("Created with reorder_depth %s" % reorder_depth)
+
+        interface_name = self._interface_name(monitor)
+        log = logging.getLogger(self.log.name + '.' + interface_name)
+        stats = self.stats[monitor] = InterfaceStatistics(interface_name)
+        latency = None
+        if (isinstance(expected_output, ExpectedQueue) and
+                expected_output.track_latency):
+            latency = self.latency[monitor] = stats.latency
 
         def check_received_transaction(transaction):
             """Called back by the monitor when a new transaction has been
             received."""
-
-            if monitor.name:
-                log_name = self.log.name + '.' + monitor.name
-            else:
-                log_name = self.log.name + '.' + monitor.__class__.__name__
-
-            log = logging.getLogger(log_name)
+            now = get_sim_time("ns")
 
             if callable(expected_output):
+                stats._receive(transaction, now, 0)
                 exp = expected_output(transaction)
 
+            elif isinstance(expected_output, ExpectedQueue):
+                stats._receive(transaction, now, max(expected_output.max_len,
+                                                     len(expected_output)))
+                try:
+                    exp, expected_at, reordered = expected_output._pop_match(
+                        transaction, reorder_depth)
+                except IndexError:
+                    stats.unexpected += 1
+                    self._unexpected(transaction, log)
+                    return
+                if latency is not None:
+                    latency.add(now - expected_at)
+                stats.reordered += reordered
+
             elif len(expected_output):  # we expect something
-                for i in range(min((reorder_depth + 1), len(expected_output))):
+                stats._receive(transaction, now, len(expected_output))
+                depth = len(expected_output) if reorder_depth is None else reorder_depth + 1
+                for i in range(min(depth, len(expected_output))):
                     if expected_output[i] == transaction:
                         break  # break out of enclosing for loop
                 else:  # run when for loop is exhausted (but no break occurs)
                     i = 0
                 exp = expected_output.pop(i)
+                stats.reordered += i != 0
             else:
-                self.errors += 1
-                log.error("Received a transaction but wasn't expecting "
-                          "anything")
-                log.info("Got: %s" % (hexdump(str(transaction))))
-                if self._imm:
-                    raise TestFailure("Received a transaction but wasn't "
-                                      "expecting anything")
+                stats._receive(transaction, now, 0)
+                stats.unexpected += 1
+                self._unexpected(transaction, log)
                 return
 
-            self.compare(transaction, exp, log, strict_type=strict_type)
+            errors = self.errors
+            try:
+                self.compare(transaction, exp, log, strict_type=strict_type)
+            finally:
+                if self.errors == errors:
+                    stats.matched += 1
+                else:
+                    stats.mismatched += 1
 
         monitor.add_callback(check_received_transaction)
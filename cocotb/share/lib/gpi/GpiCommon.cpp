@@ -613,6 +613,12 @@ void gpi_deregister_callback(gpi_sim_hdl hdl)
     cb_hdl->m_impl->deregister_callback(cb_hdl);
 }
 
+void *gpi_get_callback_data(gpi_sim_hdl hdl)
+{
+    GpiCbHdl *cb_hdl = sim_to_hdl<GpiCbHdl*>(hdl);
+    return const_cast<void*>(cb_hdl->get_user_data());
+}
+
 const char* GpiImplInterface::get_name_c(void) {
     return m_name.c_str();
 }
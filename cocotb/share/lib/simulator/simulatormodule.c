@@ -186,6 +186,379 @@ err:
     return ret;
 }
 
+/**
+ * @name    Samplers
+ * @brief   Record signals on the edges of a clock without calling Python
+ * @ingroup python_c_api
+ *
+ * A sampler keeps a ring buffer of rows, each holding the simulation time,
+ * a bit per signal set if its value was not resolved, and the value of each
+ * signal as 64-bit words, least significant first. A row is recorded on each
+ * edge of the clock, optionally only when a qualifier signal is high, and
+ * rows are drained by Python in batches.
+ *
+ * The GPI has a single value change callback per signal and edge, which is
+ * also used by the edge triggers. All the samplers on an edge of a clock
+ * therefore share one s_sampler_clock, which owns that callback and passes
+ * it on to any Python callback registered for the same edge meanwhile.
+ */
+typedef struct t_sampler {
+    struct t_sampler_clock *clock;
+    gpi_sim_hdl qualifier;              // NULL to record on every edge
+    Py_ssize_t n_signals;
+    gpi_sim_hdl *signals;
+    int *words;                         // Number of 64-bit words of each signal
+    Py_ssize_t row_words;
+    uint64_t *buffer;
+    Py_ssize_t depth;
+    Py_ssize_t head;
+    Py_ssize_t count;
+    unsigned long dropped;              // Rows lost since the last drain
+    struct t_sampler *next;
+} s_sampler, *p_sampler;
+
+typedef struct t_sampler_clock {
+    gpi_sim_hdl clock;
+    unsigned int edge;
+    gpi_sim_hdl cb_hdl;
+    p_callback_data pending;            // Python callback for the same edge
+    p_sampler samplers;
+    struct t_sampler_clock *next;
+} s_sampler_clock, *p_sampler_clock;
+
+static p_sampler_clock sampler_clocks = NULL;
+
+static p_sampler_clock find_sampler_clock(gpi_sim_hdl clock, unsigned int edge)
+{
+    p_sampler_clock sc;
+
+    for (sc = sampler_clocks; sc != NULL; sc = sc->next) {
+        if (sc->clock == clock && sc->edge == edge) {
+            return sc;
+        }
+    }
+    return NULL;
+}
+
+static p_sampler_clock find_sampler_clock_by_cb(gpi_sim_hdl cb_hdl)
+{
+    p_sampler_clock sc;
+
+    for (sc = sampler_clocks; sc != NULL; sc = sc->next) {
+        if (sc->cb_hdl == cb_hdl) {
+            return sc;
+        }
+    }
+    return NULL;
+}
+
+static void free_callback_data(p_callback_data callback_data_p)
+{
+    Py_DECREF(callback_data_p->function);
+    Py_DECREF(callback_data_p->args);
+    free(callback_data_p);
+}
+
+// Convert a binary string to little-endian 64-bit words, returning 1 if it
+// contains bits other than 0 and 1, which are converted to 0.
+static int binstr_to_words(const char *binstr, uint64_t *words, int n_words)
+{
+    size_t len = strlen(binstr);
+    size_t bit;
+    int unresolved = 0;
+
+    memset(words, 0, n_words * sizeof(uint64_t));
+    for (bit = 0; bit < len; bit++) {
+        char c = binstr[len - 1 - bit];
+        if (c == '1') {
+            if (bit < (size_t)n_words * 64) {
+                words[bit / 64] |= (uint64_t)1 << (bit % 64);
+            }
+        } else if (c != '0') {
+            unresolved = 1;
+        }
+    }
+    return unresolved;
+}
+
+static void sampler_record(p_sampler s, uint64_t time)
+{
+    uint64_t *row;
+    uint64_t *value;
+    Py_ssize_t i;
+
+    if (s->qualifier != NULL) {
+        const char *binstr = gpi_get_signal_value_binstr(s->qualifier);
+        if (strspn(binstr, "01") != strlen(binstr) || strchr(binstr, '1') == NULL) {
+            return;
+        }
+    }
+
+    if (s->count == s->depth) {
+        s->dropped++;
+        return;
+    }
+
+    row = s->buffer + ((s->head + s->count) % s->depth) * s->row_words;
+    row[0] = time;
+    row[1] = 0;
+    value = row + 2;
+    for (i = 0; i < s->n_signals; i++) {
+        if (binstr_to_words(gpi_get_signal_value_binstr(s->signals[i]), value, s->words[i])) {
+            row[1] |= (uint64_t)1 << i;
+        }
+        value += s->words[i];
+    }
+    s->count++;
+}
+
+static int handle_sampler_callback(const void *user_data)
+{
+    p_sampler_clock sc = (p_sampler_clock)user_data;
+    p_callback_data pending = sc->pending;
+    struct sim_time now;
+    p_sampler s;
+
+    // Stay registered for the next edge
+    sc->cb_hdl = gpi_register_value_change_callback(handle_sampler_callback, sc,
+                                                    sc->clock, sc->edge);
+
+    gpi_get_sim_time(&now.high, &now.low);
+    for (s = sc->samplers; s != NULL; s = s->next) {
+        sampler_record(s, (uint64_t)now.high << 32 | now.low);
+    }
+
+    // The Python callback may register again or destroy the samplers, so
+    // nothing of sc is used after calling it
+    if (pending != NULL) {
+        sc->pending = NULL;
+        return handle_gpi_callback(pending);
+    }
+    return 0;
+}
+
+static int sampler_converter(PyObject *o, p_sampler *data)
+{
+    void *p = PyLong_AsVoidPtr(o);
+    if ((p == NULL) && PyErr_Occurred()) {
+        return 0;
+    }
+    if (p == NULL) {
+        PyErr_SetString(PyExc_ValueError, "sampler cannot be 0");
+        return 0;
+    }
+    *data = (p_sampler)p;
+    return 1;
+}
+
+static void free_sampler(p_sampler s)
+{
+    free(s->signals);
+    free(s->words);
+    free(s->buffer);
+    free(s);
+}
+
+// create_sampler(clock, edge, handles, widths, qualifier, depth, armed)
+//
+// *armed* is the handle of the callback of an edge trigger of the clock
+// already waited on, or 0, which is passed on by the sampler from now on.
+static PyObject *create_sampler(PyObject *self, PyObject *args)
+{
+    gpi_sim_hdl clock;
+    unsigned int edge;
+    PyObject *handles;
+    PyObject *widths;
+    PyObject *qualifier;
+    Py_ssize_t depth;
+    PyObject *armed;
+    PyObject *hseq = NULL;
+    PyObject *wseq = NULL;
+    PyObject *res = NULL;
+    p_sampler s = NULL;
+    p_sampler_clock sc;
+    Py_ssize_t i;
+
+    if (!PyArg_ParseTuple(args, "O&IOOOnO", gpi_sim_hdl_converter, &clock, &edge,
+                          &handles, &widths, &qualifier, &depth, &armed)) {
+        return NULL;
+    }
+
+    hseq = PySequence_Fast(handles, "create_sampler expects a sequence of handles");
+    if (hseq == NULL) {
+        goto out;
+    }
+    wseq = PySequence_Fast(widths, "create_sampler expects a sequence of widths");
+    if (wseq == NULL) {
+        goto out;
+    }
+    if (PySequence_Fast_GET_SIZE(wseq) != PySequence_Fast_GET_SIZE(hseq)) {
+        PyErr_SetString(PyExc_ValueError, "create_sampler needs one width per handle");
+        goto out;
+    }
+    if (PySequence_Fast_GET_SIZE(hseq) > 64) {
+        PyErr_SetString(PyExc_ValueError, "A sampler records at most 64 signals");
+        goto out;
+    }
+    if (depth < 1) {
+        PyErr_SetString(PyExc_ValueError, "The depth of a sampler must be positive");
+        goto out;
+    }
+
+    s = (p_sampler)calloc(1, sizeof(s_sampler));
+    if (s == NULL) {
+        PyErr_NoMemory();
+        goto out;
+    }
+    s->n_signals = PySequence_Fast_GET_SIZE(hseq);
+    s->signals = (gpi_sim_hdl *)calloc(s->n_signals + 1, sizeof(gpi_sim_hdl));
+    s->words = (int *)calloc(s->n_signals + 1, sizeof(int));
+    if (s->signals == NULL || s->words == NULL) {
+        PyErr_NoMemory();
+        goto out;
+    }
+
+    s->row_words = 2;
+    for (i = 0; i < s->n_signals; i++) {
+        long width;
+
+        if (!gpi_sim_hdl_converter(PySequence_Fast_GET_ITEM(hseq, i), &s->signals[i])) {
+            goto out;
+        }
+        width = PyLong_AsLong(PySequence_Fast_GET_ITEM(wseq, i));
+        if (width == -1 && PyErr_Occurred()) {
+            goto out;
+        }
+        s->words[i] = width > 64 ? (int)((width + 63) / 64) : 1;
+        s->row_words += s->words[i];
+    }
+
+    if (qualifier != Py_None && !gpi_sim_hdl_converter(qualifier, &s->qualifier)) {
+        goto out;
+    }
+
+    s->depth = depth;
+    s->buffer = (uint64_t *)malloc(depth * s->row_words * sizeof(uint64_t));
+    if (s->buffer == NULL) {
+        PyErr_NoMemory();
+        goto out;
+    }
+
+    sc = find_sampler_clock(clock, edge);
+    if (sc == NULL) {
+        sc = (p_sampler_clock)calloc(1, sizeof(s_sampler_clock));
+        if (sc == NULL) {
+            PyErr_NoMemory();
+            goto out;
+        }
+        sc->clock = clock;
+        sc->edge = edge;
+        if (PyObject_IsTrue(armed)) {
+            gpi_sim_hdl armed_hdl;
+            if (!gpi_sim_hdl_converter(armed, &armed_hdl)) {
+                free(sc);
+                goto out;
+            }
+            sc->pending = (p_callback_data)gpi_get_callback_data(armed_hdl);
+        }
+        sc->cb_hdl = gpi_register_value_change_callback(handle_sampler_callback, sc,
+                                                        clock, edge);
+        if (sc->cb_hdl == NULL) {
+            PyErr_SetString(PyExc_RuntimeError, "Unable to register a sampler on the clock");
+            free(sc);
+            goto out;
+        }
+        sc->next = sampler_clocks;
+        sampler_clocks = sc;
+    }
+
+    s->clock = sc;
+    s->next = sc->samplers;
+    sc->samplers = s;
+    res = PyLong_FromVoidPtr(s);
+    s = NULL;
+
+out:
+    if (s != NULL) {
+        free_sampler(s);
+    }
+    Py_XDECREF(hseq);
+    Py_XDECREF(wseq);
+    return res;
+}
+
+// Return the rows recorded since the last call as bytes, with the number of
+// rows and the number of rows dropped because the buffer was full.
+static PyObject *drain_sampler(PyObject *self, PyObject *args)
+{
+    p_sampler s;
+    PyObject *data;
+    PyObject *res;
+    size_t row_size;
+    Py_ssize_t first;
+
+    if (!PyArg_ParseTuple(args, "O&", sampler_converter, &s)) {
+        return NULL;
+    }
+
+    row_size = s->row_words * sizeof(uint64_t);
+    data = PyBytes_FromStringAndSize(NULL, s->count * row_size);
+    if (data == NULL) {
+        return NULL;
+    }
+
+    first = s->depth - s->head < s->count ? s->depth - s->head : s->count;
+    memcpy(PyBytes_AS_STRING(data), s->buffer + s->head * s->row_words, first * row_size);
+    memcpy(PyBytes_AS_STRING(data) + first * row_size, s->buffer, (s->count - first) * row_size);
+
+    res = Py_BuildValue("(Nnk)", data, s->count, s->dropped);
+    s->head = (s->head + s->count) % s->depth;
+    s->count = 0;
+    s->dropped = 0;
+    return res;
+}
+
+static PyObject *destroy_sampler(PyObject *self, PyObject *args)
+{
+    p_sampler s;
+    p_sampler_clock sc;
+    p_sampler *link;
+
+    if (!PyArg_ParseTuple(args, "O&", sampler_converter, &s)) {
+        return NULL;
+    }
+
+    sc = s->clock;
+    for (link = &sc->samplers; *link != NULL; link = &(*link)->next) {
+        if (*link == s) {
+            *link = s->next;
+            break;
+        }
+    }
+    free_sampler(s);
+
+    if (sc->samplers == NULL) {
+        p_sampler_clock *clink;
+
+        for (clink = &sampler_clocks; *clink != NULL; clink = &(*clink)->next) {
+            if (*clink == sc) {
+                *clink = sc->next;
+                break;
+            }
+        }
+        // Hand the callback back to Python if it is waiting on the edge
+        if (sc->pending != NULL) {
+            gpi_register_value_change_callback((gpi_function_t)handle_gpi_callback,
+                                               sc->pending, sc->clock, sc->edge);
+        } else {
+            gpi_deregister_callback(sc->cb_hdl);
+        }
+        free(sc);
+    }
+
+    return Py_BuildValue("s", "OK!");
+}
+
 static PyObject *log_msg(PyObject *self, PyObject *args)
 {
     const char *name;
@@ -483,6 +856,17 @@ static PyObject *register_value_change_callback(PyObject *self, PyObject *args)
     callback_data_p->args = fArgs;
     callback_data_p->kwargs = NULL;
 
+    // A sampler on this edge owns the GPI callback and passes it on
+    p_sampler_clock sc = find_sampler_clock(sig_hdl, edge);
+    if (sc != NULL) {
+        if (sc->pending != NULL) {
+            free_callback_data(sc->pending);
+        }
+        sc->pending = callback_data_p;
+        FEXIT
+        return PyLong_FromVoidPtr(sc->cb_hdl);
+    }
+
     hdl = gpi_register_value_change_callback((gpi_function_t)handle_gpi_callback,
                                              callback_data_p,
                                              sig_hdl,
@@ -660,6 +1044,336 @@ static PyObject *set_signal_val_long(PyObject *self, PyObject *args)
     return res;
 }
 
+// Get the values of several signals in a single call, so that buses are
+// sampled without a Python round trip per signal. Values which only contain
+// 0 and 1 are returned as ints, others as binary strings.
+static PyObject *get_signal_vals_bulk(PyObject *self, PyObject *args)
+{
+    PyObject *handles;
+    PyObject *seq;
+    PyObject *result;
+    Py_ssize_t i;
+    Py_ssize_t n;
+
+    if (!PyArg_ParseTuple(args, "O", &handles)) {
+        return NULL;
+    }
+
+    seq = PySequence_Fast(handles, "get_signal_vals_bulk expects a sequence of handles");
+    if (seq == NULL) {
+        return NULL;
+    }
+
+    n = PySequence_Fast_GET_SIZE(seq);
+    result = PyTuple_New(n);
+    if (result == NULL) {
+        Py_DECREF(seq);
+        return NULL;
+    }
+
+    for (i = 0; i < n; i++) {
+        gpi_sim_hdl hdl;
+        const char *binstr;
+        size_t len;
+        PyObject *value;
+
+        if (!gpi_sim_hdl_converter(PySequence_Fast_GET_ITEM(seq, i), &hdl)) {
+            goto error;
+        }
+
+        binstr = gpi_get_signal_value_binstr(hdl);
+        len = strlen(binstr);
+        if (len && strspn(binstr, "01") == len) {
+            value = PyLong_FromString((char *)binstr, NULL, 2);
+        } else {
+            value = Py_BuildValue("s", binstr);
+        }
+        if (value == NULL) {
+            goto error;
+        }
+        PyTuple_SET_ITEM(result, i, value);
+    }
+
+    Py_DECREF(seq);
+    return result;
+
+error:
+    Py_DECREF(seq);
+    Py_DECREF(result);
+    return NULL;
+}
+
+// Set the values of several signals in a single call. Each value is either
+// an int, set as a long, or a binary string.
+static PyObject *set_signal_vals_bulk(PyObject *self, PyObject *args)
+{
+    PyObject *handles;
+    PyObject *values;
+    PyObject *hseq;
+    PyObject *vseq = NULL;
+    PyObject *res = NULL;
+    Py_ssize_t i;
+    Py_ssize_t n;
+
+    if (!PyArg_ParseTuple(args, "OO", &handles, &values)) {
+        return NULL;
+    }
+
+    hseq = PySequence_Fast(handles, "set_signal_vals_bulk expects a sequence of handles");
+    if (hseq == NULL) {
+        return NULL;
+    }
+    vseq = PySequence_Fast(values, "set_signal_vals_bulk expects a sequence of values");
+    if (vseq == NULL) {
+        goto out;
+    }
+
+    n = PySequence_Fast_GET_SIZE(hseq);
+    if (PySequence_Fast_GET_SIZE(vseq) != n) {
+        PyErr_SetString(PyExc_ValueError, "set_signal_vals_bulk needs one value per handle");
+        goto out;
+    }
+
+    for (i = 0; i < n; i++) {
+        gpi_sim_hdl hdl;
+        PyObject *item = PySequence_Fast_GET_ITEM(vseq, i);
+
+        if (!gpi_sim_hdl_converter(PySequence_Fast_GET_ITEM(hseq, i), &hdl)) {
+            goto out;
+        }
+
+        if (PyBytes_Check(item)) {
+            gpi_set_signal_value_str(hdl, PyBytes_AsString(item));
+        } else if (PyUnicode_Check(item)) {
+            const char *binstr;
+            if (!PyArg_Parse(item, "s", &binstr)) {
+                goto out;
+            }
+            gpi_set_signal_value_str(hdl, binstr);
+        } else {
+            long value = PyLong_AsLong(item);
+            if (value == -1 && PyErr_Occurred()) {
+                goto out;
+            }
+            gpi_set_signal_value_long(hdl, value);
+        }
+    }
+
+    res = Py_BuildValue("s", "OK!");
+
+out:
+    Py_DECREF(hseq);
+    Py_XDECREF(vseq);
+    return res;
+}
+
+// State of a walk over the elements of an array, in row-major order
+typedef struct t_array_access {
+    int ndims;
+    long lefts[16];
+    long rights[16];
+    int width;                          // Bits of each element
+    Py_ssize_t nbytes;                  // Bytes of each element in data
+    unsigned char *data;                // Little-endian elements
+    char *mask;                         // Set for unresolved elements, or NULL to write
+    char *binstr;                       // Buffer of width + 1 characters to write
+    Py_ssize_t pos;
+} s_array_access;
+
+static void array_read_element(gpi_sim_hdl hdl, s_array_access *acc)
+{
+    const char *binstr = gpi_get_signal_value_binstr(hdl);
+    size_t len = strlen(binstr);
+    unsigned char *element = acc->data + acc->pos * acc->nbytes;
+    size_t bit;
+
+    memset(element, 0, acc->nbytes);
+    acc->mask[acc->pos] = 0;
+    for (bit = 0; bit < len; bit++) {
+        char c = binstr[len - 1 - bit];
+        if (c == '1') {
+            if (bit < (size_t)acc->nbytes * 8) {
+                element[bit / 8] |= 1 << (bit % 8);
+            }
+        } else if (c != '0') {
+            acc->mask[acc->pos] = 1;
+        }
+    }
+}
+
+static void array_write_element(gpi_sim_hdl hdl, s_array_access *acc)
+{
+    const unsigned char *element = acc->data + acc->pos * acc->nbytes;
+    int bit;
+
+    for (bit = 0; bit < acc->width; bit++) {
+        acc->binstr[acc->width - 1 - bit] = (element[bit / 8] >> (bit % 8)) & 1 ? '1' : '0';
+    }
+    acc->binstr[acc->width] = '\0';
+    gpi_set_signal_value_str(hdl, acc->binstr);
+}
+
+static int array_walk(gpi_sim_hdl hdl, int dim, s_array_access *acc)
+{
+    long left = acc->lefts[dim];
+    long right = acc->rights[dim];
+    long step = left <= right ? 1 : -1;
+    long index;
+
+    for (index = left; ; index += step) {
+        gpi_sim_hdl element = gpi_get_handle_by_index(hdl, (int32_t)index);
+        if (element == NULL) {
+            PyErr_Format(PyExc_IndexError, "Array contains no object at index %ld", index);
+            return -1;
+        }
+        if (dim + 1 < acc->ndims) {
+            if (array_walk(element, dim + 1, acc)) {
+                return -1;
+            }
+        } else {
+            if (acc->mask != NULL) {
+                array_read_element(element, acc);
+            } else {
+                array_write_element(element, acc);
+            }
+            acc->pos++;
+        }
+        if (index == right) {
+            return 0;
+        }
+    }
+}
+
+// Parse the arguments shared by the array functions into *acc*, returning the
+// number of elements or -1 on failure.
+static Py_ssize_t array_access_parse(PyObject *ranges, int width, Py_ssize_t nbytes,
+                                     s_array_access *acc)
+{
+    PyObject *seq;
+    Py_ssize_t count = 1;
+    int dim;
+
+    seq = PySequence_Fast(ranges, "Expected a sequence of (left, right) ranges");
+    if (seq == NULL) {
+        return -1;
+    }
+    acc->ndims = (int)PySequence_Fast_GET_SIZE(seq);
+    if (acc->ndims < 1 || acc->ndims > 16) {
+        PyErr_SetString(PyExc_ValueError, "Arrays must have between 1 and 16 dimensions");
+        Py_DECREF(seq);
+        return -1;
+    }
+    for (dim = 0; dim < acc->ndims; dim++) {
+        if (!PyArg_ParseTuple(PySequence_Fast_GET_ITEM(seq, dim), "ll",
+                              &acc->lefts[dim], &acc->rights[dim])) {
+            Py_DECREF(seq);
+            return -1;
+        }
+        count *= acc->lefts[dim] > acc->rights[dim] ? acc->lefts[dim] - acc->rights[dim] + 1
+                                                    : acc->rights[dim] - acc->lefts[dim] + 1;
+    }
+    Py_DECREF(seq);
+
+    if (width < 1 || nbytes * 8 < width) {
+        PyErr_SetString(PyExc_ValueError, "Elements don't fit in the given number of bytes");
+        return -1;
+    }
+    acc->width = width;
+    acc->nbytes = nbytes;
+    acc->pos = 0;
+    return count;
+}
+
+// Get the values of all the elements of an array of vectors, in a single
+// call. Returns the elements as little-endian words of *nbytes* bytes, and a
+// byte per element which is 1 if its value was not resolved.
+static PyObject *get_array_vals_bulk(PyObject *self, PyObject *args)
+{
+    gpi_sim_hdl hdl;
+    PyObject *ranges;
+    int width;
+    Py_ssize_t nbytes;
+    Py_ssize_t count;
+    PyObject *data;
+    PyObject *mask;
+    s_array_access acc;
+
+    if (!PyArg_ParseTuple(args, "O&Oin", gpi_sim_hdl_converter, &hdl, &ranges, &width, &nbytes)) {
+        return NULL;
+    }
+
+    count = array_access_parse(ranges, width, nbytes, &acc);
+    if (count < 0) {
+        return NULL;
+    }
+
+    data = PyBytes_FromStringAndSize(NULL, count * nbytes);
+    mask = PyBytes_FromStringAndSize(NULL, count);
+    if (data == NULL || mask == NULL) {
+        goto error;
+    }
+    acc.data = (unsigned char *)PyBytes_AS_STRING(data);
+    acc.mask = PyBytes_AS_STRING(mask);
+    if (array_walk(hdl, 0, &acc)) {
+        goto error;
+    }
+
+    return Py_BuildValue("(NN)", data, mask);
+
+error:
+    Py_XDECREF(data);
+    Py_XDECREF(mask);
+    return NULL;
+}
+
+// Set all the elements of an array of vectors in a single call, from
+// little-endian words of *nbytes* bytes.
+static PyObject *set_array_vals_bulk(PyObject *self, PyObject *args)
+{
+    gpi_sim_hdl hdl;
+    PyObject *ranges;
+    int width;
+    Py_ssize_t nbytes;
+    PyObject *values;
+    char *data;
+    Py_ssize_t len;
+    Py_ssize_t count;
+    s_array_access acc;
+    int failed;
+
+    if (!PyArg_ParseTuple(args, "O&OinO", gpi_sim_hdl_converter, &hdl, &ranges,
+                          &width, &nbytes, &values)) {
+        return NULL;
+    }
+    if (PyBytes_AsStringAndSize(values, &data, &len)) {
+        return NULL;
+    }
+
+    count = array_access_parse(ranges, width, nbytes, &acc);
+    if (count < 0) {
+        return NULL;
+    }
+    if (len != count * nbytes) {
+        PyErr_Format(PyExc_ValueError, "Expected %zd bytes for %zd elements, got %zd",
+                     count * nbytes, count, len);
+        return NULL;
+    }
+
+    acc.data = (unsigned char *)data;
+    acc.mask = NULL;
+    acc.binstr = (char *)malloc(width + 1);
+    if (acc.binstr == NULL) {
+        return PyErr_NoMemory();
+    }
+    failed = array_walk(hdl, 0, &acc);
+    free(acc.binstr);
+    if (failed) {
+        return NULL;
+    }
+
+    return Py_BuildValue("s", "OK!");
+}
+
 static PyObject *get_definition_name(PyObject *self, PyObject *args)
 {
     const char* result;
@@ -728,6 +1442,282 @@ static PyObject *get_handle_by_index(PyObject *self, PyObject *args)
     return value;
 }
 
+// Resolve a path such as "a.b[3].c" below hdl, one step at a time but in a
+// single call from Python. Names are separated by '.', indices are written in
+// square brackets and extended identifiers are written between backslashes.
+// Returns a list of the handle of each step, which stops at the first step
+// not found.
+static PyObject *get_handle_by_path(PyObject *self, PyObject *args)
+{
+    gpi_sim_hdl hdl;
+    const char *path;
+    char *buf;
+    char *pos;
+    PyObject *handles;
+
+    if (!PyArg_ParseTuple(args, "O&s", gpi_sim_hdl_converter, &hdl, &path)) {
+        return NULL;
+    }
+
+    handles = PyList_New(0);
+    if (handles == NULL) {
+        return NULL;
+    }
+    // A copy which names are terminated in
+    buf = strdup(path);
+    if (buf == NULL) {
+        Py_DECREF(handles);
+        return PyErr_NoMemory();
+    }
+
+    pos = buf;
+    while (*pos) {
+        gpi_sim_hdl next;
+        PyObject *value;
+
+        if (*pos == '[') {
+            char *end;
+            long index = strtol(pos + 1, &end, 10);
+            if (end == pos + 1 || *end != ']') {
+                PyErr_Format(PyExc_ValueError, "Bad index in path \"%s\"", path);
+                goto error;
+            }
+            pos = end + 1;
+            next = gpi_get_handle_by_index(hdl, (int32_t)index);
+        } else {
+            char *name;
+            char saved;
+
+            if (*pos == '.') {
+                pos++;
+            }
+            name = pos;
+            if (*pos == '\\') {
+                // An extended identifier, up to and including the closing backslash
+                pos = strchr(pos + 1, '\\');
+                if (pos == NULL) {
+                    PyErr_Format(PyExc_ValueError, "Unterminated extended identifier in path \"%s\"", path);
+                    goto error;
+                }
+                pos++;
+            } else {
+                pos += strcspn(pos, ".[");
+            }
+            if (pos == name) {
+                PyErr_Format(PyExc_ValueError, "Empty name in path \"%s\"", path);
+                goto error;
+            }
+            saved = *pos;
+            *pos = '\0';
+            next = gpi_get_handle_by_name(hdl, name);
+            *pos = saved;
+        }
+
+        if (next == NULL) {
+            break;
+        }
+        value = PyLong_FromVoidPtr(next);
+        if (value == NULL || PyList_Append(handles, value) < 0) {
+            Py_XDECREF(value);
+            goto error;
+        }
+        Py_DECREF(value);
+        hdl = next;
+    }
+
+    free(buf);
+    return handles;
+
+error:
+    free(buf);
+    Py_DECREF(handles);
+    return NULL;
+}
+
+// Match a character against the set of a glob pattern, p pointing after its
+// '['. Returns the end of the set or NULL if it isn't terminated.
+static const char *glob_set(const char *p, char c, int *matched)
+{
+    int negate = (*p == '!');
+    int found = 0;
+
+    if (negate) {
+        p++;
+    }
+    if (*p == ']') {
+        // A ']' first in the set is part of it
+        found = (c == ']');
+        p++;
+    }
+    while (*p && *p != ']') {
+        if (p[1] == '-' && p[2] && p[2] != ']') {
+            found |= (c >= p[0] && c <= p[2]);
+            p += 3;
+        } else {
+            found |= (c == *p);
+            p++;
+        }
+    }
+    if (!*p) {
+        return NULL;
+    }
+    *matched = (found != negate);
+    return p + 1;
+}
+
+// Match a name against a glob pattern, with the '*', '?' and '[...]'
+// wildcards of Python's fnmatch.fnmatchcase()
+static int glob_match(const char *pattern, const char *name)
+{
+    const char *star_pattern = NULL;
+    const char *star_name = NULL;
+
+    while (*name) {
+        const char *next = NULL;
+        int matched = 0;
+
+        if (*pattern == '*') {
+            star_pattern = ++pattern;
+            star_name = name;
+            continue;
+        }
+        if (*pattern == '?') {
+            matched = 1;
+            next = pattern + 1;
+        } else if (*pattern == '[') {
+            next = glob_set(pattern + 1, *name, &matched);
+            if (next == NULL) {
+                // An unterminated set is a literal '['
+                matched = (*name == '[');
+                next = pattern + 1;
+            }
+        } else if (*pattern) {
+            matched = (*pattern == *name);
+            next = pattern + 1;
+        }
+
+        if (matched) {
+            pattern = next;
+            name++;
+        } else if (star_pattern) {
+            // Let the last '*' match one more character
+            pattern = star_pattern;
+            name = ++star_name;
+        } else {
+            return 0;
+        }
+    }
+    while (*pattern == '*') {
+        pattern++;
+    }
+    return !*pattern;
+}
+
+// The last name in a hierarchical name, which may be an extended identifier
+static const char *leaf_name(const char *name)
+{
+    size_t len = strlen(name);
+    const char *leaf;
+
+    if (len > 1 && name[len - 1] == '\\') {
+        for (leaf = name + len - 2; leaf > name && *leaf != '\\'; leaf--);
+        if (*leaf == '\\') {
+            return leaf;
+        }
+    }
+    leaf = strrchr(name, '.');
+    return leaf ? leaf + 1 : name;
+}
+
+// Append (handle, path) to result for each object below hdl whose name matches
+// pattern, searching depth levels of hierarchy, or all if depth is negative.
+// Returns -1 with a Python exception set on error.
+static int find_walk(gpi_sim_hdl hdl, const char *prefix, const char *pattern,
+                     int depth, PyObject *result)
+{
+    gpi_iterator_hdl iterator;
+    gpi_sim_hdl child;
+    int status = 0;
+
+    iterator = gpi_iterate(hdl, GPI_OBJECTS);
+    if (iterator == NULL) {
+        return 0;
+    }
+
+    // The iterator is only freed by the GPI once it's exhausted
+    while ((child = gpi_next(iterator)) != NULL) {
+        const char *name;
+        const char *leaf;
+        char *path;
+        gpi_objtype_t type;
+        size_t prefix_len;
+
+        if (status < 0) {
+            continue;
+        }
+
+        name = gpi_get_signal_name_str(child);
+        if (name == NULL) {
+            continue;
+        }
+        leaf = leaf_name(name);
+
+        prefix_len = strlen(prefix);
+        path = (char *)malloc(prefix_len + strlen(leaf) + 2);
+        if (path == NULL) {
+            PyErr_NoMemory();
+            status = -1;
+            continue;
+        }
+        if (prefix_len) {
+            sprintf(path, "%s.%s", prefix, leaf);
+        } else {
+            strcpy(path, leaf);
+        }
+
+        if (pattern == NULL || glob_match(pattern, leaf)) {
+            PyObject *item = Py_BuildValue("(Ns)", PyLong_FromVoidPtr(child), path);
+            if (item == NULL || PyList_Append(result, item) < 0) {
+                status = -1;
+            }
+            Py_XDECREF(item);
+        }
+
+        type = gpi_get_object_type(child);
+        if (status == 0 && depth != 1 &&
+            (type == GPI_MODULE || type == GPI_STRUCTURE || type == GPI_GENARRAY)) {
+            // The names of the elements of a generate array include its name
+            status = find_walk(child, type == GPI_GENARRAY ? prefix : path,
+                               pattern, depth > 0 ? depth - 1 : depth, result);
+        }
+        free(path);
+    }
+
+    return status;
+}
+
+static PyObject *find_handles(PyObject *self, PyObject *args)
+{
+    gpi_sim_hdl hdl;
+    const char *pattern;
+    int depth;
+    PyObject *result;
+
+    if (!PyArg_ParseTuple(args, "O&zi", gpi_sim_hdl_converter, &hdl, &pattern, &depth)) {
+        return NULL;
+    }
+
+    result = PyList_New(0);
+    if (result == NULL) {
+        return NULL;
+    }
+    if (depth != 0 && find_walk(hdl, "", pattern, depth, result) < 0) {
+        Py_DECREF(result);
+        return NULL;
+    }
+    return result;
+}
+
 static PyObject *get_root_handle(PyObject *self, PyObject *args)
 {
     const char *name;
@@ -901,7 +1891,16 @@ static PyObject *deregister_callback(PyObject *self, PyObject *args)
         return NULL;
     }
 
-    gpi_deregister_callback(hdl);
+    p_sampler_clock sc = find_sampler_clock_by_cb(hdl);
+    if (sc != NULL) {
+        // Only the Python callback passed on by the sampler is removed
+        if (sc->pending != NULL) {
+            free_callback_data(sc->pending);
+            sc->pending = NULL;
+        }
+    } else {
+        gpi_deregister_callback(hdl);
+    }
 
     value = Py_BuildValue("s", "OK!");
 
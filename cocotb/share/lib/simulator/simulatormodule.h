@@ -61,13 +61,22 @@ static PyObject *get_signal_val_long(PyObject *self, PyObject *args);
 static PyObject *get_signal_val_real(PyObject *self, PyObject *args);
 static PyObject *get_signal_val_str(PyObject *self, PyObject *args);
 static PyObject *get_signal_val_binstr(PyObject *self, PyObject *args);
+static PyObject *get_signal_vals_bulk(PyObject *self, PyObject *args);
 static PyObject *set_signal_val_long(PyObject *self, PyObject *args);
+static PyObject *set_signal_vals_bulk(PyObject *self, PyObject *args);
 static PyObject *set_signal_val_real(PyObject *self, PyObject *args);
+static PyObject *get_array_vals_bulk(PyObject *self, PyObject *args);
+static PyObject *set_array_vals_bulk(PyObject *self, PyObject *args);
+static PyObject *create_sampler(PyObject *self, PyObject *args);
+static PyObject *drain_sampler(PyObject *self, PyObject *args);
+static PyObject *destroy_sampler(PyObject *self, PyObject *args);
 static PyObject *set_signal_val_str(PyObject *self, PyObject *args);
 static PyObject *get_definition_name(PyObject *self, PyObject *args);
 static PyObject *get_definition_file(PyObject *self, PyObject *args);
 static PyObject *get_handle_by_name(PyObject *self, PyObject *args);
 static PyObject *get_handle_by_index(PyObject *self, PyObject *args);
+static PyObject *get_handle_by_path(PyObject *self, PyObject *args);
+static PyObject *find_handles(PyObject *self, PyObject *args);
 static PyObject *get_root_handle(PyObject *self, PyObject *args);
 static PyObject *get_name_string(PyObject *self, PyObject *args);
 static PyObject *get_type(PyObject *self, PyObject *args);
@@ -100,10 +109,19 @@ static PyMethodDef SimulatorMethods[] = {
     {"set_signal_val_long", set_signal_val_long, METH_VARARGS, "Set the value of a signal using a long"},
     {"set_signal_val_str", set_signal_val_str, METH_VARARGS, "Set the value of a signal using a binary string"},
     {"set_signal_val_real", set_signal_val_real, METH_VARARGS, "Set the value of a signal using a double precision float"},
+    {"get_signal_vals_bulk", get_signal_vals_bulk, METH_VARARGS, "Get the values of a sequence of signals as ints, or binary strings if unresolved"},
+    {"set_signal_vals_bulk", set_signal_vals_bulk, METH_VARARGS, "Set the values of a sequence of signals from ints or binary strings"},
+    {"get_array_vals_bulk", get_array_vals_bulk, METH_VARARGS, "Get the values of all the elements of an array as packed little-endian words"},
+    {"set_array_vals_bulk", set_array_vals_bulk, METH_VARARGS, "Set the values of all the elements of an array from packed little-endian words"},
+    {"create_sampler", create_sampler, METH_VARARGS, "Create a sampler recording signals on the edges of a clock"},
+    {"drain_sampler", drain_sampler, METH_VARARGS, "Get the rows recorded by a sampler since the last drain"},
+    {"destroy_sampler", destroy_sampler, METH_VARARGS, "Stop and free a sampler"},
     {"get_definition_name", get_definition_name, METH_VARARGS, "Get the name of a GPI object's definition"},
     {"get_definition_file", get_definition_file, METH_VARARGS, "Get the file that sources the object's definition"},
     {"get_handle_by_name", get_handle_by_name, METH_VARARGS, "Get handle of a named object"},
     {"get_handle_by_index", get_handle_by_index, METH_VARARGS, "Get handle of a object at an index in a parent"},
+    {"get_handle_by_path", get_handle_by_path, METH_VARARGS, "Get handles of the objects along a dotted path below a parent"},
+    {"find_handles", find_handles, METH_VARARGS, "Get handles and paths of the objects below a parent whose names match a glob pattern"},
     {"get_root_handle", get_root_handle, METH_VARARGS, "Get the root handle"},
     {"get_name_string", get_name_string, METH_VARARGS, "Get the name of an object as a string"},
     {"get_type_string", get_type_string, METH_VARARGS, "Get the type of an object as a string"},
@@ -29,7 +29,6 @@ from __future__ import print_function
 
 """Collection of handy functions."""
 
-import ctypes
 import math
 import os
 import sys
@@ -50,6 +49,22 @@ if sys.version_info.major >= 3:
 else:
     integer_types = (int, long)  # noqa
 
+# Conversions between ints and little-endian bytes
+if sys.version_info.major >= 3:
+    def _int_from_bytes(data):
+        return int.from_bytes(data, "little")
+
+    def _int_to_bytes(value, size):
+        return value.to_bytes(size, "little")
+else:
+    import binascii
+
+    def _int_from_bytes(data):
+        return int(binascii.hexlify(bytes(data)[::-1]) or b"0", 16)
+
+    def _int_to_bytes(value, size):
+        return binascii.unhexlify(b"%0*x" % (size * 2, value))[::-1]
+
 
 def get_python_integer_types():
     warnings.warn(
@@ -159,6 +174,7 @@ def pack(ctypes_obj):
     Returns:
         New Python string containing the bytes from memory holding *ctypes_obj*.
     """
+    import ctypes
     return ctypes.string_at(ctypes.addressof(ctypes_obj),
                             ctypes.sizeof(ctypes_obj))
 
@@ -181,6 +197,7 @@ def unpack(ctypes_obj, string, bytes=None):
             are not equal.
         :exc:`MemoryError`: If *bytes* is longer than size of *ctypes_obj*.
     """
+    import ctypes
     if bytes is None:
         if len(string) != ctypes.sizeof(ctypes_obj):
             raise ValueError("Attempt to unpack a string of size %d into a \
@@ -243,12 +260,136 @@ def hexdump(x):
     return rs
 
 
-def hexdiffs(x, y):
+def _align(x, y, max_cells):
+    """Align two strings so that the number of edits between them is minimal.
+
+    A common prefix is aligned directly. The rest is aligned by a dynamic
+    program restricted to a band of diagonals which is just wide enough to
+    contain an optimal alignment (Ukkonen's algorithm), so time and memory are
+    proportional to the length times the number of edits.
+
+    Returns:
+        Two lists of equal length, each holding a character of *x* (resp. *y*)
+        or ``""`` where the other string has an insertion, or ``None`` if
+        aligning would have taken more than *max_cells* steps.
+    """
+    n = len(x)
+    m = len(y)
+    prefix = 0
+    while prefix < min(n, m) and x[prefix] == y[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < min(n, m) - prefix and x[n - suffix - 1] == y[m - suffix - 1]:
+        suffix += 1
+
+    # As in scapy's hexdiff, the dynamic program runs over the reversed
+    # strings, which decides where insertions go among equal cost alignments.
+    # The backtracking starts with the common prefix, where matching is always
+    # preferred, so leaving the prefix out does not change the result. The
+    # common suffix is kept, as it can take part in breaking ties.
+    a = x[prefix:][::-1]
+    b = y[prefix:][::-1]
+    n = len(a)
+    m = len(b)
+    inf = n + m + 1
+
+    # Any path through diagonal k (column - row) needs at least
+    # |k| + |k - (m - n)| insertions, so a band of diagonals admitting paths
+    # of up to `bound` edits contains every alignment of cost <= bound.
+    bound = abs(m - n) + 16
+    while True:
+        extra = (bound - abs(m - n)) // 2
+        lo = min(0, m - n) - extra
+        hi = max(0, m - n) + extra
+        width = hi - lo + 1
+
+        # Within the common suffix, the cost of aligning a[:row] with b[:col]
+        # is |row - col|, so only the rows from `first` on are computed.
+        first = max(0, suffix - hi)
+        if (n - first + 1) * width > max_cells:
+            return None
+
+        # dirs[row - first][col - row - lo] is 0 for a substitution/match, 1
+        # for a character of `a` against nothing and 2 for a character of `b`
+        # against nothing.
+        dirs = []
+        prev = [inf] * (width + 1)
+        for c in range(width):
+            if 0 <= first + lo + c <= m:
+                prev[c] = abs(lo + c)
+        dirs.append(bytearray(width))
+        for row in range(first + 1, n + 1):
+            char = a[row - 1]
+            base = row + lo
+            cur = [inf] * (width + 1)
+            drow = bytearray(width)
+            for c in range(max(0, -base), min(width - 1, m - base) + 1):
+                col = base + c
+                if col == 0:
+                    cur[c] = row
+                    drow[c] = 1
+                    continue
+                best = prev[c] + (char != b[col - 1])
+                v = prev[c + 1] + 1
+                if v < best:
+                    best = v
+                    drow[c] = 1
+                if c:
+                    v = cur[c - 1] + 1
+                    if v < best:
+                        best = v
+                        drow[c] = 2
+                cur[c] = best
+            dirs.append(drow)
+            prev = cur
+
+        cost = prev[m - n - lo]
+        if cost <= bound:
+            break
+        # cost is achievable, so a band of that size holds an optimal path
+        bound = cost
+
+    alignx = list(x[:prefix])
+    aligny = list(y[:prefix])
+    row, col = n, m
+    while row or col:
+        if row > first:
+            d = dirs[row - first][col - row - lo]
+        elif not row:
+            d = 2
+        elif not col or (row > col and a[row - 1] != b[col - 1]):
+            d = 1
+        elif row < col and a[row - 1] != b[col - 1]:
+            d = 2
+        else:
+            d = 0
+        if d == 0:
+            row -= 1
+            col -= 1
+            alignx.append(a[row])
+            aligny.append(b[col])
+        elif d == 1:
+            row -= 1
+            alignx.append(a[row])
+            aligny.append("")
+        else:
+            col -= 1
+            alignx.append("")
+            aligny.append(b[col])
+    return alignx, aligny
+
+
+def hexdiffs(x, y, max_cells=1 << 21):
     """Return a diff string showing differences between two binary strings.
 
+    The cost of the diff grows with the length of the inputs times the number
+    of differences between them. When aligning them would take more than
+    *max_cells* steps, only the region around the first difference is shown.
+
     Args:
         x: Object that supports conversion via the ``str`` built-in.
         y: Object that supports conversion via the ``str`` built-in.
+        max_cells (int, optional): Limit on the work done aligning *x* and *y*.
 
     Example:
         >>> print(hexdiffs(0, 1))
@@ -284,122 +425,114 @@ def hexdiffs(x, y):
         else:
             return string
 
-    rs = ""
+    def render(backtrackx, backtracky, offset=0):
+        rs = ""
+        x = y = offset
+        i = 0
+        colorize = { 0: lambda x: x,  # noqa
+                    -1: lambda x: x,  # noqa
+                     1: lambda x: x}  # noqa
+
+        dox = 1
+        doy = 0
+        l = len(backtrackx)
+        while i < l:
+            separate = 0
+            linex = backtrackx[i:i+16]
+            liney = backtracky[i:i+16]
+            xx = sum(len(k) for k in linex)
+            yy = sum(len(k) for k in liney)
+            if dox and not xx:
+                dox = 0
+                doy = 1
+            if dox and linex == liney:
+                doy = 1
 
-    x = str(x)[::-1]
-    y = str(y)[::-1]
-    SUBST = 1
-    INSERT = 1
-    d = {}
-    d[-1, -1] = 0, (-1, -1)
-    for j in range(len(y)):
-        d[-1, j] = d[-1, j - 1][0] + INSERT, (-1, j - 1)
-    for i in range(len(x)):
-        d[i, -1] = d[i - 1, -1][0] + INSERT, (i - 1, -1)
-
-    for j in range(len(y)):
-        for i in range(len(x)):
-            d[i, j] = min((d[i-1, j-1][0] + SUBST*(x[i] != y[j]), (i-1, j-1)),
-                          (d[i - 1, j][0] + INSERT, (i - 1, j)),
-                          (d[i, j - 1][0] + INSERT, (i, j - 1)))
-
-    backtrackx = []
-    backtracky = []
-    i = len(x) - 1
-    j = len(y) - 1
-    while not (i == j == -1):
-        i2, j2 = d[i, j][1]
-        backtrackx.append(x[i2+1:i+1])
-        backtracky.append(y[j2+1:j+1])
-        i, j = i2, j2
-
-    x = y = i = 0
-    colorize = { 0: lambda x: x,  # noqa
-                -1: lambda x: x,  # noqa
-                 1: lambda x: x}  # noqa
-
-    dox = 1
-    doy = 0
-    l = len(backtrackx)
-    while i < l:
-        separate = 0
-        linex = backtrackx[i:i+16]
-        liney = backtracky[i:i+16]
-        xx = sum(len(k) for k in linex)
-        yy = sum(len(k) for k in liney)
-        if dox and not xx:
-            dox = 0
-            doy = 1
-        if dox and linex == liney:
-            doy = 1
-
-        if dox:
-            xd = y
-            j = 0
-            while not linex[j]:
-                j += 1
-                xd -= 1
-            if dox != doy:
-                rs += highlight("%04x" % xd) + " "
+            if dox:
+                xd = y
+                j = 0
+                while not linex[j]:
+                    j += 1
+                    xd -= 1
+                if dox != doy:
+                    rs += highlight("%04x" % xd) + " "
+                else:
+                    rs += highlight("%04x" % xd, colour=ANSI.COLOR_HILITE_HEXDIFF_1) + " "
+                x += xx
+                line = linex
             else:
-                rs += highlight("%04x" % xd, colour=ANSI.COLOR_HILITE_HEXDIFF_1) + " "
-            x += xx
-            line = linex
-        else:
-            rs += "    "
-        if doy:
-            yd = y
-            j = 0
-            while not liney[j]:
-                j += 1
-                yd -= 1
-            if doy - dox != 0:
-                rs += " " + highlight("%04x" % yd)
+                rs += "    "
+            if doy:
+                yd = y
+                j = 0
+                while not liney[j]:
+                    j += 1
+                    yd -= 1
+                if doy - dox != 0:
+                    rs += " " + highlight("%04x" % yd)
+                else:
+                    rs += highlight("%04x" % yd, colour=ANSI.COLOR_HILITE_HEXDIFF_1)
+                y += yy
+                line = liney
             else:
-                rs += highlight("%04x" % yd, colour=ANSI.COLOR_HILITE_HEXDIFF_1)
-            y += yy
-            line = liney
-        else:
-            rs += "    "
-
-        rs += " "
-
-        cl = ""
-        for j in range(16):
-            if i + j < l:
-                if line[j]:
-                    if linex[j] != liney[j]:
-                        rs += highlight("%02X" % ord(line[j]),
-                                        colour=ANSI.COLOR_HILITE_HEXDIFF_2)
+                rs += "    "
+
+            rs += " "
+
+            cl = ""
+            for j in range(16):
+                if i + j < l:
+                    if line[j]:
+                        if linex[j] != liney[j]:
+                            rs += highlight("%02X" % ord(line[j]),
+                                            colour=ANSI.COLOR_HILITE_HEXDIFF_2)
+                        else:
+                            rs += "%02X" % ord(line[j])
+                        if linex[j] == liney[j]:
+                            cl += highlight(_sane_color(line[j]),
+                                            colour=ANSI.COLOR_HILITE_HEXDIFF_3)
+                        else:
+                            cl += highlight(sane(line[j]),
+                                            colour=ANSI.COLOR_HILITE_HEXDIFF_4)
                     else:
-                        rs += "%02X" % ord(line[j])
-                    if linex[j] == liney[j]:
-                        cl += highlight(_sane_color(line[j]),
-                                        colour=ANSI.COLOR_HILITE_HEXDIFF_3)
-                    else:
-                        cl += highlight(sane(line[j]),
-                                        colour=ANSI.COLOR_HILITE_HEXDIFF_4)
+                        rs += "  "
+                        cl += " "
                 else:
-                    rs += "  "
-                    cl += " "
-            else:
-                rs += "   "
-            if j == 7:
-                rs += " "
+                    rs += "   "
+                if j == 7:
+                    rs += " "
 
-        rs += " " + cl + '\n'
+            rs += " " + cl + '\n'
 
-        if doy or not yy:
-            doy = 0
-            dox = 1
-            i += 16
-        else:
-            if yy:
-                dox = 0
-                doy = 1
-            else:
+            if doy or not yy:
+                doy = 0
+                dox = 1
                 i += 16
-    return rs
+            else:
+                if yy:
+                    dox = 0
+                    doy = 1
+                else:
+                    i += 16
+        return rs
+
+    x = str(x)
+    y = str(y)
+
+    aligned = _align(x, y, max_cells)
+    if aligned is not None:
+        return render(*aligned)
+
+    # Too different to align in full, show the neighbourhood of the first
+    # difference instead
+    first = 0
+    while first < min(len(x), len(y)) and x[first] == y[first]:
+        first += 1
+    start = max(0, first - 16) & ~0xf
+    rs = ("Inputs of %d and %d bytes differ too much to be aligned, "
+          "showing bytes from offset 0x%04x:\n" % (len(x), len(y), start))
+    window = slice(start, start + 64)
+    return rs + render(*_align(x[window], y[window], 1 << 16), offset=start)
 
 
 # This is essentially six.exec_
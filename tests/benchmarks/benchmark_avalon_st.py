@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+
+"""Measure the Python cost of sending packets with the Avalon-ST driver.
+
+:class:`cocotb.drivers.avalon.AvalonSTPkts` is given a mock bus whose signals
+only record the values assigned to them, and the coroutine sending each
+packet is stepped through without a simulator, one clock edge per step.  This
+isolates the time spent in the driver's clocked loop from the time spent in
+the simulator.
+
+Usage::
+
+    python tests/benchmarks/benchmark_avalon_st.py [--sizes 64,1500,9000]
+"""
+
+from __future__ import print_function
+
+import argparse
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                os.pardir, os.pardir)))
+
+from cocotb.binary import BinaryValue  # noqa: E402
+from cocotb.drivers.avalon import AvalonSTPkts  # noqa: E402
+
+
+class _MockSignal(object):
+    """Stands in for a signal handle, keeping the last value assigned."""
+
+    def __init__(self, width):
+        self._width = width
+        self.value = 0
+
+    def __len__(self):
+        return self._width
+
+    def __le__(self, value):
+        self.value = value
+
+
+class _MockBus(object):
+    pass
+
+
+def _driver(width):
+    driver = AvalonSTPkts.__new__(AvalonSTPkts)
+    driver.name = "mock"
+    driver.clock = _MockSignal(1)
+    driver.bus = _MockBus()
+    driver.bus.valid = _MockSignal(1)
+    driver.bus.data = _MockSignal(width * 8)
+    driver.bus.startofpacket = _MockSignal(1)
+    driver.bus.endofpacket = _MockSignal(1)
+    driver.bus.empty = _MockSignal(max(1, (width - 1).bit_length()))
+    driver.config = dict(AvalonSTPkts._default_config)
+    driver.use_empty = width > 1
+    driver.valid_generator = None
+    driver._idle_values = [
+        (name, BinaryValue(n_bits=len(getattr(driver.bus, name)),
+                           value="x" * len(getattr(driver.bus, name))))
+        for name in ("data", "startofpacket", "endofpacket", "empty")]
+    driver.on, driver.off = True, False
+    return driver
+
+
+def _send(driver, packet):
+    # Step the generator underneath the coroutine, one clock edge per step
+    for _ in driver._send_string(packet)._coro:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", default="64,1500,9000",
+                        help="comma-separated packet sizes in bytes")
+    parser.add_argument("--widths", default="8,64",
+                        help="comma-separated bus widths in bytes")
+    parser.add_argument("--packets", type=int, default=200,
+                        help="number of packets sent per timing")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="number of timings to take the best of")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    print("%8s %8s %14s %12s" % ("width", "size", "cycles/s", "MB/s"))
+    for width in [int(w) for w in args.widths.split(",")]:
+        driver = _driver(width)
+        for size in [int(s) for s in args.sizes.split(",")]:
+            packet = bytes(bytearray(rng.getrandbits(8) for _ in range(size)))
+            cycles = -(-size // width) * args.packets
+            best = min(timeit.repeat(lambda: [_send(driver, packet)
+                                              for _ in range(args.packets)],
+                                     repeat=args.repeat, number=1))
+            print("%8d %8d %14.0f %12.2f" % (width, size, cycles / best,
+                                             size * args.packets / best / 1e6))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+
+"""Measure the Python cost of driving and capturing a :class:`cocotb.bus.Bus`.
+
+The handles of the bus are real :class:`cocotb.handle.ModifiableObject`
+instances on top of an in-process stand-in for the simulator library, which
+only stores the value of each signal, and the scheduler's write cache is
+flushed by hand after each drive, as it would be in the ReadWrite phase. This
+isolates the time spent in :mod:`cocotb.bus` and :mod:`cocotb.handle` from
+the time spent in the simulator.
+
+Each transaction is driven and captured:
+
+* one signal at a time, with ``<=`` and ``.value``,
+* with :meth:`~cocotb.bus.Bus.drive` and :meth:`~cocotb.bus.Bus.capture`,
+* with a :class:`~cocotb.bus.BusCodec` for a namedtuple.
+
+Usage::
+
+    python tests/benchmarks/benchmark_bus.py [--signals 4,16] [--no-bulk]
+"""
+
+from __future__ import print_function
+
+import argparse
+import collections
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                os.pardir, os.pardir)))
+
+import cocotb  # noqa: E402
+import cocotb.bus  # noqa: E402
+import cocotb.handle  # noqa: E402
+from cocotb.bus import Bus  # noqa: E402
+from cocotb.handle import ModifiableObject  # noqa: E402
+
+
+class _Simulator(object):
+    """Stands in for the simulator library, a GPI handle is a signal index."""
+
+    def __init__(self, widths, bulk):
+        self.names = ["bus_s%d" % i for i in range(len(widths))]
+        self.widths = widths
+        self.values = ["0" * width for width in widths]
+        if bulk:
+            self.get_signal_vals_bulk = self._get_signal_vals_bulk
+            self.set_signal_vals_bulk = self._set_signal_vals_bulk
+
+    def get_name_string(self, hdl):
+        return self.names[hdl]
+
+    def get_type_string(self, hdl):
+        return "GPI_REGISTER"
+
+    def get_definition_name(self, hdl):
+        return ""
+
+    def get_definition_file(self, hdl):
+        return ""
+
+    def get_num_elems(self, hdl):
+        return self.widths[hdl]
+
+    def get_range(self, hdl):
+        return (self.widths[hdl] - 1, 0)
+
+    def get_signal_val_binstr(self, hdl):
+        return self.values[hdl]
+
+    def set_signal_val_long(self, hdl, value):
+        self.values[hdl] = format(value, "0%db" % self.widths[hdl])
+
+    def set_signal_val_str(self, hdl, value):
+        self.values[hdl] = value
+
+    def _get_signal_vals_bulk(self, hdls):
+        return tuple(int(self.values[hdl], 2) for hdl in hdls)
+
+    def _set_signal_vals_bulk(self, hdls, values):
+        for hdl, value in zip(hdls, values):
+            if isinstance(value, str):
+                self.values[hdl] = value
+            else:
+                self.values[hdl] = format(value, "0%db" % self.widths[hdl])
+
+
+class _Scheduler(object):
+    """Keeps the scheduler's write cache, flushed by :func:`_flush`."""
+
+    skip_redundant_writes = False
+
+    def __init__(self):
+        self._writes = {}
+        self._merged_writes = {}
+
+    def save_write(self, handle, value):
+        merged = self._merged_writes.pop(handle, None)
+        if merged is not None:
+            self._writes[merged[0]].pop(merged[1], None)
+        self._writes[handle] = value
+
+
+class _Entity(object):
+    def __init__(self, handles):
+        self._log = cocotb.handle.SimLog("cocotb.bench")
+        self._name = "bench"
+        for hdl in handles:
+            setattr(self, hdl._name, hdl)
+
+    def __hasattr__(self, name):
+        return hasattr(self, name)
+
+
+def _flush():
+    writes = cocotb.scheduler._writes
+    cocotb.scheduler._writes = {}
+    cocotb.scheduler._merged_writes.clear()
+    for handle, value in writes.items():
+        handle.setimmediatevalue(value)
+
+
+def _setup(n_signals, bulk):
+    widths = [(1, 8, 32, 64)[i % 4] for i in range(n_signals)]
+    sim = _Simulator(widths, bulk)
+    cocotb.handle.simulator = sim
+    cocotb.bus.simulator = sim
+    cocotb.scheduler = _Scheduler()
+    handles = [ModifiableObject(i, sim.names[i]) for i in range(n_signals)]
+    fields = ["s%d" % i for i in range(n_signals)]
+    bus = Bus(_Entity(handles), "bus", fields)
+    Transaction = collections.namedtuple("Transaction", fields)
+    transaction = Transaction(*[(1 << width) - 2 for width in widths])
+    return handles, bus, Transaction, transaction
+
+
+def _cases(handles, bus, Transaction, transaction):
+    values = list(transaction)
+    codec = bus.codec(Transaction)
+
+    def per_signal():
+        for hdl, value in zip(handles, values):
+            hdl <= value
+        _flush()
+        return [hdl.value for hdl in handles]
+
+    def bus_methods():
+        bus.drive(transaction)
+        _flush()
+        return bus.capture()
+
+    def bus_codec():
+        codec.drive(transaction)
+        _flush()
+        return codec.capture()
+
+    assert bus_codec() == transaction
+    return [("per signal", per_signal), ("Bus.drive/capture", bus_methods),
+            ("BusCodec", bus_codec)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--signals", default="4,16",
+                        help="comma-separated numbers of signals in the bus")
+    parser.add_argument("--transactions", type=int, default=10000,
+                        help="number of transactions per timing")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="number of timings to take the best of")
+    parser.add_argument("--no-bulk", action="store_true",
+                        help="leave out the bulk simulator calls")
+    args = parser.parse_args()
+
+    print("%8s  %-20s %14s" % ("signals", "case", "transactions/s"))
+    for n_signals in [int(n) for n in args.signals.split(",")]:
+        setup = _setup(n_signals, not args.no_bulk)
+        for name, case in _cases(*setup):
+            best = min(timeit.repeat(case, repeat=args.repeat,
+                                     number=args.transactions))
+            print("%8d  %-20s %14.0f" % (n_signals, name,
+                                         args.transactions / best))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+
+"""Measure the cost of creating handles and of logging from many objects.
+
+Handles are created by attribute access on a :class:`cocotb.handle.HierarchyObject`
+on top of an in-process stand-in for the simulator library, which counts the
+calls made to it, as a testbench binding to a large design does.  The handles
+are created:
+
+* without using them,
+* logging a message from each, below the level of the logger,
+* asking each for its definition.
+
+Coroutines are then created and log a message each, as fork-heavy tests do,
+and the number of loggers registered with :mod:`logging` is reported, which
+stays the same however many coroutines are created.
+
+Usage::
+
+    python tests/benchmarks/benchmark_handles.py [--signals 1000] [--coroutines 10000]
+"""
+
+from __future__ import print_function
+
+import argparse
+import logging
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                os.pardir, os.pardir)))
+
+import cocotb  # noqa: E402
+import cocotb.handle  # noqa: E402
+from cocotb.handle import HierarchyObject  # noqa: E402
+
+
+class _Simulator(object):
+    """Stands in for the simulator library, a GPI handle is a signal index.
+
+    Handle 0 is the top level, which contains the signals.
+    """
+
+    UNKNOWN, MEMORY, MODULE, NET, PARAMETER, REG, NETARRAY, ENUM, STRUCTURE, \
+        REAL, INTEGER, STRING, GENARRAY = range(13)
+
+    def __init__(self, n_signals):
+        self.names = ["top"] + ["s%d" % i for i in range(n_signals)]
+        self.handles = dict((name, hdl) for hdl, name in enumerate(self.names))
+        self.calls = 0
+
+    def get_handle_by_name(self, hdl, name):
+        self.calls += 1
+        return self.handles.get(name, 0)
+
+    def get_type(self, hdl):
+        self.calls += 1
+        return self.MODULE if hdl == 0 else self.REG
+
+    def get_const(self, hdl):
+        self.calls += 1
+        return False
+
+    def get_range(self, hdl):
+        self.calls += 1
+        return (7, 0)
+
+    def get_name_string(self, hdl):
+        self.calls += 1
+        return self.names[hdl]
+
+    def get_type_string(self, hdl):
+        self.calls += 1
+        return "GPI_MODULE" if hdl == 0 else "GPI_REGISTER"
+
+    def get_definition_name(self, hdl):
+        self.calls += 1
+        return ""
+
+    def get_definition_file(self, hdl):
+        self.calls += 1
+        return ""
+
+
+def _handle_cases(sim):
+    names = sim.names[1:]
+
+    def create():
+        cocotb.handle._handle2obj.clear()
+        top = HierarchyObject(0, None)
+        return [getattr(top, name) for name in names]
+
+    def create_and_log():
+        for hdl in create():
+            hdl._log.debug("Driving %s", hdl._path)
+
+    def create_and_describe():
+        for hdl in create():
+            hdl.get_definition_name()
+
+    return [("create", create), ("create and log", create_and_log),
+            ("create and describe", create_and_describe)]
+
+
+@cocotb.coroutine
+def _forked():
+    yield None
+
+
+def _fork(n_coroutines):
+    for _ in range(n_coroutines):
+        coro = _forked()
+        coro.log.debug("Forked %s", coro)
+        coro.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--signals", type=int, default=1000,
+                        help="number of signals in the design")
+    parser.add_argument("--coroutines", type=int, default=10000,
+                        help="number of coroutines created")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="number of timings to take the best of")
+    args = parser.parse_args()
+
+    logging.getLogger("cocotb").setLevel(logging.INFO)
+    sim = _Simulator(args.signals)
+    cocotb.handle.simulator = sim
+
+    print("%-20s %12s %14s" % ("case", "handles/s", "calls/handle"))
+    for name, case in _handle_cases(sim):
+        sim.calls = 0
+        case()
+        calls = float(sim.calls) / args.signals
+        best = min(timeit.repeat(case, repeat=args.repeat, number=1))
+        print("%-20s %12.0f %14.1f" % (name, args.signals / best, calls))
+
+    loggers = len(logging.Logger.manager.loggerDict)
+    best = min(timeit.repeat(lambda: _fork(args.coroutines), repeat=args.repeat,
+                             number=1))
+    print()
+    print("%-20s %12s %14s" % ("case", "coroutines/s", "loggers added"))
+    print("%-20s %12.0f %14d" % ("fork and log", args.coroutines / best,
+                                 len(logging.Logger.manager.loggerDict) - loggers))
+
+
+if __name__ == "__main__":
+    main()
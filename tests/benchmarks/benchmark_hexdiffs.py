@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+
+"""Measure the time taken by :func:`cocotb.utils.hexdiffs` on packet sized inputs.
+
+For each packet size, a random packet is compared against copies of it with
+a single byte changed, a byte dropped, a few bytes changed throughout, and
+against an unrelated packet of the same size (which exceeds the alignment
+budget and falls back to showing the first difference).
+
+Usage::
+
+    python tests/benchmarks/benchmark_hexdiffs.py [--sizes 64,1500,9000]
+"""
+
+from __future__ import print_function
+
+import argparse
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                os.pardir, os.pardir)))
+
+from cocotb.utils import hexdiffs  # noqa: E402
+
+
+def _packet(rng, size):
+    return "".join(chr(rng.randrange(256)) for _ in range(size))
+
+
+def _cases(rng, size):
+    packet = _packet(rng, size)
+
+    flipped = list(packet)
+    flipped[size * 3 // 4] = chr(ord(flipped[size * 3 // 4]) ^ 0xff)
+
+    dropped = packet[:size // 2] + packet[size // 2 + 1:]
+
+    scattered = list(packet)
+    for i in rng.sample(range(size), 8):
+        scattered[i] = chr(ord(scattered[i]) ^ 0x55)
+
+    return [
+        ("1 byte changed", packet, "".join(flipped)),
+        ("1 byte dropped", packet, dropped),
+        ("8 bytes changed", packet, "".join(scattered)),
+        ("unrelated", packet, _packet(rng, size)),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", default="64,256,1500,9000",
+                        help="comma-separated packet sizes in bytes")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="number of timings to take the best of")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    print("%8s  %-16s %10s" % ("size", "case", "time (ms)"))
+    for size in [int(s) for s in args.sizes.split(",")]:
+        for name, exp, got in _cases(rng, size):
+            best = min(timeit.repeat(lambda: hexdiffs(exp, got),
+                                     repeat=args.repeat, number=1))
+            print("%8d  %-16s %10.2f" % (size, name, best * 1e3))
+
+
+if __name__ == "__main__":
+    main()
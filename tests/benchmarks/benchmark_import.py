@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+
+"""Measure the time taken by ``import cocotb``.
+
+The real ``simulator`` module only exists inside a simulator process, so a
+stub with the handful of functions used at import time is written to a
+temporary directory and put first on ``PYTHONPATH``.  Each measurement runs in
+a fresh interpreter so that nothing is already in ``sys.modules``.
+
+On Python 3.7+ ``-X importtime`` is used to break the time down per module;
+older interpreters only report the total wall-clock time.
+
+Usage::
+
+    python tests/benchmarks/benchmark_import.py [--runs N] [--top N]
+"""
+
+from __future__ import print_function
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+_STUB_SIMULATOR = '''\
+"""Stub of the GPI ``simulator`` module, sufficient to import cocotb."""
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+CRITICAL = 50
+
+MODULE = 2
+STRUCTURE = 3
+REG = 4
+NET = 5
+NETARRAY = 6
+ENUM = 7
+STRING = 8
+GENARRAY = 9
+REAL = 10
+INTEGER = 11
+
+OBJECTS = 1
+DRIVERS = 2
+LOADS = 3
+
+
+def log_level(level):
+    pass
+
+
+def log_msg(*args):
+    pass
+
+
+def get_precision():
+    return -15
+
+
+def get_sim_time():
+    return 0, 0
+'''
+
+_REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                          os.pardir, os.pardir))
+
+
+def _environment(stub_dir):
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        [stub_dir, _REPO_ROOT] + [p for p in [env.get("PYTHONPATH")] if p])
+    env["COCOTB_SIM"] = "1"
+    env.pop("COVERAGE", None)
+    return env
+
+
+def _parse_importtime(stderr):
+    """Return a dict of module name to cumulative import time in microseconds."""
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        try:
+            cumulative = int(fields[1])
+        except (IndexError, ValueError):
+            continue  # the header line
+        times[fields[2].strip()] = cumulative
+    return times
+
+
+def _run_once(env, importtime):
+    cmd = [sys.executable]
+    if importtime:
+        cmd += ["-X", "importtime"]
+    cmd += ["-c", "import cocotb"]
+    start = time.time()
+    proc = subprocess.Popen(cmd, env=env, stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE, universal_newlines=True)
+    _, stderr = proc.communicate()
+    elapsed = time.time() - start
+    if proc.returncode != 0:
+        raise RuntimeError("import cocotb failed:\n%s" % stderr)
+    return elapsed, _parse_importtime(stderr) if importtime else {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=10,
+                        help="number of interpreters to start (default: 10)")
+    parser.add_argument("--top", type=int, default=15,
+                        help="number of modules to list (default: 15)")
+    args = parser.parse_args()
+
+    importtime = sys.version_info[:2] >= (3, 7)
+    stub_dir = tempfile.mkdtemp(prefix="cocotb_import_bench_")
+    try:
+        with open(os.path.join(stub_dir, "simulator.py"), "w") as f:
+            f.write(_STUB_SIMULATOR)
+        env = _environment(stub_dir)
+
+        # Warm up, so that bytecode caches are written before measuring
+        _run_once(env, False)
+
+        walls = []
+        modules = {}
+        for _ in range(args.runs):
+            wall, times = _run_once(env, importtime)
+            walls.append(wall)
+            for name, t in times.items():
+                modules.setdefault(name, []).append(t)
+    finally:
+        shutil.rmtree(stub_dir, ignore_errors=True)
+
+    walls.sort()
+    print("Interpreter start + import cocotb over %d runs: "
+          "min %.1f ms, median %.1f ms" %
+          (len(walls), walls[0] * 1e3, walls[len(walls) // 2] * 1e3))
+
+    if not importtime:
+        print("Per-module times need Python 3.7+ (-X importtime)")
+        return
+
+    medians = dict((name, sorted(t)[len(t) // 2]) for name, t in modules.items())
+    print("import cocotb (median cumulative): %.1f ms" %
+          (medians.get("cocotb", 0) / 1e3))
+    print()
+    print("%-40s %10s" % ("module", "cum. ms"))
+    ranked = sorted(medians.items(), key=lambda kv: kv[1], reverse=True)
+    for name, t in ranked[1:args.top + 1]:
+        print("%-40s %10.2f" % (name, t / 1e3))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,19 @@
+// A packetised Avalon-ST interface with nothing attached, both ends of which
+// are driven from Python, so that the driver can be tested against the
+// monitor.
+
+`timescale 1 ps / 1 ps
+
+module avalon_packets (
+    input wire clk
+);
+
+// 32 bit data, four 8 bit symbols
+reg        stream_valid;
+reg        stream_ready;
+reg [31:0] stream_data;
+reg        stream_startofpacket;
+reg        stream_endofpacket;
+reg  [1:0] stream_empty;
+
+endmodule
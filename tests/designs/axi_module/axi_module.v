@@ -0,0 +1,56 @@
+// An AXI4 and an AXI4-Stream interface with nothing attached, both ends of
+// which are driven from Python, so that the drivers can be tested against
+// each other and against the monitors.
+
+`timescale 1 ps / 1 ps
+
+module axi_module (
+    input wire clk
+);
+
+// AXI4, 32 bit data and 4 bit IDs
+reg        axi_ARVALID;
+reg        axi_ARREADY;
+reg [31:0] axi_ARADDR;
+reg  [7:0] axi_ARLEN;
+reg  [2:0] axi_ARSIZE;
+reg  [1:0] axi_ARBURST;
+reg  [2:0] axi_ARPROT;
+reg  [3:0] axi_ARID;
+
+reg        axi_RVALID;
+reg        axi_RREADY;
+reg [31:0] axi_RDATA;
+reg        axi_RLAST;
+reg  [1:0] axi_RRESP;
+reg  [3:0] axi_RID;
+
+reg        axi_AWVALID;
+reg        axi_AWREADY;
+reg [31:0] axi_AWADDR;
+reg  [7:0] axi_AWLEN;
+reg  [2:0] axi_AWSIZE;
+reg  [1:0] axi_AWBURST;
+reg  [2:0] axi_AWPROT;
+reg  [3:0] axi_AWID;
+
+reg        axi_WVALID;
+reg        axi_WREADY;
+reg [31:0] axi_WDATA;
+reg        axi_WLAST;
+reg  [3:0] axi_WSTRB;
+
+reg        axi_BVALID;
+reg        axi_BREADY;
+reg  [1:0] axi_BRESP;
+reg  [3:0] axi_BID;
+
+// AXI4-Stream, 64 bit data
+reg        axis_tvalid;
+reg        axis_tready;
+reg [63:0] axis_tdata;
+reg        axis_tlast;
+reg  [7:0] axis_tkeep;
+reg  [1:0] axis_tuser;
+
+endmodule
@@ -0,0 +1,267 @@
+"""
+Tests of the AMBA drivers and monitors, against each other or driving the
+pins of the other end directly.
+"""
+import binascii
+import collections
+import random
+
+import cocotb
+from cocotb.clock import Clock
+from cocotb.binary import BinaryValue
+from cocotb.drivers.amba import AXI4Master, AXI4Slave, AXIStreamMaster
+from cocotb.generators.bit import random_50_percent
+from cocotb.memory import PagedMemory
+from cocotb.monitors.amba import AXIStreamMonitor
+from cocotb.result import TestFailure
+from cocotb.triggers import ReadOnly, RisingEdge, Timer
+from cocotb.utils import get_sim_time
+
+AXI_BURST_FIXED, AXI_BURST_INCR, AXI_BURST_WRAP = range(3)
+
+Beat = collections.namedtuple("Beat", ["tdata", "tkeep", "tlast"])
+
+
+def _idle_master(dut):
+    """Drive the signals of the master end of the AXI4 interface idle."""
+    dut.axi_ARVALID <= 0
+    dut.axi_AWVALID <= 0
+    dut.axi_WVALID <= 0
+    dut.axi_RREADY <= 1
+    dut.axi_BREADY <= 1
+
+
+@cocotb.coroutine
+def _send_addresses(dut, prefix, bursts):
+    """Send ``(id, address, beats, size, burst)`` on the address channel *prefix*."""
+    for id, address, beats, size, burst in bursts:
+        getattr(dut, "axi_%sVALID" % prefix) <= 1
+        getattr(dut, "axi_%sID" % prefix) <= id
+        getattr(dut, "axi_%sADDR" % prefix) <= address
+        getattr(dut, "axi_%sLEN" % prefix) <= beats - 1
+        getattr(dut, "axi_%sSIZE" % prefix) <= size
+        getattr(dut, "axi_%sBURST" % prefix) <= burst
+        yield ReadOnly()
+        while not getattr(dut, "axi_%sREADY" % prefix).value.integer:
+            yield RisingEdge(dut.clk)
+            yield ReadOnly()
+        yield RisingEdge(dut.clk)
+    getattr(dut, "axi_%sVALID" % prefix) <= 0
+
+
+@cocotb.coroutine
+def _send_write_data(dut, beats):
+    """Send ``(data, strobes, last)`` beats on the write data channel."""
+    for data, strobes, last in beats:
+        dut.axi_WVALID <= 1
+        dut.axi_WDATA <= data
+        dut.axi_WSTRB <= strobes
+        dut.axi_WLAST <= last
+        yield ReadOnly()
+        while not dut.axi_WREADY.value.integer:
+            yield RisingEdge(dut.clk)
+            yield ReadOnly()
+        yield RisingEdge(dut.clk)
+    dut.axi_WVALID <= 0
+
+
+@cocotb.coroutine
+def _receive(dut, signals, n):
+    """Return the values of *signals* in each of the next *n* cycles they are valid."""
+    valid = getattr(dut, signals[0])
+    received = []
+    while len(received) < n:
+        yield RisingEdge(dut.clk)
+        yield ReadOnly()
+        if valid.value.integer:
+            received.append(tuple(getattr(dut, name).value.integer
+                                  for name in signals[1:]))
+    raise cocotb.result.ReturnValue(received)
+
+
+@cocotb.test()
+def test_axi4_slave_read_bursts(dut):
+    """AXI4Slave answers INCR, WRAP and FIXED read bursts, out of order across IDs"""
+    cocotb.fork(Clock(dut.clk, 10).start())
+    _idle_master(dut)
+    memory = bytearray(range(256)) * 32
+    AXI4Slave(dut, "axi", dut.clk, memory, read_latency=iter([20, 1, 5, 0]),
+              reorder=True, rvalid_generator=random_50_percent(3))
+    yield RisingEdge(dut.clk)
+
+    bursts = [(1, 0x10, 4, 2, AXI_BURST_INCR),
+              (2, 0x102, 3, 2, AXI_BURST_INCR),     # unaligned start
+              (3, 0x38, 4, 2, AXI_BURST_WRAP),      # wraps at 0x40 to 0x30
+              (4, 0x201, 5, 0, AXI_BURST_FIXED)]    # narrow, byte lane 1
+    expected = {1: [0x13121110, 0x17161514, 0x1b1a1918, 0x1f1e1d1c],
+                2: [0x03020000, 0x07060504, 0x0b0a0908],
+                3: [0x3b3a3938, 0x3f3e3d3c, 0x33323130, 0x37363534],
+                4: [0x00000100] * 5}
+
+    receiver = cocotb.fork(_receive(dut, ["axi_RVALID", "axi_RID", "axi_RDATA", "axi_RLAST"], 16))
+    yield _send_addresses(dut, "AR", bursts)
+    beats = yield receiver.join()
+
+    for id, data in sorted(expected.items()):
+        received = [beat for beat in beats if beat[0] == id]
+        if [beat[1] for beat in received] != data:
+            raise TestFailure("Burst %d read %s, expected %s" % (
+                id, [hex(beat[1]) for beat in received], [hex(word) for word in data]))
+        if [beat[2] for beat in received] != [0] * (len(data) - 1) + [1]:
+            raise TestFailure("RLAST of burst %d is not on its last beat" % id)
+    order = [beat[0] for beat in beats if beat[2]]
+    if order == [1, 2, 3, 4]:
+        raise TestFailure("Responses were not reordered")
+
+
+@cocotb.test()
+def test_axi4_slave_write_bursts(dut):
+    """AXI4Slave takes INCR, WRAP and FIXED write bursts, with data before the addresses"""
+    cocotb.fork(Clock(dut.clk, 10).start())
+    _idle_master(dut)
+    memory = PagedMemory(size=0x1000)
+    AXI4Slave(dut, "axi", dut.clk, memory, write_latency=3,
+              awready_generator=random_50_percent(2),
+              wready_generator=random_50_percent(2))
+    yield RisingEdge(dut.clk)
+
+    bursts = [(1, 0x38, 4, 2, AXI_BURST_WRAP),
+              (2, 0x103, 2, 2, AXI_BURST_INCR),
+              (3, 0x200, 3, 1, AXI_BURST_FIXED),
+              (4, 0xffe, 2, 0, AXI_BURST_INCR)]
+    beats = [(0x11111111, 0xf, 0), (0x22222222, 0xf, 0),
+             (0x33333333, 0xf, 0), (0x44444444, 0x5, 1),
+             (0xaabbccdd, 0x8, 0), (0x01020304, 0xf, 1),
+             (0x5555, 0x3, 0), (0x6666 << 16, 0xc, 0), (0x7777, 0x3, 1),
+             (0xee << 16, 0x4, 0), (0xff << 24, 0x8, 1)]
+
+    receiver = cocotb.fork(_receive(dut, ["axi_BVALID", "axi_BID", "axi_BRESP"], 4))
+    cocotb.fork(_send_write_data(dut, beats))
+    yield Timer(30)
+    yield _send_addresses(dut, "AW", bursts)
+    responses = yield receiver.join()
+
+    if responses != [(1, 0), (2, 0), (3, 0), (4, 0)]:
+        raise TestFailure("Write responses were %r" % responses)
+    for address, data in ((0x30, "33333333440044001111111122222222"),
+                          (0x100, "000000aa04030201"),
+                          (0x200, "77770000"),      # strobes outside the lanes of a beat are ignored
+                          (0xffc, "0000eeff")):
+        data = bytearray(binascii.unhexlify(data))
+        if memory.read(address, len(data)) != data:
+            raise TestFailure("Memory at 0x%x is %r, expected %r"
+                              % (address, memory.read(address, len(data)), data))
+
+
+@cocotb.test()
+def test_axi4_master_outstanding(dut):
+    """AXI4Master keeps several reads and writes in flight to an AXI4Slave"""
+    cocotb.fork(Clock(dut.clk, 10).start())
+    memory = PagedMemory(size=1 << 16)
+    AXI4Slave(dut, "axi", dut.clk, memory, read_latency=20, write_latency=20,
+              reorder=True, wready_generator=random_50_percent(3),
+              rvalid_generator=random_50_percent(3))
+    master = AXI4Master(dut, "axi", dut.clk, max_burst=16)
+    yield RisingEdge(dut.clk)
+
+    rng = random.Random(5)
+    expected = bytearray(1 << 16)
+    writes = []
+    for i in range(8):
+        # Unaligned transfers of several bursts, some crossing 4KB
+        address = i * 0x1000 + 0xf00 + rng.randrange(4)
+        data = bytearray(rng.getrandbits(8) for _ in range(rng.randrange(1, 600)))
+        expected[address:address + len(data)] = data
+        writes.append(cocotb.fork(master.write(address, data, id=i % 4)))
+    for write in writes:
+        yield write.join()
+    if memory.read(0, 1 << 16) != expected:
+        raise TestFailure("Memory differs after the writes")
+
+    # Reads and writes in flight together, to different halves of memory
+    start = get_sim_time()
+    reads = []
+    for i in range(8):
+        address = rng.randrange(1 << 15)
+        length = rng.randrange(1, 64)
+        reads.append((address, length,
+                      cocotb.fork(master.read(address, length, id=i % 3))))
+        data = bytearray(rng.getrandbits(8) for _ in range(16))
+        address = (1 << 15) + i * 0x100
+        expected[address:address + 16] = data
+        writes.append(cocotb.fork(master.write(address, data, id=i % 2)))
+    for address, length, read in reads:
+        data = yield read.join()
+        if data != expected[address:address + length]:
+            raise TestFailure("Read of %d bytes at 0x%x differs" % (length, address))
+    for write in writes:
+        yield write.join()
+    if memory.read(0, 1 << 16) != expected:
+        raise TestFailure("Memory differs after the reads and writes")
+
+    # One at a time, the reads alone would take 8 latencies
+    cycles = (get_sim_time() - start) // 10
+    if cycles >= 8 * 20:
+        raise TestFailure("Took %d cycles, transfers are not overlapped" % cycles)
+
+
+@cocotb.coroutine
+def _backpressure(dut, rng):
+    while True:
+        yield RisingEdge(dut.clk)
+        dut.axis_tready <= int(rng.random() < 0.7)
+
+
+@cocotb.test()
+def test_axi_stream_frames(dut):
+    """AXIStreamMonitor receives the frames sent by AXIStreamMaster, with tuser"""
+    cocotb.fork(Clock(dut.clk, 10).start())
+    dut.axis_tready <= 1
+    master = AXIStreamMaster(dut, "axis", dut.clk, valid_generator=random_50_percent(3))
+    monitor = AXIStreamMonitor(dut, "axis", dut.clk)
+    received = []
+    monitor.add_callback(lambda frame: received.append((frame, monitor.tuser)))
+    rng = random.Random(1)
+    cocotb.fork(_backpressure(dut, rng))
+
+    frames = [bytes(bytearray(rng.getrandbits(8) for _ in range(rng.randrange(1, 100))))
+              for _ in range(20)]
+    tusers = []
+    for i, frame in enumerate(frames):
+        beats = (len(frame) + 7) // 8
+        if i % 2:
+            tusers.append([rng.randrange(4) for _ in range(beats)])
+            yield master.send(frame, tuser=tusers[-1])
+        else:
+            tusers.append([i % 4] * beats)
+            yield master.send(frame, tuser=i % 4)
+    yield RisingEdge(dut.clk)
+    yield RisingEdge(dut.clk)
+
+    if [frame for frame, _ in received] != frames:
+        raise TestFailure("Received %d frames, %d differ" % (
+            len(received), sum(a != b for (a, _), b in zip(received, frames))))
+    if [tuser for _, tuser in received] != tusers:
+        raise TestFailure("tuser differs")
+
+
+@cocotb.test()
+def test_axi_stream_beats(dut):
+    """AXIStreamMonitor keeps only the bytes marked by tkeep, which may be X elsewhere"""
+    cocotb.fork(Clock(dut.clk, 10).start())
+    dut.axis_tready <= 1
+    master = AXIStreamMaster(dut, "axis", dut.clk)
+    monitor = AXIStreamMonitor(dut, "axis", dut.clk)
+
+    # The top byte of the first beat is undriven and not kept
+    undriven = BinaryValue("x" * 8 + "00000111" "00000110" "00000101" "00000100"
+                           "00000011" "00000010" "00000001", n_bits=64)
+    beats = [Beat(undriven, 0x7f, 0),
+             Beat(0x0f0e0d0c0b0a0908, 0xa5, 0),     # bytes 0, 2, 5 and 7
+             Beat(0x1716151413121110, 0x0c, 1)]     # bytes 2 and 3
+    master.append(beats)
+    frame = yield monitor.wait_for_recv()
+
+    expected = bytearray([1, 2, 3, 4, 5, 6, 7, 0x08, 0x0a, 0x0d, 0x0f, 0x12, 0x13])
+    if bytearray(frame) != expected:
+        raise TestFailure("Received %r, expected %r" % (bytearray(frame), expected))
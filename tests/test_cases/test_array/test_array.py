@@ -489,3 +489,49 @@ def test_extended_identifiers(dut):
     tlog.info("Checking extended identifiers.")
     _check_type(tlog, dut._id("\\ext_id\\", extended=False), ModifiableObject)
     _check_type(tlog, dut._id("!"), ModifiableObject)
+
+@cocotb.test()
+def test_get_by_path(dut):
+    """Test finding objects along a path in a single call"""
+
+    tlog = logging.getLogger("cocotb.test")
+
+    yield Timer(10)
+
+    sig = dut._get("desc_gen[2].sig")
+    _check_type(tlog, sig, ModifiableObject)
+    if sig is not dut.desc_gen[2].sig:
+        raise TestFailure("Expected {0!r} to be {1!r}".format(sig, dut.desc_gen[2].sig))
+
+    # Levels found on the way are cached, and the ones already found are used
+    rec = dut._get("sig_rec.b[1]")
+    if dut.sig_rec.b[1] is not rec or dut._get("sig_rec.a") is not dut.sig_rec.a:
+        raise TestFailure("Objects found by path differ from the ones found by attribute")
+
+    try:
+        dut._get("desc_gen[2].nonexistent")
+    except AttributeError:
+        pass
+    else:
+        raise TestFailure("Expected an AttributeError for a name not in the design")
+
+@cocotb.test(skip=(cocotb.LANGUAGE in ["vhdl"] and cocotb.SIM_NAME.lower().startswith(("riviera"))))
+def test_find(dut):
+    """Test searching the hierarchy for names matching a pattern"""
+
+    tlog = logging.getLogger("cocotb.test")
+
+    yield Timer(10)
+
+    found = dut.desc_gen._find("sig")
+    tlog.info("   Found %s", [hdl._path for hdl in found])
+    if sorted(found, key=id) != sorted([dut.desc_gen[i].sig for i in range(8)], key=id):
+        raise TestFailure("Expected the signal of each element of desc_gen, found {0!r}".format(found))
+
+    found = dut._find("sig", depth=1)
+    if found:
+        raise TestFailure("Expected no signal named sig at the top level, found {0!r}".format(found))
+
+    found = dut._find("port_*_in")
+    if set(hdl._name for hdl in found) != set(["port_asc_in", "port_desc_in", "port_ofst_in"]):
+        raise TestFailure("Expected the input ports, found {0!r}".format(found))
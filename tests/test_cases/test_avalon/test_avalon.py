@@ -36,6 +36,7 @@ Also used as regression test of cocotb capabilities
 
 import cocotb
 from cocotb.drivers.avalon import AvalonMemory
+from cocotb.memory import PagedMemory
 from cocotb.triggers import (Timer, Join, RisingEdge, FallingEdge, Edge,
                              ReadOnly, ReadWrite)
 from cocotb.clock import Clock
@@ -46,7 +47,7 @@ from cocotb.result import ReturnValue, TestFailure, TestError, TestSuccess
 class BurstAvlReadTest(object):
     """ class to test avalon burst """
 
-    def __init__(self, dut, avlproperties={}):
+    def __init__(self, dut, avlproperties={}, memory=None):
         self.dut = dut
         # Launch clock
         dut.reset = 1
@@ -54,9 +55,11 @@ class BurstAvlReadTest(object):
 
         # Bytes aligned memory
         self.memdict = {value: value for value in range(0x1000)}
+        if memory is None:
+            memory = self.memdict
 
         self.avl32 = AvalonMemory(dut, "master", dut.clk,
-                                  memory=self.memdict,
+                                  memory=memory,
                                   readlatency_min=0,
                                   avl_properties=avlproperties)
     @cocotb.coroutine
@@ -122,3 +125,41 @@ def test_burst_read(dut):
     yield Timer(10)
     dut.user_read_buffer = 0
     yield Timer(10)
+
+
+@cocotb.test()
+def test_burst_read_paged(dut):
+    """ Testing burst read from a PagedMemory """
+    wordburstcount = 16
+    address = 10*wordburstcount
+
+    memory = PagedMemory(page_size=0x100)
+    memory.write(0, bytearray(value & 0xFF for value in range(0x1000)))
+    bart = BurstAvlReadTest(dut, {"readLatency": 10}, memory=memory)
+    yield bart.init_sig(wordburstcount, address)
+    yield Timer(100)
+    # Begin master burst read
+    dut.control_go = 1
+    yield Timer(10)
+    dut.control_go = 0
+    yield Timer(200)
+
+    # read back values
+    dut.user_read_buffer = 1
+    yield RisingEdge(dut.clk)
+    databuswidthB = len(dut.master_byteenable)
+    burst = 0
+    while dut.user_data_available == 1:
+        yield RisingEdge(dut.clk)
+        value = dut.user_buffer_data.value.integer
+        expected = memory.read_word(address + burst*databuswidthB, databuswidthB)
+        if value != expected:
+            raise TestFailure("Wrong value read in memory at 0x%x: 0x%x must be 0x%x" %
+                              (address + burst*databuswidthB, value, expected))
+        burst += 1
+
+    if burst == 0:
+        raise TestFailure("No data was read")
+
+    dut.user_read_buffer = 0
+    yield Timer(10)
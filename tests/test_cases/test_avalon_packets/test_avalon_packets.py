@@ -0,0 +1,115 @@
+"""
+Tests of the packetised Avalon-ST monitor, receiving from the driver.
+"""
+import random
+
+import cocotb
+from cocotb.clock import Clock
+from cocotb.drivers import BitDriver
+from cocotb.drivers.avalon import AvalonSTPkts as AvalonSTPktsDriver
+from cocotb.generators.bit import random_50_percent
+from cocotb.monitors.avalon import AvalonProtocolError, AvalonSTPkts
+from cocotb.result import TestFailure
+from cocotb.triggers import RisingEdge
+
+
+def _random_packet(rng, length):
+    return bytes(bytearray(rng.getrandbits(8) for _ in range(length)))
+
+
+@cocotb.coroutine
+def _send_and_receive(driver, monitor, packet):
+    """Send *packet*, returning once *monitor* has received it."""
+    received = cocotb.fork(monitor.wait_for_recv())
+    yield driver.send(packet)
+    yield received.join()
+
+
+@cocotb.test()
+def test_packet_types(dut):
+    """Packets are received as str, bytes or memoryview, as configured"""
+    cocotb.fork(Clock(dut.clk, 10).start())
+    BitDriver(dut.stream_ready, dut.clk).start(random_50_percent(3))
+    driver = AvalonSTPktsDriver(dut, "stream", dut.clk)
+    received = {}
+    for packet_type in ("str", "bytes", "memoryview"):
+        received[packet_type] = []
+        AvalonSTPkts(dut, "stream", dut.clk, config={"packetType": packet_type},
+                     callback=received[packet_type].append)
+
+    rng = random.Random(1)
+    packets = [_random_packet(rng, length) for length in (1, 4, 5, 63, 200, 3)]
+    for packet in packets:
+        yield driver.send(packet)
+    yield RisingEdge(dut.clk)
+
+    expected_str = packets if str is bytes else [p.decode("latin-1") for p in packets]
+    if received["str"] != expected_str or not all(isinstance(p, str) for p in received["str"]):
+        raise TestFailure("Received %r as str" % received["str"])
+    if received["bytes"] != packets or not all(isinstance(p, bytes) for p in received["bytes"]):
+        raise TestFailure("Received %r as bytes" % received["bytes"])
+    if (not all(isinstance(p, memoryview) for p in received["memoryview"]) or
+            [p.tobytes() for p in received["memoryview"]] != packets):
+        raise TestFailure("Received %r as memoryviews" % received["memoryview"])
+
+    try:
+        AvalonSTPkts(dut, "stream", dut.clk, config={"packetType": "list"})
+    except ValueError:
+        pass
+    else:
+        raise TestFailure("An unknown packetType was accepted")
+
+
+@cocotb.test()
+def test_max_in_flight_bytes_queued(dut):
+    """Queued packets may take up to maxInFlightBytes, counting those taken from the queue"""
+    cocotb.fork(Clock(dut.clk, 10).start())
+    dut.stream_ready <= 1
+    driver = AvalonSTPktsDriver(dut, "stream", dut.clk)
+    monitor = AvalonSTPkts(dut, "stream", dut.clk, config={"maxInFlightBytes": 100,
+                                                           "packetType": "bytes"})
+    rng = random.Random(2)
+
+    # Never more than 80 bytes are queued, though 240 bytes are received
+    for _ in range(6):
+        yield _send_and_receive(driver, monitor, _random_packet(rng, 40))
+        if len(monitor) == 2:
+            monitor._recvQ.popleft()
+            monitor._recvQ.popleft()
+
+    for _ in range(3):
+        driver.append(_random_packet(rng, 40))
+    try:
+        yield monitor._thread.join()
+    except TestFailure:
+        pass
+    else:
+        raise TestFailure("120 bytes of packets were queued")
+    if len(monitor) != 2:
+        raise TestFailure("Expected 2 packets to be queued, got %d" % len(monitor))
+
+
+@cocotb.test()
+def test_max_in_flight_bytes_packet(dut):
+    """A packet longer than maxInFlightBytes is a protocol error"""
+    cocotb.fork(Clock(dut.clk, 10).start())
+    dut.stream_ready <= 1
+    driver = AvalonSTPktsDriver(dut, "stream", dut.clk)
+    received = []
+    monitor = AvalonSTPkts(dut, "stream", dut.clk, config={"maxInFlightBytes": 100},
+                           callback=received.append)
+    rng = random.Random(3)
+
+    # With a callback, nothing is queued however many packets are received
+    for _ in range(5):
+        yield _send_and_receive(driver, monitor, _random_packet(rng, 100))
+
+    driver.append(_random_packet(rng, 104))
+    try:
+        yield monitor._thread.join()
+    except AvalonProtocolError:
+        pass
+    else:
+        raise TestFailure("A packet of 104 bytes was received")
+    if len(received) != 5:
+        raise TestFailure("Expected 5 packets to be received, got %d" % len(received))
@@ -0,0 +1,155 @@
+"""
+Tests of cocotb.bus
+"""
+import collections
+import ctypes
+
+import cocotb
+from cocotb.binary import BinaryValue
+from cocotb.bus import Bus
+from cocotb.result import TestFailure
+from cocotb.triggers import Timer
+
+Stream = collections.namedtuple("Stream", ["valid", "data"])
+Beat = collections.namedtuple("Beat", ["enable", "payload", "user"])
+
+
+class SlotsStream(object):
+    __slots__ = ("valid", "data", "user")
+
+    def __init__(self, valid, data, user=None):
+        self.valid = valid
+        self.data = data
+        self.user = user
+
+
+class CStream(ctypes.Structure):
+    _fields_ = [("valid", ctypes.c_uint8), ("data", ctypes.c_uint8),
+                ("user", ctypes.c_uint32)]
+
+
+@cocotb.test()
+def test_bus_and_direct_writes(dut):
+    """The last of the bus and direct writes to a signal in a timestep is driven"""
+    bus = Bus(dut, "stream_in", ["valid", "data"])
+
+    def drive_then_assign():
+        bus.drive(Stream(1, 9))
+        dut.stream_in_data <= 4
+
+    def assign_then_drive():
+        dut.stream_in_data <= 4
+        bus.drive(Stream(1, 9))
+
+    def drive_assign_drive():
+        bus.drive(Stream(0, 9))
+        dut.stream_in_data <= 4
+        bus.drive(Stream(1, 7))
+
+    def drive_then_assign_other():
+        bus.drive(Stream(0, 9))
+        dut.stream_in_valid <= 1
+
+    for writes, expected in ((drive_then_assign, (1, 4)),
+                             (assign_then_drive, (1, 9)),
+                             (drive_assign_drive, (1, 7)),
+                             (drive_then_assign_other, (1, 9))):
+        dut.stream_in_valid <= 0
+        dut.stream_in_data <= 0
+        yield Timer(10)
+        writes()
+        yield Timer(10)
+        got = (int(dut.stream_in_valid), int(dut.stream_in_data))
+        if got != expected:
+            raise TestFailure("%s drove %s, expected %s" % (writes.__name__, got, expected))
+
+
+@cocotb.test()
+def test_bus_drive_too_wide(dut):
+    """Driving an int too wide for a signal raises instead of truncating it"""
+    bus = Bus(dut, "stream_in", ["valid", "data"])
+    dut.stream_in_data <= 3
+    yield Timer(10)
+    for value in (0x100, -0x100):
+        try:
+            bus.drive(Stream(1, value))
+        except TypeError:
+            pass
+        else:
+            raise TestFailure("Driving %d to an 8 bit signal didn't raise" % value)
+    bus.drive(Stream(1, 0xff))
+    yield Timer(10)
+    if int(dut.stream_in_data) != 0xff:
+        raise TestFailure("Drove %s, expected 0xff" % dut.stream_in_data.value)
+
+
+@cocotb.test()
+def test_bus_codec(dut):
+    """BusCodec drives and captures namedtuples, __slots__ classes and ctypes Structures"""
+    bus = Bus(dut, "stream_in", ["valid", "data"])
+    # user has no signal, so is never driven and is captured as None, or 0
+    stream = bus.codec(Stream)
+    slots = bus.codec(SlotsStream)
+    structure = bus.codec(CStream)
+    beat = bus.codec(Beat, {"enable": "valid", "payload": "data"})
+
+    stream.drive(Stream(1, 0x5a))
+    yield Timer(10)
+    if stream.capture() != Stream(1, 0x5a):
+        raise TestFailure("Captured %r as a namedtuple" % (stream.capture(),))
+    if beat.capture() != Beat(1, 0x5a, None):
+        raise TestFailure("Captured %r with fields mapped to signals" % (beat.capture(),))
+    captured = slots.capture()
+    if (captured.valid, captured.data, captured.user) != (1, 0x5a, None):
+        raise TestFailure("Captured %r with __slots__" % (
+            (captured.valid, captured.data, captured.user),))
+    captured = structure.capture()
+    if (captured.valid, captured.data, captured.user) != (1, 0x5a, 0):
+        raise TestFailure("Captured %r into a ctypes.Structure" % (
+            (captured.valid, captured.data, captured.user),))
+
+    slots.drive(SlotsStream(0, 0x33, user=7))
+    yield Timer(10)
+    if stream.capture() != Stream(0, 0x33):
+        raise TestFailure("Drove %r from __slots__" % (stream.capture(),))
+    structure.drive(CStream(1, 0x44, 9))
+    yield Timer(10)
+    if stream.capture() != Stream(1, 0x44):
+        raise TestFailure("Drove %r from a ctypes.Structure" % (stream.capture(),))
+    beat.drive(Beat(0, 0x55, 3))
+    yield Timer(10)
+    if stream.capture() != Stream(0, 0x55):
+        raise TestFailure("Drove %r with fields mapped to signals" % (stream.capture(),))
+
+    # Fields which are None are left as they are
+    stream.drive(Stream(1, None))
+    yield Timer(10)
+    if stream.capture() != Stream(1, 0x55):
+        raise TestFailure("Drove %r, data should be left undriven" % (stream.capture(),))
+
+    for args in ((Stream, {"valid": "ready"}), (Stream, {"user": "data"})):
+        try:
+            bus.codec(*args)
+        except AttributeError:
+            pass
+        else:
+            raise TestFailure("Compiled a codec with signals %r" % (args[1],))
+
+
+@cocotb.test()
+def test_bus_codec_x(dut):
+    """BusCodec captures X as a binary string, but not into a ctypes Structure"""
+    bus = Bus(dut, "stream_in", ["valid", "data"])
+    dut.stream_in_valid <= 1
+    dut.stream_in_data <= BinaryValue("xxxx0101")
+    yield Timer(10)
+
+    captured = bus.codec(Stream).capture()
+    if captured.valid != 1 or captured.data.lower() != "xxxx0101":
+        raise TestFailure("Captured %r" % (captured,))
+    try:
+        bus.codec(CStream).capture()
+    except ValueError:
+        pass
+    else:
+        raise TestFailure("Captured X into a ctypes.Structure")
@@ -29,6 +29,7 @@ SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE. '''
 import logging
 import sys
 import textwrap
+import time
 import warnings
 
 """
@@ -42,7 +43,7 @@ from cocotb.triggers import (Timer, Join, RisingEdge, FallingEdge, Edge,
                              ReadOnly, ReadWrite, ClockCycles, NextTimeStep,
                              NullTrigger, Combine, Event, First, Trigger)
 from cocotb.clock import Clock
-from cocotb.result import ReturnValue, TestFailure, TestError, TestSuccess
+from cocotb.result import ReturnValue, TestFailure, TestError, TestSuccess, SimTimeoutError
 from cocotb.utils import get_sim_time
 
 from cocotb.binary import BinaryValue
@@ -632,6 +633,81 @@ def test_logging_with_args(dut):
 
     yield Timer(100)  # Make it do something with time
 
+@cocotb.test()
+def test_logging_shared_loggers(dut):
+    """Test that logging from forked coroutines doesn't add a logger for each"""
+
+    @cocotb.coroutine
+    def waits():
+        yield Timer(1)
+
+    loggers = None
+    for _ in range(20):
+        forked = cocotb.fork(waits())
+        forked.log.info("Logging from a forked coroutine")
+        yield forked.join()
+        # The first coroutine adds the logger they share
+        if loggers is None:
+            loggers = len(logging.Logger.manager.loggerDict)
+    added = len(logging.Logger.manager.loggerDict) - loggers
+    if added:
+        raise TestFailure("Expected no loggers to be added, %d were" % added)
+
+    # Handles of the same name share a logger, and tell the record their path
+    records = []
+
+    class Collect(logging.Handler):
+        def emit(self, record):
+            records.append(record)
+
+    handler = Collect()
+    dut.clk._log.addHandler(handler)
+    try:
+        dut.clk._log.info("Logging from a handle")
+    finally:
+        dut.clk._log.removeHandler(handler)
+    if [record.sim_path for record in records] != [dut.clk._path]:
+        raise TestFailure("Expected a record with the path of the handle")
+
+@cocotb.test()
+def test_logging_shared_logger_levels(dut):
+    """Test that the level of an object's logger only applies to that object"""
+
+    @cocotb.coroutine
+    def waits():
+        yield Timer(1)
+
+    first = cocotb.fork(waits())
+    second = cocotb.fork(waits())
+    records = []
+
+    class Collect(logging.Handler):
+        def emit(self, record):
+            records.append(record)
+
+    handler = Collect()
+    shared = first.log.logger
+    level = shared.level
+    shared.setLevel(logging.INFO)
+    shared.addHandler(handler)
+    try:
+        first.log.setLevel(logging.DEBUG)
+        first.log.debug("Logged")
+        second.log.debug("Not logged")
+        second.log.setLevel(logging.ERROR)
+        second.log.warning("Not logged")
+        if shared.level != logging.INFO:
+            raise TestFailure("Setting the level of an object changed the shared logger")
+    finally:
+        shared.removeHandler(handler)
+        shared.setLevel(level)
+    yield first.join()
+    yield second.join()
+    if [record.getMessage() for record in records] != ["Logged"]:
+        raise TestFailure("Unexpected records %r" % [r.getMessage() for r in records])
+    if records[0].funcName != "test_logging_shared_logger_levels":
+        raise TestFailure("Record logged from %s" % records[0].funcName)
+
 @cocotb.test()
 def test_clock_cycles(dut):
     """
@@ -1099,5 +1175,56 @@ def test_trigger_with_failing_prime(dut):
         raise TestFailure
 
 
+@cocotb.test(expect_error=SimTimeoutError, timeout=1, timeout_unit="us")
+def test_sim_time_watchdog(dut):
+    """Test that a test exceeding its simulation time budget is aborted"""
+    yield Timer(2, "us")
+    raise TestFailure("Watchdog did not abort the test")
+
+
+@cocotb.test(expect_error=SimTimeoutError, wall_timeout=1)
+def test_wall_clock_watchdog(dut):
+    """Test that a test blocked on an external thread is aborted"""
+    @cocotb.external
+    def stuck():
+        time.sleep(2)
+        return "stuck"
+
+    yield Timer(1)
+    yield stuck()
+    raise TestFailure("Watchdog did not abort the test")
+
+
+@cocotb.test()
+def test_wall_clock_watchdog_abandoned_thread(dut):
+    """Test that the thread abandoned by the previous test finishing is ignored"""
+    @cocotb.external
+    def slower():
+        time.sleep(2)
+        return "slower"
+
+    yield Timer(1)
+    result = yield slower()
+    if result != "slower":
+        raise TestFailure("External returned %r" % (result,))
+
+
+@cocotb.test()
+def test_hexdiffs_alignment(dut):
+    """Test that hexdiffs breaks ties between alignments as scapy does"""
+    yield Timer(1)
+    # Among equal cost alignments, characters are matched as early as possible
+    for x, y, expected in [
+            ("a", "baa", ("-a-", "baa")),
+            ("b", "abab", ("-b--", "abab")),
+            ("a" * 40, "b" + "a" * 41, ("-" + "a" * 40 + "-", "b" + "a" * 41)),
+            ("aXbbbb", "abbbb", ("aXbbbb", "a-bbbb"))]:
+        aligned = cocotb.utils._align(x, y, 1 << 20)
+        got = tuple("".join(c or "-" for c in line) for line in aligned)
+        if got != expected:
+            raise TestFailure("Aligned %r with %r as %r, not %r" %
+                              (x, y, got, expected))
+
+
 if sys.version_info[:2] >= (3, 5):
     from test_cocotb_35 import *
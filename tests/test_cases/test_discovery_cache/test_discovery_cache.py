@@ -0,0 +1,173 @@
+"""
+Tests of the test discovery cache and of the lazy construction of tests.
+"""
+import os
+import shutil
+import sys
+import tempfile
+import textwrap
+
+import cocotb
+from cocotb.decorators import RunningTest
+from cocotb.regression import RegressionManager, _DiscoveryCache, _my_import
+from cocotb.result import TestFailure
+from cocotb.triggers import Timer
+
+_MODULE_NAME = "discovery_cache_tests"
+_IMPORTING_NAME = "discovery_cache_importing"
+
+_MODULE_SOURCE = textwrap.dedent('''\
+    import cocotb
+
+    @cocotb.test()
+    def test_a(dut):
+        yield None
+    ''')
+
+_CHANGED_SOURCE = _MODULE_SOURCE + textwrap.dedent('''\
+
+    @cocotb.test(expect_fail=True)
+    def test_b(dut):
+        yield None
+    ''')
+
+
+def _write_module(directory, source, mtime, name=_MODULE_NAME):
+    filename = os.path.join(directory, name + ".py")
+    with open(filename, "w") as f:
+        f.write(source)
+    os.utime(filename, (mtime, mtime))
+
+
+def _import_fresh(name=_MODULE_NAME):
+    sys.modules.pop(name, None)
+    return _my_import(name)
+
+
+def _with_test_module(func):
+    """Run *func* with a test module in a temporary directory on the path."""
+    def wrapper(dut):
+        directory = tempfile.mkdtemp()
+        sys.path.insert(0, directory)
+        try:
+            _write_module(directory, _MODULE_SOURCE, 1000000000)
+            func(directory, os.path.join(directory, "cache.json"))
+        finally:
+            sys.path.remove(directory)
+            sys.modules.pop(_MODULE_NAME, None)
+            sys.modules.pop(_IMPORTING_NAME, None)
+            shutil.rmtree(directory)
+        yield Timer(1)
+    wrapper.__name__ = func.__name__
+    wrapper.__doc__ = func.__doc__
+    return cocotb.test()(wrapper)
+
+
+@_with_test_module
+def test_discovery_cache_reload(directory, cache_filename):
+    """The tests of a module are read back from a saved cache"""
+    cache = _DiscoveryCache(cache_filename)
+    if cache.tests(_MODULE_NAME) is not None:
+        raise TestFailure("An empty cache knows the tests of %s" % _MODULE_NAME)
+    cache.update(_MODULE_NAME, _import_fresh())
+    cache.save()
+
+    tests = _DiscoveryCache(cache_filename).tests(_MODULE_NAME)
+    if tests is None or sorted(tests) != ["test_a"]:
+        raise TestFailure("Unexpected cached tests %r" % tests)
+    if tests["test_a"]["expect_fail"] or tests["test_a"]["skip"]:
+        raise TestFailure("Unexpected cached flags %r" % tests["test_a"])
+
+
+@_with_test_module
+def test_discovery_cache_invalidated(directory, cache_filename):
+    """A module changed since it was cached is imported again"""
+    cache = _DiscoveryCache(cache_filename)
+    cache.update(_MODULE_NAME, _import_fresh())
+    cache.save()
+
+    manager = RegressionManager("sample_module", [_MODULE_NAME])
+    manager._discovery_cache = _DiscoveryCache(cache_filename)
+    if manager._may_contain_test(_MODULE_NAME, "test_b"):
+        raise TestFailure("Module was imported to look for a test it does not define")
+    if not manager._may_contain_test(_MODULE_NAME, "test_a"):
+        raise TestFailure("Module was not imported to look for a test it defines")
+
+    _write_module(directory, _CHANGED_SOURCE, 1000000010)
+    if manager._discovery_cache.tests(_MODULE_NAME) is not None:
+        raise TestFailure("Cache entry of a changed module was used")
+    if not manager._may_contain_test(_MODULE_NAME, "test_b"):
+        raise TestFailure("Changed module was not imported to look for a new test")
+
+    sys.modules.pop(_MODULE_NAME, None)
+    manager._import_module(_MODULE_NAME)
+    manager._discovery_cache.save()
+    tests = _DiscoveryCache(cache_filename).tests(_MODULE_NAME)
+    if tests is None or sorted(tests) != ["test_a", "test_b"]:
+        raise TestFailure("Cache was not updated, it has %r" % tests)
+    if not tests["test_b"]["expect_fail"]:
+        raise TestFailure("Unexpected cached flags %r" % tests["test_b"])
+
+
+@_with_test_module
+def test_discovery_cache_stale(directory, cache_filename):
+    """A test missing from a stale entry is still found"""
+    _write_module(directory, "from %s import *\n" % _MODULE_NAME, 1000000000,
+                  name=_IMPORTING_NAME)
+    cache = _DiscoveryCache(cache_filename)
+    cache.update(_IMPORTING_NAME, _import_fresh(_IMPORTING_NAME))
+    cache.save()
+
+    # The imported module changes, the entry of the importing one does not
+    _write_module(directory, _CHANGED_SOURCE, 1000000010)
+    sys.modules.pop(_MODULE_NAME, None)
+    sys.modules.pop(_IMPORTING_NAME, None)
+    manager = RegressionManager("sample_module", [_IMPORTING_NAME])
+    manager._discovery_cache = _DiscoveryCache(cache_filename)
+    if manager._may_contain_test(_IMPORTING_NAME, "test_b"):
+        raise TestFailure("Cache entry of %s is not stale" % _IMPORTING_NAME)
+    test, module_name = manager._find_test("test_b")
+    if test is None or module_name != _IMPORTING_NAME:
+        raise TestFailure("Test was not found in %s" % _IMPORTING_NAME)
+
+    # A module not known to lack the test is searched first
+    sys.modules.pop(_MODULE_NAME, None)
+    sys.modules.pop(_IMPORTING_NAME, None)
+    manager = RegressionManager("sample_module", [_IMPORTING_NAME, _MODULE_NAME])
+    manager._discovery_cache = _DiscoveryCache(cache_filename)
+    test, module_name = manager._find_test("test_b")
+    if module_name != _MODULE_NAME or _IMPORTING_NAME in manager._imported:
+        raise TestFailure("Module known not to define the test was searched first")
+
+
+@_with_test_module
+def test_discovery_cache_unreadable(directory, cache_filename):
+    """A corrupt or outdated cache file is ignored"""
+    for content in ["{", '{"version": 0, "modules": {}}', "[]"]:
+        with open(cache_filename, "w") as f:
+            f.write(content)
+        cache = _DiscoveryCache(cache_filename)
+        if cache.tests(_MODULE_NAME) is not None:
+            raise TestFailure("Cache %r knows the tests of %s" %
+                              (content, _MODULE_NAME))
+        cache.update(_MODULE_NAME, _import_fresh())
+        cache.save()
+        if _DiscoveryCache(cache_filename).tests(_MODULE_NAME) is None:
+            raise TestFailure("Cache %r was not rewritten" % content)
+
+
+@cocotb.test()
+def test_discovery_cache_lazy_running_tests(dut):
+    """Only the running test is a RunningTest with a log handler"""
+    yield Timer(1)
+    manager = cocotb.regression_manager
+    if not manager._queue:
+        raise TestFailure("No tests are queued after this one")
+    for test in manager._queue:
+        if not isinstance(test, cocotb.test):
+            raise TestFailure("Queued test %r was built before running" % test)
+    handlers = [handler for handler in cocotb.log.handlers
+                if isinstance(handler, RunningTest.ErrorLogHandler)]
+    if handlers != [manager._running_test.handler]:
+        raise TestFailure("Finished tests left %d log handlers" %
+                          (len(handlers) - 1))
@@ -0,0 +1,161 @@
+"""
+Tests of the memory models in cocotb.memory.
+"""
+import os
+import struct
+import tempfile
+import zlib
+
+import cocotb
+from cocotb.memory import PagedMemory
+from cocotb.result import TestFailure
+from cocotb.triggers import Timer
+
+
+@cocotb.test()
+def test_paged_memory_access(dut):
+    """Words and byte strings can be accessed across pages"""
+    yield Timer(1)
+    memory = PagedMemory(page_size=16)
+
+    memory.write(12, bytearray(range(8)))
+    if memory.read(12, 8) != bytearray(range(8)):
+        raise TestFailure("Read back %r" % memory.read(12, 8))
+    if memory.read_word(14, 4) != 0x05040302:
+        raise TestFailure("Read word 0x%x" % memory.read_word(14, 4))
+
+    memory.write_word(14, 0xaabbccdd, 4, byteenable=0b0101)
+    if memory.read(14, 4) != bytearray([0xdd, 0x03, 0xbb, 0x05]):
+        raise TestFailure("Byte enables not honoured: %r" % memory.read(14, 4))
+
+    if not memory.is_initialised(0, 32) or memory.is_initialised(0, 33):
+        raise TestFailure("Only pages 0 and 1 should be initialised")
+
+    if memory[12:20] != memory.read(12, 8):
+        raise TestFailure("Sliced %r" % memory[12:20])
+    try:
+        memory[12:]
+    except ValueError:
+        pass
+    else:
+        raise TestFailure("Open-ended slice of an unbounded memory was read")
+
+
+@cocotb.test()
+def test_paged_memory_files(dut):
+    """Binary and Intel HEX images can be loaded and dumped"""
+    yield Timer(1)
+    directory = tempfile.mkdtemp()
+    image = bytearray(os.urandom(0x3000))
+
+    memory = PagedMemory()
+    memory.write(0xfff800, image)
+    memory.dump(os.path.join(directory, "image.bin"), 0xfff800, len(image))
+    memory.dump_ihex(os.path.join(directory, "image.hex"), 0xfff800, len(image))
+
+    from_bin = PagedMemory()
+    from_bin.load(os.path.join(directory, "image.bin"), 0x100)
+    if from_bin.read(0x100, len(image)) != image:
+        raise TestFailure("Binary image differs after loading")
+
+    from_hex = PagedMemory()
+    from_hex.load_ihex(os.path.join(directory, "image.hex"))
+    if from_hex.read(0xfff800, len(image)) != image:
+        raise TestFailure("Intel HEX image differs after loading")
+
+
+@cocotb.test()
+def test_paged_memory_mmap(dut):
+    """A memory-mapped file holds the memory contents"""
+    yield Timer(1)
+    filename = os.path.join(tempfile.mkdtemp(), "memory.img")
+
+    memory = PagedMemory(size=0x10000, filename=filename)
+    memory.write_word(0x100, 0x12345678, 4)
+    memory.close()
+
+    with open(filename, "rb") as f:
+        f.seek(0x100)
+        if bytearray(f.read(4)) != bytearray([0x78, 0x56, 0x34, 0x12]):
+            raise TestFailure("Write did not reach the file")
+
+
+@cocotb.test()
+def test_paged_memory_memh(dut):
+    """$readmemh images can be loaded and dumped with a checksum"""
+    yield Timer(1)
+    directory = tempfile.mkdtemp()
+    filename = os.path.join(directory, "image.hex")
+    with open(filename, "w") as f:
+        f.write("// image\n@4 dead_beef /* words */ 1234\n@10 xxxxxxxx\n")
+
+    memory = PagedMemory()
+    if memory.load_memh(filename, 4, 0x100) != 12:
+        raise TestFailure("Expected 12 bytes to be loaded")
+    if (memory.read_word(0x110, 4), memory.read_word(0x114, 4)) != (0xdeadbeef, 0x1234):
+        raise TestFailure("Read back %r" % memory.read(0x110, 8))
+
+    crc = memory.dump_memh(os.path.join(directory, "dump.hex"), 0x100, 0x48, 4)
+    if crc != zlib.crc32(bytes(memory.read(0x100, 0x48))) & 0xffffffff:
+        raise TestFailure("Bad checksum 0x%08x" % crc)
+    if crc != memory.checksum(0x100, 0x48):
+        raise TestFailure("Checksum of the dump differs")
+
+    from_memh = PagedMemory()
+    from_memh.load_memh(os.path.join(directory, "dump.hex"), 4, 0x100)
+    if from_memh.read(0x100, 0x48) != memory.read(0x100, 0x48):
+        raise TestFailure("Hex image differs after loading")
+
+
+@cocotb.test()
+def test_paged_memory_sparse_dump(dut):
+    """Only the pages written of a sparse memory are dumped, however small"""
+    yield Timer(1)
+    directory = tempfile.mkdtemp()
+    data = bytearray(os.urandom(16))
+    memory = PagedMemory(page_size=0x100)
+    memory.write(0x1230, data)
+    memory.write(0x8ff8, data)
+    # The CRC is of the pages dumped, not of the whole range
+    pages = memory.read(0x1200, 0x100) + memory.read(0x8f00, 0x200)
+
+    crc = memory.dump_memh(os.path.join(directory, "dump.hex"), 0, 0x10000, 4)
+    if crc != zlib.crc32(bytes(pages)) & 0xffffffff:
+        raise TestFailure("Bad checksum 0x%08x of the hex image" % crc)
+    if crc == memory.checksum(0, 0x10000):
+        raise TestFailure("Checksum of the hex image covers pages not dumped")
+    from_memh = PagedMemory(page_size=0x100)
+    if from_memh.load_memh(os.path.join(directory, "dump.hex"), 4) != 0x300:
+        raise TestFailure("Expected the three pages written to be dumped")
+    if from_memh.read(0x1230, 16) != data or from_memh.read(0x8ff8, 16) != data:
+        raise TestFailure("Hex image differs after loading")
+
+    crc = memory.dump_ihex(os.path.join(directory, "dump.ihex"), 0, 0x10000)
+    if crc != zlib.crc32(bytes(pages)) & 0xffffffff:
+        raise TestFailure("Bad checksum 0x%08x of the Intel HEX image" % crc)
+    from_ihex = PagedMemory(page_size=0x100)
+    from_ihex.load_ihex(os.path.join(directory, "dump.ihex"))
+    if from_ihex.read(0x1230, 16) != data or from_ihex.read(0x8ff8, 16) != data:
+        raise TestFailure("Intel HEX image differs after loading")
+
+
+@cocotb.test()
+def test_paged_memory_elf(dut):
+    """The loadable segments of an ELF file are loaded"""
+    yield Timer(1)
+    filename = os.path.join(tempfile.mkdtemp(), "firmware.elf")
+    text = bytearray(os.urandom(100))
+    with open(filename, "wb") as f:
+        f.write(struct.pack("<16sHHIIIIIHHHHHH", b"\x7fELF\x01\x01\x01", 2, 0xf3, 1,
+                            0x80000000, 52, 0, 0, 52, 32, 2, 0, 0, 0))
+        f.write(struct.pack("<8I", 1, 116, 0x80000000, 0x80000000, 100, 100, 5, 4))
+        f.write(struct.pack("<8I", 1, 216, 0x80001000, 0x80001000, 4, 8, 6, 4))
+        f.write(text + bytearray(b"\x01\x02\x03\x04"))
+
+    memory = PagedMemory(fill=0xff)
+    if memory.load_elf(filename) != 108:
+        raise TestFailure("Expected 108 bytes to be loaded")
+    if memory.read(0x80000000, 100) != text:
+        raise TestFailure("Text segment differs after loading")
+    if memory.read(0x80001000, 9) != bytearray([1, 2, 3, 4, 0, 0, 0, 0, 0xff]):
+        raise TestFailure("Data segment is %r" % memory.read(0x80001000, 9))
@@ -0,0 +1,118 @@
+"""
+Tests of the per-test heap growth report of MemoryTracker.
+"""
+import logging
+import os
+import sys
+
+import cocotb
+from cocotb.memdebug import MemoryTracker, _parse_size
+from cocotb.result import TestFailure
+from cocotb.triggers import Event, Timer
+
+_no_tracemalloc = sys.version_info < (3, 4)
+
+_kept = []
+
+
+class _Records(logging.Handler):
+    """Keep the messages logged to a logger."""
+
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+def _allocate(size):
+    _kept.append(bytearray(size))
+
+
+@cocotb.coroutine
+def _waiter(event):
+    yield event.wait()
+
+
+@cocotb.test(skip=_no_tracemalloc)
+def test_memtrace_report(dut):
+    """Heap growth, allocation sites and surviving coroutines are reported"""
+    import tracemalloc
+    tracing = tracemalloc.is_tracing()
+    tracker = MemoryTracker(top=3, limit=100000)
+    records = _Records()
+    tracker.log.addHandler(records)
+    test = cocotb.regression_manager._running_test
+    event = Event()
+    try:
+        tracker.start()
+        tracker.test_started(test)
+        _allocate(200000)
+        waiter = cocotb.fork(_waiter(event))
+        yield Timer(1)
+        growth = tracker.test_finished(test)
+    finally:
+        tracker.log.removeHandler(records)
+        if not tracing:
+            tracker.stop()
+        event.set()
+        del _kept[:]
+    yield waiter.join()
+
+    # Other objects may be freed during the test
+    if growth is None or growth < 150000:
+        raise TestFailure("Heap growth %r is much less than was allocated" % growth)
+    if not tracker.leaked(growth):
+        raise TestFailure("Heap growth of %d bytes is not a leak" % growth)
+    if tracker.test_finished(test) is not None:
+        raise TestFailure("Heap growth was reported twice")
+
+    if len(records.messages) != 1:
+        raise TestFailure("Expected one report, got %r" % records.messages)
+    lines = records.messages[0].split("\n")
+    if not (lines[0].startswith("Heap grew by ") and test.funcname in lines[0] and
+            "(1 coroutines" in lines[0]):
+        raise TestFailure("Unexpected report header %r" % lines[0])
+    if not 1 <= len(lines) - 1 <= 3:
+        raise TestFailure("Expected up to 3 allocation sites, got %r" % lines[1:])
+    this_file = os.path.splitext(os.path.basename(__file__))[0]
+    if "%s.py:" % this_file not in lines[1]:
+        raise TestFailure("Largest allocation is not reported first: %r" % lines[1:])
+
+
+@cocotb.test(skip=_no_tracemalloc)
+def test_memtrace_environment(dut):
+    """The tracker is configured by the COCOTB_MEMTRACE variables"""
+    yield Timer(1)
+    names = ["COCOTB_MEMTRACE", "COCOTB_MEMTRACE_LIMIT", "COCOTB_MEMTRACE_TOP",
+             "COCOTB_MEMTRACE_FRAMES"]
+    saved = dict((name, os.environ.pop(name, None)) for name in names)
+    try:
+        os.environ["COCOTB_MEMTRACE"] = "0"
+        if MemoryTracker.from_environment() is not None:
+            raise TestFailure("Tracker created with COCOTB_MEMTRACE=0")
+        os.environ.update(COCOTB_MEMTRACE="1", COCOTB_MEMTRACE_LIMIT="1.5K",
+                          COCOTB_MEMTRACE_TOP="4", COCOTB_MEMTRACE_FRAMES="2")
+        tracker = MemoryTracker.from_environment()
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+    if (tracker.limit, tracker.top, tracker.frames) != (1536, 4, 2):
+        raise TestFailure("Unexpected configuration %r" %
+                          ((tracker.limit, tracker.top, tracker.frames),))
+    if tracker.leaked(1536) or not tracker.leaked(1537) or tracker.leaked(None):
+        raise TestFailure("Growth is compared to the limit incorrectly")
+
+
+@cocotb.test()
+def test_memtrace_parse_size(dut):
+    """Sizes are parsed with an optional K, M or G suffix"""
+    yield Timer(1)
+    for size, expected in [("100", 100), ("2k", 2048), (" 10M ", 10 << 20),
+                           ("1G", 1 << 30)]:
+        if _parse_size(size) != expected:
+            raise TestFailure("Parsed %r as %d" % (size, _parse_size(size)))
@@ -2,11 +2,17 @@ import logging
 import random
 
 import cocotb
+from cocotb.memory import PagedMemory, dump_ram, load_ram
 from cocotb.result import TestFailure
 from cocotb.triggers import Timer
 
 import simulator
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 @cocotb.test()
 def test_in_vect_packed(dut):
     yield Timer(10)
@@ -196,3 +202,78 @@ def test_in_3d_arr(dut):
     print("Getting: dut.out_3d_arr type %s" % type( dut.out_3d_arr))
     if dut.out_3d_arr !=  (365 << 18) | (365 << 9) | (365):
         raise TestFailure("Failed to readback dut.out_3d_arr")
+
+@cocotb.test()
+def test_write_array(dut):
+    yield Timer(10)
+    dut.in_vect_packed_packed_unpacked.write_array([1, 2, 3])
+    yield Timer(10)
+    values = [int(dut.out_vect_packed_packed_unpacked[i]) for i in (2, 1, 0)]
+    if values != [1, 2, 3]:
+        raise TestFailure("Failed to readback dut.out_vect_packed_packed_unpacked, got %s" % values)
+
+@cocotb.test(skip=numpy is None)
+def test_read_write_array(dut):
+    yield Timer(10)
+    values = numpy.arange(9).reshape(3, 3) & 1
+    dut.in_2d_vect_unpacked_unpacked.write_array(values)
+    dut.in_2d_vect_packed_unpacked.write_array(numpy.array([7, 0, 5]))
+    yield Timer(10)
+    result = dut.out_2d_vect_unpacked_unpacked.read_array()
+    if result.shape != (3, 3) or (result != values).any():
+        raise TestFailure("Failed to readback dut.out_2d_vect_unpacked_unpacked, got %s" % result)
+    result = dut.out_2d_vect_packed_unpacked.read_array()
+    if result.dtype != numpy.uint8 or list(result) != [7, 0, 5]:
+        raise TestFailure("Failed to readback dut.out_2d_vect_packed_unpacked, got %s" % result)
+
+@cocotb.test()
+def test_load_dump_ram(dut):
+    yield Timer(10)
+    image = PagedMemory()
+    image.write(0x100, bytearray([0x01, 0x01, 0xff, 0x00, 0x6d, 0x01]))
+    load_ram(dut.in_vect_packed_packed_unpacked, image, 0x100)
+    yield Timer(10)
+    dumped = bytearray(6)
+    dump_ram(dut.out_vect_packed_packed_unpacked, dumped)
+    if dumped != bytearray([0x01, 0x01, 0xff, 0x00, 0x6d, 0x01]):
+        raise TestFailure("Failed to dump dut.out_vect_packed_packed_unpacked, got %r" % dumped)
+    if int(dut.out_vect_packed_packed_unpacked[2]) != 0x16d:
+        raise TestFailure("Failed to readback dut.out_vect_packed_packed_unpacked[2]")
+
+@cocotb.test()
+def test_write_array_and_element(dut):
+    """The last of the writes to an array and to one of its elements in a timestep wins"""
+    yield Timer(10)
+    dut.in_2d_vect_packed_unpacked = [1, 2, 3]
+    dut.in_2d_vect_packed_unpacked[2] <= 5
+    yield Timer(10)
+    values = [int(dut.out_2d_vect_packed_unpacked[i]) for i in range(3)]
+    if values != [1, 2, 5]:
+        raise TestFailure("Failed to readback dut.out_2d_vect_packed_unpacked, got %s" % values)
+
+    dut.in_2d_vect_packed_unpacked[2] <= 6
+    dut.in_2d_vect_packed_unpacked = [4, 2, 3]
+    yield Timer(10)
+    values = [int(dut.out_2d_vect_packed_unpacked[i]) for i in range(3)]
+    if values != [4, 2, 3]:
+        raise TestFailure("Failed to readback dut.out_2d_vect_packed_unpacked, got %s" % values)
+
+@cocotb.test()
+def test_write_array_redundant_element(dut):
+    """A write to an element after an array write is not skipped as redundant"""
+    scheduler = cocotb.scheduler
+    enabled = scheduler.skip_redundant_writes
+    scheduler.skip_redundant_writes = True
+    try:
+        yield Timer(10)
+        dut.in_2d_vect_packed_unpacked[1] <= 7
+        yield Timer(10)
+        dut.in_2d_vect_packed_unpacked.write_array([1, 2, 3])
+        yield Timer(10)
+        dut.in_2d_vect_packed_unpacked[1] <= 7
+        yield Timer(10)
+        value = int(dut.out_2d_vect_packed_unpacked[1])
+        if value != 7:
+            raise TestFailure("Failed to readback dut.out_2d_vect_packed_unpacked[1], got %d" % value)
+    finally:
+        scheduler.skip_redundant_writes = enabled
@@ -0,0 +1,43 @@
+"""
+Tests of the cache of signal values read while the scheduler reacts to a trigger.
+"""
+import cocotb
+from cocotb.result import TestFailure
+from cocotb.triggers import ReadOnly, Timer
+
+
+@cocotb.test()
+def test_read_cache(dut):
+    """Reads are answered from the cache until the next trigger or write"""
+    cache = cocotb.handle.read_cache
+    enabled = cache.enabled
+    cache.enabled = True
+    cache.reset_stats()
+    try:
+        dut.stream_in_data.setimmediatevalue(5)
+        yield Timer(1)
+        yield ReadOnly()
+        first = dut.stream_in_data.value
+        second = dut.stream_in_data.value
+        if (cache.hits, cache.misses) != (1, 1):
+            raise TestFailure("Expected 1 hit and 1 miss, got %d and %d" %
+                              (cache.hits, cache.misses))
+        if second is first or second.integer != 5:
+            raise TestFailure("Cached read returned %r" % second)
+        first.integer = 3
+        if second.integer != 5 or dut.stream_in_data.value.integer != 5:
+            raise TestFailure("Modifying a read value changed other reads")
+
+        yield Timer(1)
+        dut.stream_in_data.value
+        if (cache.hits, cache.misses) != (2, 2):
+            raise TestFailure("Cache was not invalidated by a trigger")
+        dut.stream_in_data.setimmediatevalue(6)
+        if dut.stream_in_data.value.integer != 6:
+            raise TestFailure("Cache was not invalidated by a write")
+        if (cache.hits, cache.misses) != (2, 3):
+            raise TestFailure("Expected 2 hits and 3 misses, got %d and %d" %
+                              (cache.hits, cache.misses))
+    finally:
+        cache.enabled = enabled
+        cache.invalidate()
@@ -0,0 +1,73 @@
+"""
+Tests of skipping writes of the value last written to a signal.
+"""
+import cocotb
+from cocotb.binary import BinaryValue
+from cocotb.result import TestFailure
+from cocotb.triggers import ReadOnly, Timer
+
+
+@cocotb.coroutine
+def _write(handle, value):
+    handle <= value
+    yield Timer(1)
+    yield ReadOnly()
+    if handle.value.integer != int(value):
+        raise TestFailure("%s is %s after writing %s" % (handle._name, handle.value, value))
+    yield Timer(1)
+
+
+@cocotb.test()
+def test_redundant_writes(dut):
+    """Writes of the value last written are skipped, unless excluded"""
+    scheduler = cocotb.scheduler
+    enabled = scheduler.skip_redundant_writes
+    scheduler.skip_redundant_writes = True
+    skipped = scheduler.writes_skipped
+    try:
+        yield _write(dut.stream_in_data, 5)
+        yield _write(dut.stream_in_data, 5)
+        yield _write(dut.stream_in_data, BinaryValue("00000101"))
+        yield _write(dut.stream_in_data, BinaryValue("00000101"))
+        if scheduler.writes_skipped - skipped != 2:
+            raise TestFailure("Expected 2 writes to be skipped, got %d" %
+                              (scheduler.writes_skipped - skipped))
+
+        # A direct write isn't known to the scheduler
+        dut.stream_in_data.setimmediatevalue(6)
+        yield _write(dut.stream_in_data, BinaryValue("00000101"))
+
+        scheduler.always_write(dut.stream_in_valid)
+        yield _write(dut.stream_in_valid, 0)
+        yield _write(dut.stream_in_valid, 0)
+        if scheduler.writes_skipped - skipped != 2:
+            raise TestFailure("Expected 2 writes to be skipped, got %d" %
+                              (scheduler.writes_skipped - skipped))
+    finally:
+        scheduler.skip_redundant_writes = enabled
+
+
+_enabled = []
+
+
+@cocotb.test()
+def test_redundant_writes_next_test_a(dut):
+    """The values last written are forgotten when a test starts"""
+    _enabled.append(cocotb.scheduler.skip_redundant_writes)
+    cocotb.scheduler.skip_redundant_writes = True
+    yield _write(dut.stream_in_data, 9)
+
+
+@cocotb.test()
+def test_redundant_writes_next_test_b(dut):
+    """The values last written are forgotten when a test starts"""
+    scheduler = cocotb.scheduler
+    try:
+        if dut.stream_in_data._handle in scheduler._last_written:
+            raise TestFailure("Value written by the previous test is still known")
+        skipped = scheduler.writes_skipped
+        yield _write(dut.stream_in_data, 9)
+        if scheduler.writes_skipped != skipped:
+            raise TestFailure("First write of the test was skipped")
+    finally:
+        scheduler.skip_redundant_writes = _enabled.pop()
@@ -0,0 +1,119 @@
+"""
+Tests of cocotb.sampler and the monitors built on it.
+"""
+import random
+
+import cocotb
+from cocotb.clock import Clock
+from cocotb.monitors import BusMonitor, SampledBusMonitor
+from cocotb.result import TestError, TestFailure
+from cocotb.sampler import BusSampler
+from cocotb.triggers import ReadOnly, RisingEdge, Timer
+from cocotb.utils import get_sim_time
+
+
+class StreamMonitor(BusMonitor):
+    """Receives ``stream_in_data`` when ``stream_in_valid`` is high."""
+    _signals = ["valid", "data"]
+
+    @cocotb.coroutine
+    def _monitor_recv(self):
+        while True:
+            yield RisingEdge(self.clock)
+            yield ReadOnly()
+            if self.bus.valid.value.integer:
+                self._recv(self.bus.data.value.integer)
+
+
+class SampledStreamMonitor(SampledBusMonitor):
+    """The same as :class:`StreamMonitor`, from samples."""
+    _signals = ["valid", "data"]
+    _qualifier = "valid"
+
+    def _monitor_sample(self, sample):
+        self._recv(sample.data)
+
+
+@cocotb.coroutine
+def drive_stream(dut, cycles):
+    rng = random.Random(0)
+    for _ in range(cycles):
+        yield RisingEdge(dut.clk)
+        dut.stream_in_valid <= int(rng.random() < 0.5)
+        dut.stream_in_data <= rng.getrandbits(8)
+    yield RisingEdge(dut.clk)
+    dut.stream_in_valid <= 0
+    yield RisingEdge(dut.clk)
+
+
+@cocotb.test()
+def test_sampled_monitor(dut):
+    """A SampledBusMonitor receives the same as a monitor waiting for every edge"""
+    cocotb.fork(Clock(dut.clk, 10, "ns").start())
+    dut.stream_in_valid <= 0
+    yield RisingEdge(dut.clk)
+
+    expected = StreamMonitor(dut, "stream_in", dut.clk)
+    sampled = SampledStreamMonitor(dut, "stream_in", dut.clk,
+                                   interval=1, units="us", depth=256)
+    yield drive_stream(dut, 1000)
+    sampled.flush()
+
+    if not expected._recvQ:
+        raise TestFailure("Nothing was received")
+    if list(sampled._recvQ) != list(expected._recvQ):
+        raise TestFailure("Received %d transactions from samples, expected %d" %
+                          (len(sampled._recvQ), len(expected._recvQ)))
+    expected.kill()
+    sampled.kill()
+
+
+@cocotb.test()
+def test_sampler_overflow(dut):
+    """Samples dropped because the buffer is full are reported"""
+    cocotb.fork(Clock(dut.clk, 10, "ns").start())
+    sampler = BusSampler(dut.clk, [dut.stream_in_data], depth=4)
+    yield Timer(100, "ns")
+    try:
+        sampler.drain()
+    except TestError:
+        pass
+    else:
+        raise TestFailure("Overflow of the sampler was not reported")
+    sampler.stop()
+
+    samples = sampler.drain()
+    if samples:
+        raise TestFailure("Recorded %d samples after stopping" % len(samples))
+
+
+@cocotb.test()
+def test_sampler_with_pending_edge(dut):
+    """A sampler created while RisingEdge of its clock is waited on passes the edge on"""
+    cocotb.fork(Clock(dut.clk, 10, "ns").start())
+    edges = []
+
+    @cocotb.coroutine
+    def count_edges():
+        while True:
+            yield RisingEdge(dut.clk)
+            edges.append(get_sim_time("ns"))
+
+    counter = cocotb.fork(count_edges())
+    yield Timer(1, "ns")
+    # The counter is waiting on the edge which the sampler takes over
+    sampler = BusSampler(dut.clk, [dut.stream_in_data], depth=64)
+    seen = len(edges)
+    yield Timer(100, "ns")
+    samples = sampler.drain()
+    if len(edges) - seen != 10 or len(samples) != 10:
+        raise TestFailure("Saw %d edges and recorded %d samples in 100 ns, expected 10" %
+                          (len(edges) - seen, len(samples)))
+
+    # The edge is handed back when the sampler stops
+    sampler.stop()
+    yield Timer(100, "ns")
+    if len(edges) - seen != 20:
+        raise TestFailure("Saw %d edges after stopping the sampler, expected 10" %
+                          (len(edges) - seen - 10))
+    counter.kill()
@@ -0,0 +1,258 @@
+"""
+Tests of the matching of received transactions in Scoreboard.
+"""
+import gc
+
+import cocotb
+from cocotb.monitors import Monitor
+from cocotb.result import TestFailure
+from cocotb.scoreboard import ExpectedQueue, ExpectedStream, Scoreboard
+from cocotb.triggers import Event, Timer
+
+
+class InjectMonitor(Monitor):
+    """Monitor whose transactions are injected by the test."""
+    name = "inject"
+
+    @cocotb.coroutine
+    def _monitor_recv(self):
+        yield Event().wait()
+
+
+@cocotb.test()
+def test_expected_queue_reorder(dut):
+    """Out-of-order transactions are matched by an ExpectedQueue"""
+    monitor = InjectMonitor()
+    expected = ExpectedQueue(range(100))
+    scoreboard = Scoreboard(dut)
+    scoreboard.add_interface(monitor, expected, reorder_depth=None)
+
+    for transaction in reversed(range(100)):
+        monitor._recv(transaction)
+
+    yield Timer(1)
+    monitor.kill()
+    if len(expected):
+        raise TestFailure("%d transactions were not matched" % len(expected))
+    raise scoreboard.result
+
+
+@cocotb.test()
+def test_expected_queue_window(dut):
+    """A transaction outside the reorder window is a mismatch"""
+    monitor = InjectMonitor()
+    expected = ExpectedQueue("abcd")
+    scoreboard = Scoreboard(dut, fail_immediately=False)
+    scoreboard.add_interface(monitor, expected, reorder_depth=1)
+
+    monitor._recv("b")  # within the window of "a", "b"
+    monitor._recv("d")  # window is "a", "c"
+    yield Timer(1)
+    monitor.kill()
+
+    if scoreboard.errors != 1:
+        raise TestFailure("Expected 1 error, got %d" % scoreboard.errors)
+    if list(expected) != ["c", "d"]:
+        raise TestFailure("Unexpected remaining transactions %r" % list(expected))
+
+
+@cocotb.test()
+def test_expected_queue_key(dut):
+    """Transactions with the same key are matched in order"""
+    monitor = InjectMonitor()
+    expected = ExpectedQueue(key=lambda transaction: transaction[0])
+    expected.extend([(0, "a"), (1, "b"), (0, "c"), (1, "d")])
+    scoreboard = Scoreboard(dut)
+    scoreboard.add_interface(monitor, expected, reorder_depth=None)
+
+    for transaction in [(1, "b"), (1, "d"), (0, "a"), (0, "c")]:
+        monitor._recv(transaction)
+    yield Timer(1)
+    monitor.kill()
+    raise scoreboard.result
+
+
+@cocotb.test()
+def test_expected_stream_generator(dut):
+    """Expected transactions are pulled from a generator as they are needed"""
+    pulled = []
+
+    def reference_model():
+        for transaction in range(1000):
+            pulled.append(transaction)
+            yield transaction
+
+    monitor = InjectMonitor()
+    expected = ExpectedStream(reference_model())
+    scoreboard = Scoreboard(dut)
+    scoreboard.add_interface(monitor, expected, reorder_depth=3)
+
+    for transaction in range(500):
+        monitor._recv(transaction ^ 1)  # swap neighbouring transactions
+        if len(expected) > 4:
+            raise TestFailure("Held %d expected transactions" % len(expected))
+    if len(pulled) > 504:
+        raise TestFailure("Pulled %d expected transactions" % len(pulled))
+
+    yield Timer(1)
+    monitor.kill()
+    if scoreboard.errors:
+        raise TestFailure("Errors were recorded")
+    if not isinstance(scoreboard.result, TestFailure):
+        raise TestFailure("Unreceived transactions were not reported")
+
+
+@cocotb.test()
+def test_expected_stream_lookahead(dut):
+    """An unmatched transaction only pulls max_lookahead expected transactions"""
+    pulled = []
+
+    def reference_model():
+        for transaction in range(1000):
+            pulled.append(transaction)
+            yield transaction
+
+    monitor = InjectMonitor()
+    expected = ExpectedStream(reference_model(), max_lookahead=10)
+    scoreboard = Scoreboard(dut, fail_immediately=False)
+    scoreboard.add_interface(monitor, expected, reorder_depth=None)
+
+    monitor._recv(5)        # found, holding 0 to 4
+    monitor._recv(-1)       # not found in 0 to 10, mismatched with 0
+    monitor._recv(1)
+    yield Timer(1)
+    monitor.kill()
+    if len(pulled) != 11:
+        raise TestFailure("Pulled %d expected transactions" % len(pulled))
+    if scoreboard.errors != 1 or list(expected) != [2, 3, 4, 6, 7, 8, 9, 10]:
+        raise TestFailure("%d errors, holding %r" % (scoreboard.errors, list(expected)))
+
+
+@cocotb.test()
+def test_expected_queue_latency(dut):
+    """Match latency is measured from when a transaction is expected"""
+    monitor = InjectMonitor()
+    expected = ExpectedQueue()
+    scoreboard = Scoreboard(dut)
+    scoreboard.add_interface(monitor, expected)
+
+    for transaction in range(4):
+        expected.append(transaction)
+        yield Timer(10, "ns")
+    for transaction in range(4):
+        monitor._recv(transaction)
+    monitor.kill()
+
+    latency = scoreboard.latency[monitor]
+    if (latency.count, round(latency.min), round(latency.max)) != (4, 10, 40):
+        raise TestFailure("Unexpected latencies: %s" % latency)
+
+    untimed = ExpectedQueue(range(4), track_latency=False)
+    other = InjectMonitor()
+    scoreboard.add_interface(other, untimed)
+    for transaction in range(4):
+        other._recv(transaction)
+    other.kill()
+    if other in scoreboard.latency:
+        raise TestFailure("Latency was recorded without being tracked")
+    raise scoreboard.result
+
+
+@cocotb.test()
+def test_statistics(dut):
+    """Matches, mismatches and reordering are counted per interface"""
+    monitor = InjectMonitor()
+    expected = ["abcd", "efgh", "ijkl", "mnop"]
+    scoreboard = Scoreboard(dut, fail_immediately=False)
+    scoreboard.add_interface(monitor, expected, reorder_depth=1)
+
+    for transaction in ["efgh", "abcd", "ijkl", "xxxx", "yyyy"]:
+        yield Timer(10, "ns")
+        monitor._recv(transaction)
+    monitor.kill()
+
+    stats = scoreboard.statistics()["inject"]
+    counts = dict((name, stats[name]) for name in
+                  ("received", "matched", "mismatched", "unexpected",
+                   "reordered", "max_outstanding", "bytes"))
+    if counts != dict(received=5, matched=3, mismatched=1, unexpected=1,
+                      reordered=1, max_outstanding=4, bytes=20):
+        raise TestFailure("Unexpected statistics %r" % counts)
+    if round(stats["throughput_bytes_per_us"]) != 500:
+        raise TestFailure("Unexpected throughput %r" %
+                          stats["throughput_bytes_per_us"])
+
+
+class UnnamedMonitor(Monitor):
+    """Monitor without a name whose transactions are injected by the test."""
+
+    @cocotb.coroutine
+    def _monitor_recv(self):
+        yield Event().wait()
+
+
+@cocotb.test()
+def test_statistics_unnamed_monitors(dut):
+    """Unnamed monitors of the same class get statistics of their own"""
+    monitors = [UnnamedMonitor() for _ in range(3)]
+    scoreboard = Scoreboard(dut)
+    for n, monitor in enumerate(monitors):
+        scoreboard.add_interface(monitor, list(range(n + 1)))
+        for transaction in range(n + 1):
+            monitor._recv(transaction)
+        monitor.kill()
+
+    yield Timer(1)
+    received = dict((name, stats["received"]) for name, stats in
+                    scoreboard.statistics().items())
+    if received != dict(UnnamedMonitor=1, UnnamedMonitor_2=2, UnnamedMonitor_3=3):
+        raise TestFailure("Unexpected statistics %r" % received)
+    raise scoreboard.result
+
+
+_reused = {}
+
+
+@cocotb.test()
+def test_statistics_reused_scoreboard_a(dut):
+    """A scoreboard is reported for each test it is used in"""
+    monitor = InjectMonitor()
+    _reused["scoreboard"] = Scoreboard(dut)
+    _reused["expected"] = expected = ExpectedQueue(range(4))
+    _reused["scoreboard"].add_interface(monitor, expected)
+    _reused["monitor"] = monitor
+    for transaction in range(4):
+        monitor._recv(transaction)
+    yield Timer(1)
+
+
+@cocotb.test()
+def test_statistics_reused_scoreboard_b(dut):
+    """A scoreboard is reported for each test it is used in"""
+    for transaction in range(3):
+        _reused["expected"].append(transaction)
+        _reused["monitor"]._recv(transaction)
+    _reused["monitor"].kill()
+    yield Timer(1)
+
+
+@cocotb.test()
+def test_statistics_reused_scoreboard_c(dut):
+    """A scoreboard is reported for each test it is used in"""
+    yield Timer(1)
+    counts = {}
+    for entry in cocotb.regression_manager._scoreboard_stats:
+        test = entry["test"].rsplit(".", 1)[1]
+        if test.startswith("test_statistics_reused_scoreboard"):
+            stats = entry["interfaces"]["inject"]
+            counts[test] = (stats["received"], stats["max_outstanding"])
+    if counts != dict(test_statistics_reused_scoreboard_a=(4, 4),
+                      test_statistics_reused_scoreboard_b=(3, 1)):
+        raise TestFailure("Unexpected statistics %r" % counts)
+
+    gc.collect()
+    alive = [ref() for ref in cocotb.regression_manager._scoreboards]
+    alive = [scoreboard for scoreboard in alive if scoreboard is not None]
+    if alive != [_reused["scoreboard"]]:
+        raise TestFailure("%d scoreboards of finished tests are kept alive" %
+                          (len(alive) - 1))
@@ -0,0 +1,63 @@
+"""
+Tests of the test selection strategies of TestFactory.
+"""
+from itertools import combinations
+
+import cocotb
+from cocotb.regression import TestFactory
+from cocotb.triggers import Timer
+
+_options = {
+    'a': [0, 1, 2],
+    'b': [0, 1, 2],
+    'c': [0, 1],
+    'd': [0, 1, 2, 3],
+}
+
+# The checks below sort after the generated tests, so they run last
+_pairwise_runs = []
+
+
+@cocotb.coroutine
+def record_pairwise(dut, **kwargs):
+    _pairwise_runs.append(kwargs)
+    yield Timer(1)
+
+
+@cocotb.coroutine
+def check_sampled(dut, **kwargs):
+    yield Timer(1)
+
+
+pairwise_factory = TestFactory(record_pairwise)
+for _name, _values in sorted(_options.items()):
+    pairwise_factory.add_option(_name, _values)
+pairwise_factory.generate_tests(n_wise=2)
+
+sampled_factory = TestFactory(check_sampled)
+for _name, _values in sorted(_options.items()):
+    sampled_factory.add_option(_name, _values)
+sampled_factory.generate_tests(sample=10, seed=5, shard=(0, 2))
+
+_generated = [name for name in globals() if name.startswith("check_sampled_")]
+
+
+@cocotb.test()
+def test_pairwise_coverage(dut):
+    """Every pair of option values was exercised by the pairwise tests"""
+    yield Timer(1)
+    total = 1
+    for values in _options.values():
+        total *= len(values)
+    assert 0 < len(_pairwise_runs) < total
+    for a, b in combinations(sorted(_options), 2):
+        seen = set((run[a], run[b]) for run in _pairwise_runs)
+        expected = set((x, y) for x in _options[a] for y in _options[b])
+        assert seen == expected, "Pair (%s, %s) not fully covered" % (a, b)
+
+
+@cocotb.test()
+def test_sampled_shard(dut):
+    """Only half of the sampled tests were generated"""
+    yield Timer(1)
+    assert len(_generated) == 5, _generated